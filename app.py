@@ -1,23 +1,51 @@
+import time
+import uuid
+
 import streamlit as st
 
-from config.settings import PAGE_TITLE, PAGE_ICON, IDEA_ENDPOINT
+from config.settings import (
+    PAGE_TITLE, PAGE_ICON, IDEA_ENDPOINTS, USE_SNAPSHOT, OVERVIEW_MAX_WORKS, PATH_MAX_HOPS, PATH_MAX_K,
+    COAUTHOR_GRAPH_LIMIT, YEAR_ANIMATION_DELAY,
+)
 
 # old features preserved
-from ui.sidebar import sidebar_controls
+from ui.sidebar import sidebar_controls, keyword_label, person_controls, year_span
 
 # new graph logic
-from ui.work_viewer import build_work_overview_graph, build_layered_work_graph
+from ui.work_viewer import (
+    build_work_overview_graph, build_cluster_overview_graph, build_layered_work_graph, CLUSTER_NODE_PREFIX,
+    build_keyword_graph, KEYWORD_NODE_PREFIX, build_coauthor_graph, PERSON_NODE_PREFIX,
+)
 # from ui.work_viewer_pyviz import build_layered_work_graph
 from core.work_graph import (
-    get_all_works,
+    list_all_works,
     get_work_local_graph,
-    get_top_keywords,
-    get_citation_edges
+    get_citation_edges,
+    neighbourhood_resources,
     )
 from ui.graph_panel import render_legend
 from ui.styling import legend_styles
-from core.resource_inspector import get_resource_properties
+from core.resource_inspector import resource_properties_loader
+from core.dataset_version import dataset_version
+from core.centrality import get_work_centrality, snapshot_centrality, WorkCentrality
+from core.facets import facet_index
+from core.time_slices import time_sliced_citations
+from core.keywords import top_keywords, keyword_network
+from core.coauthors import coauthor_index, get_people
+from core.entity_index import entity_index, index_work
+from core.related_works import related_works_index
+from core.citation_paths import DIRECTIONS, PathFinder, get_path_finder, snapshot_path_finder, path_steps
+from core.clusters import CLUSTER_KINDS, work_clusters, summarize_clusters, cluster_members, cluster_label
+from core.prewarm import popularity, start_warmer
+from core.snapshot import load_snapshot
+from core.triple_store import get_local_store, local_store_version
 from core.query_builder import replace_prefixes_if_uri
+from core.sparql_client import (
+    Priority, query_priority, set_query_session, begin_selection,
+    allow_stale, EndpointError, SchedulerBusy, QueryCancelled, make_endpoint,
+)
+
+BUSY_MESSAGE = "The endpoint is busy with other queries; please retry in a moment."
 
 # -----------------------------------------------------------
 # Streamlit setup
@@ -25,38 +53,108 @@ from core.query_builder import replace_prefixes_if_uri
 st.set_page_config(page_title=PAGE_TITLE, page_icon=PAGE_ICON, layout="wide")
 st.title(PAGE_TITLE)
 
-sparql_endpoint = IDEA_ENDPOINT
-
+# one URL, or a latency-routed pool when several replicas are configured
+sparql_endpoint = make_endpoint(IDEA_ENDPOINTS)
+
+# every query of this rerun is tagged with the session, so the scheduler
+# can share endpoint slots fairly between concurrent users
+if "query_session" not in st.session_state:
+    st.session_state["query_session"] = uuid.uuid4().hex
+set_query_session(st.session_state["query_session"])
+
+# offline snapshot (python -m core.materialize): when present, the overview and
+# the work-centric view are served from it without querying the endpoint
+snapshot = load_snapshot() if USE_SNAPSHOT else None
+
+# cheap, rate-limited fingerprint of the data; every cache below is tagged
+# with it and dropped together when it changes. A snapshot carries its own
+# version, and the local mirror (LOCAL_STORE_PATH) is versioned by its file:
+# neither probes (or warms) the endpoint
+if snapshot is not None:
+    data_version = snapshot.version
+elif get_local_store() is not None:
+    data_version = local_store_version()
+else:
+    data_version = dataset_version(sparql_endpoint)
+    # keeps the most opened works warm in the result cache (after start-up and data changes)
+    start_warmer(sparql_endpoint)
+
+# Load all works (+ citations for the overview graph); if the endpoint is
+# struggling, the last good answer is shown instead of a hanging page
+stale_overview = []
+if snapshot is not None:
+    works, citations = snapshot.works, snapshot.citations
+else:
+    try:
+        with allow_stale() as stale_overview:
+            # every page: the overview decides between works and clusters on the full count
+            works = list_all_works(sparql_endpoint)
+            citations = get_citation_edges(sparql_endpoint)
+    except EndpointError as e:
+        st.error(f"Could not load works from the endpoint: {e}")
+        works, citations = [], []
+    except SchedulerBusy:
+        st.warning(BUSY_MESSAGE)
+        works, citations = [], []
+# citations = get_work_citations(sparql_endpoint)
+overview_version = data_version
 
 # -----------------------------------------------------------
 # SIDEBAR SEARCH (restored)
 # -----------------------------------------------------------
+# venue/year/keyword filters are bitmap ANDs over the loaded works
+facets = facet_index(works, version=overview_version)
+
+# year range of the overview (slider further down, read by the sidebar's
+# counts too); while animating, it grows by one year per rerun
+span = year_span(facets)
+if span is None or span[0] == span[1]:
+    st.session_state.pop("year_range", None)
+    st.session_state["year_animation"] = False
+else:
+    first, last = st.session_state.get("year_range") or span
+    if st.session_state.get("year_animation") == "start":
+        first, last = span[0], span[0]
+        st.session_state["year_animation"] = True
+    elif st.session_state.get("year_animation"):
+        if last < span[1]:
+            last += 1
+        else:
+            st.session_state["year_animation"] = False
+    st.session_state["year_range"] = (max(first, span[0]), min(max(last, first), span[1]))
 st.sidebar.header("Search Papers")
-search_title, search_venue, search_year = sidebar_controls(IDEA_ENDPOINT)
+search_title, facet_selection = sidebar_controls(facets)
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("Keyword cloud")
 
-try:
-    top_keywords = get_top_keywords(sparql_endpoint, limit=30)
-except Exception:
-    top_keywords = []
+# served from the local keyword index; optionally only for the filtered works
+cloud_filtered = st.sidebar.checkbox("Only works matching the filters", value=True)
+cloud_keywords = top_keywords(
+    works, facets, facet_selection if cloud_filtered else None, version=overview_version, limit=30,
+)
 
-if top_keywords:
+if cloud_keywords:
     # simple inline "cloud"
-    kw_chunks = []
-    for kw in top_keywords:
-        uri = kw["uri"]
-        label = replace_prefixes_if_uri(uri)
-        # strip idea:/cso: prefixes visually
-        for prefix in ("idea:", "cso:"):
-            if label.startswith(prefix):
-                label = label[len(prefix):]
-        label = label.replace("_", " ")
-        kw_chunks.append(f"`{label}`")
+    kw_chunks = [f"`{keyword_label(kw['uri'])}`" for kw in cloud_keywords]
     st.sidebar.markdown(" ".join(kw_chunks))
 else:
-    st.sidebar.caption("No keywords found (or query failed).")
+    st.sidebar.caption("No keywords found.")
+
+# people and co-authorship, from the works' dc:creator links
+st.sidebar.markdown("---")
+coauthors = coauthor_index(works, version=overview_version)
+if snapshot is not None:
+    person_names = snapshot.people
+else:
+    try:
+        person_names = get_people(sparql_endpoint)
+    except (EndpointError, SchedulerBusy):
+        person_names = {}
+person_names = {uri: person_names.get(uri, uri) for uri in coauthors.people()}
+opened_person = person_controls(person_names)
+if opened_person:
+    st.session_state["selected_person"] = opened_person
 
 # -----------------------------------------------------------
 # SESSION STATE — selected work
@@ -65,6 +163,21 @@ else:
 if "selected_work" not in st.session_state:
     st.session_state["selected_work"] = None
 
+# the overview keeps returning its last click; only a new one changes the
+# selection, so a work picked elsewhere (e.g. related works) is not undone
+if "last_clicked_work" not in st.session_state:
+    st.session_state["last_clicked_work"] = None
+if "last_clicked_path_work" not in st.session_state:
+    st.session_state["last_clicked_path_work"] = None
+
+# person-centric view (co-authors); same last-click bookkeeping for its graphs
+if "selected_person" not in st.session_state:
+    st.session_state["selected_person"] = None
+if "last_clicked_person" not in st.session_state:
+    st.session_state["last_clicked_person"] = None
+if "last_clicked_person_work" not in st.session_state:
+    st.session_state["last_clicked_person_work"] = None
+
 if "expanded_classes" not in st.session_state:
     st.session_state["expanded_classes"] = {}
 
@@ -77,36 +190,161 @@ if "last_clicked_node" not in st.session_state:
 # -----------------------------------------------------------
 st.markdown("## All Publications")
 
-# Load all works
-works = get_all_works(sparql_endpoint)
-# citations = get_work_citations(sparql_endpoint)
+
+if stale_overview:
+    st.caption("The endpoint is slow or unavailable – showing cached results.")
 
 # Apply search filtering
-def passes_filters(w):
-    label = w["label"].lower()
-    year = w["year"]
-
-    if search_title and search_title.lower() not in label:
-        return False
-    if search_venue and search_venue.lower() not in label:
-        return False
-    if search_year and year != search_year:
-        return False
-    return True
-
-filtered_works = [w for w in works if passes_filters(w)]
+filtered_works = facets.works_in(facets.select(facet_selection))
+if search_title:
+    filtered_works = [w for w in filtered_works if search_title.lower() in w["label"].lower()]
 st.caption(f"{len(filtered_works)} works found")
 
-# build overview graph
-citations = get_citation_edges(sparql_endpoint)
+# build overview graph; large result sets are shown as clusters first and a
+# cluster's works are only rendered once it is opened
 print("CITATIONS:", len(citations))
-clicked_work = build_work_overview_graph(filtered_works, citations=citations)
+# citations of the works in the year range are one slice of the time-sliced index
+overview_citations = citations
+if "year_range" in st.session_state:
+    col1, col2 = st.columns([6, 1])
+    with col1:
+        year_range = st.slider("Years", span[0], span[1], key="year_range")
+    with col2:
+        if st.session_state.get("year_animation"):
+            if st.button("Stop"):
+                st.session_state["year_animation"] = False
+                st.rerun()
+        elif st.button("Play"):
+            st.session_state["year_animation"] = "start"
+            st.rerun()
+    if tuple(year_range) != span:
+        overview_citations = time_sliced_citations(works, citations, version=overview_version).between(*year_range)
+
+overview_levels = ["works"] + list(CLUSTER_KINDS) + ["keywords"]
+default_level = 0 if len(filtered_works) <= OVERVIEW_MAX_WORKS else 1
+overview_level = st.radio(
+    "Overview", overview_levels, index=default_level, horizontal=True,
+    format_func=lambda l: {"works": "All works", "keywords": "Keyword network"}.get(l, f"Clusters by {l}"),
+)
+
+# PageRank over the citation graph sizes the work nodes and decides which
+# works stay when a view has to be capped
+if snapshot is not None:
+    centrality = snapshot_centrality(snapshot)
+else:
+    try:
+        centrality = get_work_centrality(sparql_endpoint)
+    except (EndpointError, SchedulerBusy):
+        centrality = WorkCentrality.from_citations(citations)
+
+
+def capped(ws):
+    if len(ws) <= OVERVIEW_MAX_WORKS:
+        return ws
+    st.caption(f"Showing the {OVERVIEW_MAX_WORKS} most central of {len(ws)} works (by PageRank).")
+    return centrality.top(ws, OVERVIEW_MAX_WORKS)
+
+
+clicked_work = None
+if overview_level == "works":
+    clicked_work = build_work_overview_graph(capped(filtered_works), citations=overview_citations, centrality=centrality)
+elif overview_level == "keywords":
+    # co-occurrence over the whole corpus; a clicked keyword lists its (filtered) works
+    keyword_nodes, keyword_edges = keyword_network(works, version=overview_version)
+    clicked_keyword = build_keyword_graph(keyword_nodes, keyword_edges)
+    if clicked_keyword and clicked_keyword.startswith(KEYWORD_NODE_PREFIX):
+        keyword = clicked_keyword[len(KEYWORD_NODE_PREFIX):]
+        tagged = [w for w in filtered_works if keyword in (w.get("keywords") or [])]
+        st.caption(f"{keyword_label(keyword)}: {len(tagged)} works")
+        clicked_work = build_work_overview_graph(
+            capped(tagged), citations=overview_citations, centrality=centrality, name="overview:keyword",
+        )
+else:
+    assignment = work_clusters(
+        works, citations, overview_level, version=overview_version,
+    )
+    open_cluster = st.session_state.get("open_cluster")
+
+    if open_cluster is None or open_cluster[0] != overview_level:
+        clusters, cluster_edges = summarize_clusters(filtered_works, overview_citations, assignment, overview_level)
+        clicked_cluster = build_cluster_overview_graph(clusters, cluster_edges, name=f"overview:{overview_level}")
+        # the component keeps returning its last click; only a new one opens a cluster
+        if (
+            clicked_cluster
+            and clicked_cluster.startswith(CLUSTER_NODE_PREFIX)
+            and clicked_cluster != st.session_state.get("last_clicked_cluster")
+        ):
+            st.session_state["last_clicked_cluster"] = clicked_cluster
+            st.session_state["open_cluster"] = (overview_level, clicked_cluster[len(CLUSTER_NODE_PREFIX):])
+            st.rerun()
+    else:
+        key = open_cluster[1]
+        members = cluster_members(filtered_works, assignment, key)
+        st.caption(f"{cluster_label(overview_level, key)}: {len(members)} works")
+        if st.button("Back to clusters"):
+            st.session_state["open_cluster"] = None
+            st.rerun()
+        clicked_work = build_work_overview_graph(capped(members), citations=overview_citations, centrality=centrality)
+
+def select_work(uri):
+    if uri != st.session_state["selected_work"]:
+        popularity.record(uri, "work")
+    st.session_state["selected_work"] = uri
 
-if clicked_work:
-    st.session_state["selected_work"] = clicked_work
+
+if clicked_work and clicked_work != st.session_state["last_clicked_work"]:
+    st.session_state["last_clicked_work"] = clicked_work
+    select_work(clicked_work)
+
+# -----------------------------------------------------------
+# 1b. PERSON VIEW (works and co-authors, from the local index)
+# -----------------------------------------------------------
+selected_person = st.session_state["selected_person"]
+if selected_person:
+    st.markdown("---")
+    st.markdown(f"## Person: **{person_names.get(selected_person, selected_person)}**")
+    if st.button("Close person view"):
+        st.session_state["selected_person"] = None
+        st.rerun()
+
+    person_works = [w for w in works if w["uri"] in coauthors.works_of(selected_person)]
+    top_coauthors = coauthors.coauthors(selected_person, COAUTHOR_GRAPH_LIMIT)
+    shown = [selected_person] + [uri for uri, _ in top_coauthors]
+    links = [
+        (a, b, coauthors.weight(a, b))
+        for i, a in enumerate(shown) for b in shown[i + 1:]
+        if coauthors.weight(a, b)
+    ]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"### Works ({len(person_works)})")
+        clicked_person_work = build_work_overview_graph(
+            capped(person_works), citations=citations, centrality=centrality, name="person:works", height=400,
+        )
+    with col2:
+        st.markdown(f"### Co-authors ({len(coauthors.coauthors(selected_person))})")
+        clicked_person = build_coauthor_graph(selected_person, top_coauthors, person_names, links)
+
+    if clicked_person_work and clicked_person_work != st.session_state["last_clicked_person_work"]:
+        st.session_state["last_clicked_person_work"] = clicked_person_work
+        select_work(clicked_person_work)
+    if (
+        clicked_person
+        and clicked_person.startswith(PERSON_NODE_PREFIX)
+        and clicked_person != st.session_state["last_clicked_person"]
+    ):
+        st.session_state["last_clicked_person"] = clicked_person
+        st.session_state["selected_person"] = clicked_person[len(PERSON_NODE_PREFIX):]
+        st.rerun()
 
 selected_work = st.session_state["selected_work"]
 
+# a new selection supersedes the previous one: whatever the superseded run
+# still has queued or in flight for it (its work graph, the batched 2-/3-hop
+# and property lookups on the loader threads) is aborted
+begin_selection(st.session_state["query_session"], selected_work)
+
 
 # -----------------------------------------------------------
 # 2. DETAILED WORK VIEW
@@ -128,11 +366,46 @@ if selected_work:
     # with col3:
     #     show_metadata = st.toggle("Show Metadata", value=True)
 
-    # pull graph from SPARQL
-    is_skeleton, work_rows = get_work_local_graph(
-        sparql_endpoint,
-        selected_work,
-    )
+    from_snapshot = snapshot is not None and snapshot.has_work(selected_work)
+
+    # pull graph from SPARQL — a click is waiting on this, so it goes ahead of page-load work
+    stale_work = []
+    if from_snapshot:
+        is_skeleton, work_rows = snapshot.work_local_graph(selected_work)
+    else:
+        try:
+            with query_priority(Priority.INTERACTIVE), allow_stale() as stale_work:
+                is_skeleton, work_rows = get_work_local_graph(
+                    sparql_endpoint,
+                    selected_work,
+                )
+        except EndpointError as e:
+            st.error(f"Could not load this work from the endpoint: {e}")
+            st.stop()
+        except SchedulerBusy:
+            st.warning(BUSY_MESSAGE)
+            st.stop()
+        except QueryCancelled:
+            # a newer selection took over; its run draws the page
+            st.stop()
+        index_work(selected_work, work_rows)
+    if stale_work:
+        st.caption("The endpoint is slow or unavailable – showing a cached copy of this work.")
+
+    # argument entity -> works; covers the snapshot, or the works opened so far
+    entities = entity_index(snapshot)
+
+    # one batched properties lookup for every node of this work's neighbourhood,
+    # so clicking through its nodes does not cost a round trip per node. The
+    # loader is not held: its timer thread sends the batch (with this run's
+    # priority, session and cancel token) while the graph below renders
+    if not from_snapshot and st.session_state.get("properties_work") != (selected_work, data_version):
+        loader = resource_properties_loader(sparql_endpoint)
+        with query_priority(Priority.INTERACTIVE):
+            for uri in neighbourhood_resources(selected_work, work_rows):
+                loader.load(uri)
+        st.session_state["properties_loader"] = loader
+        st.session_state["properties_work"] = (selected_work, data_version)
 
     # print("Work rows:",work_rows)
     # build graph nodes/edges
@@ -144,6 +417,75 @@ if selected_work:
         expanded_classes=st.session_state["expanded_classes"]
     )
 
+    # -----------------------
+    # Related works (precomputed from the citation graph)
+    # -----------------------
+    related = related_works_index(citations, version=overview_version)
+    work_labels = {w["uri"]: w["label"] for w in works}
+    st.markdown("### Related Works")
+    for column, heading, entries in zip(
+        st.columns(2),
+        ("Cited together with", "Shares references with"),
+        (related.cocited(selected_work), related.coupled(selected_work)),
+    ):
+        with column:
+            st.markdown(f"**{heading}**")
+            if not entries:
+                st.caption("None in the citation graph.")
+            for uri, count in entries:
+                label = work_labels.get(uri) or replace_prefixes_if_uri(uri)
+                if st.button(f"{label[:80]} ({count})", key=f"related:{heading}:{uri}"):
+                    select_work(uri)
+                    st.rerun()
+
+    # -----------------------
+    # Connection to another work (shortest citation paths, computed locally)
+    # -----------------------
+    st.markdown("### Connection to Another Work")
+    query = st.text_input("Find a work by title", key="path_query")
+    matches = [w for w in works if query and query.lower() in w["label"].lower() and w["uri"] != selected_work][:50]
+    if query and not matches:
+        st.caption("No work matches.")
+    if matches:
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            other = st.selectbox("Target work", matches, format_func=lambda w: w["label"][:100])
+        with col2:
+            max_hops = st.number_input("Max hops", 1, PATH_MAX_HOPS, min(4, PATH_MAX_HOPS))
+        with col3:
+            k = st.number_input("Paths", 1, PATH_MAX_K, 1)
+        direction = st.radio(
+            "Follow", DIRECTIONS, horizontal=True,
+            format_func={"any": "Citations either way", "cites": "Only citing → cited",
+                         "cited_by": "Only cited → citing"}.get,
+        )
+
+        if snapshot is not None:
+            finder = snapshot_path_finder(snapshot)
+        else:
+            try:
+                finder = get_path_finder(sparql_endpoint)
+            except (EndpointError, SchedulerBusy):
+                finder = PathFinder.from_citations(citations)
+        paths = finder.paths(selected_work, other["uri"], k=int(k), max_hops=int(max_hops), direction=direction)
+
+        if not paths:
+            st.caption(f"Not connected within {int(max_hops)} hops.")
+        else:
+            st.caption(", ".join(f"{len(p) - 1} hops" for p in paths))
+            on_path = {uri for p in paths for uri in p}
+            steps = path_steps(paths)
+            steps |= {(v, u) for u, v in steps}
+            path_works = [w for w in works if w["uri"] in on_path]
+            path_citations = [c for c in citations if (c["source"], c["target"]) in steps]
+            clicked_path_work = build_work_overview_graph(
+                path_works, citations=path_citations, centrality=centrality, name="path", height=350,
+            )
+            if clicked_path_work and clicked_path_work != st.session_state["last_clicked_path_work"]:
+                st.session_state["last_clicked_path_work"] = clicked_path_work
+                select_work(clicked_path_work)
+                st.rerun()
+
      # -------------------------------------------------------
     # DETAILS
     # -------------------------------------------------------
@@ -168,7 +510,23 @@ if selected_work:
     print("clicked_node:", clicked_node, "target_uri:", target_uri, "selected_work:", selected_work)
     st.write(f"**Selected Node:** `{replace_prefixes_if_uri(target_uri)}`")
 
-    rows = get_resource_properties(sparql_endpoint, target_uri)
+    rows = snapshot.resource_properties(target_uri) if from_snapshot else None
+    try:
+        if rows is None:
+            # clicking another node of the same work keeps the work's token
+            # but supersedes the previous node's property lookup
+            begin_selection(st.session_state["query_session"] + ":node", (selected_work, target_uri))
+            with query_priority(Priority.INTERACTIVE):
+                loader = st.session_state.get("properties_loader") or resource_properties_loader(sparql_endpoint)
+                rows = loader.get(target_uri)
+    except EndpointError as e:
+        st.error(f"Could not load node details: {e}")
+        rows = []
+    except SchedulerBusy:
+        st.warning(BUSY_MESSAGE)
+        rows = []
+    except QueryCancelled:
+        st.stop()
     # print("Resource properties rows:", rows)
     st.dataframe(
         [{"property": replace_prefixes_if_uri(r["p"]["value"]),
@@ -178,9 +536,27 @@ if selected_work:
         height=350
     )
 
+    if target_uri in coauthors and st.button("Open person view", key="open_person"):
+        st.session_state["selected_person"] = target_uri
+        st.rerun()
+
+    # other works using / introducing / addressing the clicked argument entity
+    if target_uri in entities:
+        others = entities.works_for(target_uri, exclude=selected_work)
+        st.markdown(f"**Other works with this entity** ({len(others)})")
+        if not snapshot:
+            st.caption(f"Among the {entities.work_count} works opened so far.")
+        for uri, roles in others[:50]:
+            label = work_labels.get(uri) or replace_prefixes_if_uri(uri)
+            if st.button(f"{label[:80]} ({', '.join(roles)})", key=f"entity:{target_uri}:{uri}"):
+                select_work(uri)
+                st.rerun()
+
 
     if clicked_node != st.session_state["last_clicked_node"]:
         st.session_state["last_clicked_node"] = clicked_node
+        if clicked_node and not clicked_node.startswith("class:"):
+            popularity.record(clicked_node, "node")
 
         if clicked_node and clicked_node.startswith("class:"):
             class_iri = clicked_node.replace("class:", "")
@@ -191,3 +567,8 @@ if selected_work:
    
 else:
     st.info("Click a paper node above to open the work-centric view.")
+
+# next frame of the year animation, once the page is drawn
+if st.session_state.get("year_animation"):
+    time.sleep(YEAR_ANIMATION_DELAY)
+    st.rerun()
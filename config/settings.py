@@ -1,4 +1,4 @@
-from decouple import config
+from decouple import config, Csv
 
 PAGE_TITLE = "Idea Graph Visualizer"
 PAGE_ICON = config("PAGE_ICON")
@@ -7,6 +7,106 @@ GITHUB_REPO = config("GITHUB_REPO")
 DESCRIPTION = config("DESCRIPTION")
 
 IDEA_ENDPOINT = "http://localhost:3030/idea_kgv2/sparql"
+# read-only replicas of the same dataset; more than one turns on pooled routing
+IDEA_ENDPOINTS = config("IDEA_ENDPOINTS", default=IDEA_ENDPOINT, cast=Csv())
+
+# longest query text we send in one request (batched VALUES lookups are split to fit)
+MAX_QUERY_LENGTH = config("MAX_QUERY_LENGTH", default=8000, cast=int)
+
+# admission control in front of the endpoint (see core.sparql_client.QueryScheduler)
+MAX_CONCURRENT_QUERIES = config("MAX_CONCURRENT_QUERIES", default=4, cast=int)
+MAX_QUEUED_QUERIES = config("MAX_QUEUED_QUERIES", default=64, cast=int)   # per priority class
+QUERY_ADMISSION_TIMEOUT = config("QUERY_ADMISSION_TIMEOUT", default=30.0, cast=float)
+
+# deadline per query family (template name), in seconds
+QUERY_TIMEOUTS = {
+    "default": 30.0,
+    "resource_properties": 10.0,
+    "search_paper_by_title": 10.0,
+    "first_hop": 15.0,
+    "argument_neighbors": 15.0,
+    "approach_neighbors": 15.0,
+    "all_works": 60.0,
+    "citation_edges": 60.0,
+    "work_citations": 60.0,
+    "top_keywords": 30.0,
+    "dataset_triple_count": 10.0,
+    "neighbourhood_triples": 30.0,
+}
+
+# per-endpoint circuit breaker
+CIRCUIT_FAILURE_THRESHOLD = config("CIRCUIT_FAILURE_THRESHOLD", default=5, cast=int)
+CIRCUIT_RESET_TIMEOUT = config("CIRCUIT_RESET_TIMEOUT", default=30.0, cast=float)
+
+# with allow_stale(): how long to wait for a fresh result before serving the cached one
+STALE_GRACE = config("STALE_GRACE", default=2.0, cast=float)
+RESULT_CACHE_SIZE = config("RESULT_CACHE_SIZE", default=1024, cast=int)
+
+# replica pool: EWMA smoothing of latencies, and when to send a hedged duplicate
+REPLICA_EWMA_ALPHA = 0.3
+HEDGE_READS = config("HEDGE_READS", default=True, cast=bool)
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_DELAY = 0.05      # seconds
+HEDGE_MIN_SAMPLES = 20
+
+# dataset fingerprint (core.dataset_version): probed at most this often, in seconds
+DATASET_PROBE_INTERVAL = config("DATASET_PROBE_INTERVAL", default=5.0, cast=float)
+# optional extra query whose answer changes on every ingest, e.g. a dct:modified stamp
+DATASET_MARKER_QUERY = config("DATASET_MARKER_QUERY", default="")
+
+# popularity-driven cache warming (core.prewarm)
+POPULARITY_FILE = "local_cache/popularity.json"
+POPULARITY_HALF_LIFE = config("POPULARITY_HALF_LIFE", default=3 * 24 * 3600.0, cast=float)  # seconds
+PREWARM_TOP_N = config("PREWARM_TOP_N", default=20, cast=int)
+
+# offline snapshots of all work neighbourhoods (core.materialize / core.snapshot)
+SNAPSHOT_DIR = config("SNAPSHOT_DIR", default="local_cache")
+USE_SNAPSHOT = config("USE_SNAPSHOT", default=True, cast=bool)
+# snapshot files kept after a write, the current one included
+SNAPSHOT_KEEP = config("SNAPSHOT_KEEP", default=2, cast=int)
+# optional SELECT ?work ... query for `materialize --incremental`, using $since (ISO timestamp
+# of the last snapshot), e.g. FILTER(?modified > xsd:dateTime($since)); default: fingerprint diff
+SNAPSHOT_CHANGE_QUERY = config("SNAPSHOT_CHANGE_QUERY", default="")
+
+# server-side graph layout (core.layout)
+LAYOUT_ITERATIONS = config("LAYOUT_ITERATIONS", default=60, cast=int)
+LAYOUT_CACHE_SIZE = config("LAYOUT_CACHE_SIZE", default=64, cast=int)
+# last layout per (graph name, session), the warm start of that graph's next layout
+LAYOUT_WARM_STARTS = config("LAYOUT_WARM_STARTS", default=256, cast=int)
+# above this share of nodes new to a graph, its layout is recomputed cold instead of warm-started
+LAYOUT_WARM_MAX_NEW = config("LAYOUT_WARM_MAX_NEW", default=0.3, cast=float)
+
+# level-of-detail overview (core.clusters): above this many works the overview shows clusters
+OVERVIEW_MAX_WORKS = config("OVERVIEW_MAX_WORKS", default=500, cast=int)
+# at most this many super-nodes; smaller clusters and the overflow are lumped into "other"
+OVERVIEW_MAX_CLUSTERS = config("OVERVIEW_MAX_CLUSTERS", default=60, cast=int)
+OVERVIEW_MIN_CLUSTER_SIZE = config("OVERVIEW_MIN_CLUSTER_SIZE", default=3, cast=int)
+# citation communities (core.communities), updated incrementally from here
+COMMUNITIES_FILE = "local_cache/communities.npz"
+
+# related works (core.related_works): kept per work, and references/citers with
+# more links than the fan-out cap are ignored as too unspecific
+RELATED_WORKS_TOP_K = config("RELATED_WORKS_TOP_K", default=10, cast=int)
+RELATED_WORKS_MAX_FANOUT = config("RELATED_WORKS_MAX_FANOUT", default=1000, cast=int)
+
+# keyword co-occurrence overview (core.keywords): most frequent keywords
+# shown, and the shared-works / PMI thresholds for an edge
+KEYWORD_GRAPH_MAX_KEYWORDS = config("KEYWORD_GRAPH_MAX_KEYWORDS", default=150, cast=int)
+KEYWORD_GRAPH_MIN_COUNT = config("KEYWORD_GRAPH_MIN_COUNT", default=2, cast=int)
+KEYWORD_GRAPH_MIN_PMI = config("KEYWORD_GRAPH_MIN_PMI", default=0.0, cast=float)
+
+# person view: co-authors drawn around a person
+COAUTHOR_GRAPH_LIMIT = config("COAUTHOR_GRAPH_LIMIT", default=30, cast=int)
+
+# seconds per year when animating the overview's year range
+YEAR_ANIMATION_DELAY = config("YEAR_ANIMATION_DELAY", default=0.8, cast=float)
+
+# citation path finder (core.citation_paths)
+PATH_MAX_HOPS = config("PATH_MAX_HOPS", default=6, cast=int)
+PATH_MAX_K = config("PATH_MAX_K", default=5, cast=int)
+
+# embedded triple-store mirror (core.triple_store): a store directory or an N-Triples/Turtle dump, empty = off
+LOCAL_STORE_PATH = config("LOCAL_STORE_PATH", default="")
 
 PREFIXES = {
     "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
@@ -0,0 +1,169 @@
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Iterable, List
+
+from config.settings import MAX_QUERY_LENGTH
+from core.query_builder import render_query, sparql_iri
+from core.sparql_client import sparql
+
+# ---------------------------
+# VALUES batching helpers
+# ---------------------------
+
+def chunk_for_query_length(
+    template: str,
+    param: str,
+    uris: List[str],
+    max_length: int = MAX_QUERY_LENGTH,
+    **fixed,
+) -> List[List[str]]:
+    """
+    Split uris into chunks whose rendered VALUES query stays below max_length.
+    Every chunk holds at least one uri, even if that one alone is too long.
+    """
+    base = len(render_query(template, **{param: []}, **fixed))
+    chunks, current, size = [], [], base
+
+    for uri in uris:
+        cost = len(sparql_iri(uri)) + 1
+        if current and size + cost > max_length:
+            chunks.append(current)
+            current, size = [], base
+        current.append(uri)
+        size += cost
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def fetch_grouped(
+    endpoint,
+    template: str,
+    param: str,
+    key_var: str,
+    uris: Iterable[str],
+    max_length: int = MAX_QUERY_LENGTH,
+    cache: bool = True,
+) -> Dict[str, List[Dict]]:
+    """
+    Run a VALUES template over many uris and split the result rows back out
+    per uri, using the ?key_var binding each row carries. cache=False
+    bypasses the result cache (see core.sparql_client.sparql).
+    """
+    uris = list(dict.fromkeys(uris))
+    grouped = {uri: [] for uri in uris}
+
+    for chunk in chunk_for_query_length(template, param, uris, max_length):
+        rows = sparql(endpoint, render_query(template, **{param: chunk}), cache=cache)
+        for r in rows:
+            key = r.get(key_var, {}).get("value")
+            if key in grouped:
+                grouped[key].append(r)
+
+    return grouped
+
+
+# ---------------------------
+# DataLoader-style micro-batching
+# ---------------------------
+
+class BatchLoader:
+    """
+    Collects single-key lookups and resolves them with one batched call.
+
+    batch_fn(keys) must return a dict key -> result. Keys requested while
+    a batch is pending share that batch; resolved keys are served from the
+    loader's own cache, so one loader should live for one rendering pass
+    (or one selection) rather than forever.
+
+    Requests are dispatched either `window` seconds after the first one,
+    or — inside `with loader:` — when the block exits.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Hashable]], Dict], window: float = 0.01):
+        self.batch_fn = batch_fn
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, Future] = {}
+        self._cache: Dict[Hashable, Future] = {}
+        self._timer: threading.Timer | None = None
+        self._held = 0
+
+    def load(self, key: Hashable) -> Future:
+        with self._lock:
+            fut = self._cache.get(key) or self._pending.get(key)
+            if fut is not None:
+                return fut
+
+            fut = Future()
+            self._pending[key] = fut
+
+            if not self._held and self._timer is None:
+                # keep the caller's query priority/session on the timer thread
+                ctx = contextvars.copy_context()
+                self._timer = threading.Timer(self.window, ctx.run, args=(self.dispatch,))
+                self._timer.daemon = True
+                self._timer.start()
+            return fut
+
+    def load_many(self, keys: Iterable[Hashable]) -> List:
+        """Request all keys in one batch and wait for their results."""
+        with self:
+            futures = [self.load(k) for k in keys]
+        return [f.result() for f in futures]
+
+    def get(self, key: Hashable):
+        """Load a single key and wait; dispatches immediately if nothing else is queued."""
+        fut = self.load(key)
+        if not self._held:
+            self.dispatch()
+        return fut.result()
+
+    def prime(self, key: Hashable, value) -> None:
+        with self._lock:
+            fut = Future()
+            fut.set_result(value)
+            self._cache[key] = fut
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def dispatch(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._pending = self._pending, {}
+            self._cache.update(batch)
+
+        if not batch:
+            return
+
+        try:
+            results = self.batch_fn(list(batch))
+        except Exception as e:
+            with self._lock:
+                for key in batch:
+                    self._cache.pop(key, None)
+            for fut in batch.values():
+                fut.set_exception(e)
+            return
+
+        for key, fut in batch.items():
+            fut.set_result(results.get(key, []))
+
+    def __enter__(self):
+        with self._lock:
+            self._held += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._lock:
+            self._held -= 1
+            release = self._held == 0
+        if release:
+            self.dispatch()
+        return False
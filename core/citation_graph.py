@@ -0,0 +1,191 @@
+"""
+Work -> work citation graph in CSR form, shared by the clustering,
+centrality and path-finding code.
+"""
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+
+def _indptr(n: int, rows: np.ndarray) -> np.ndarray:
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr
+
+
+def _ranges(indptr: np.ndarray, rows: np.ndarray):
+    """(row of each entry, position in the CSR index array) for the given rows."""
+    starts, lengths = indptr[rows], indptr[rows + 1] - indptr[rows]
+    owner = np.repeat(rows, lengths)
+    position = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    return owner, position
+
+
+class CitationGraph:
+    """
+    Node i is works[i]. out_indptr/out_indices list the works i cites,
+    in_indptr/in_indices the works citing i. Duplicate edges and
+    self-citations are dropped.
+    """
+
+    def __init__(self, nodes: List[str], sources: np.ndarray, targets: np.ndarray):
+        keep = sources != targets
+        pairs = np.unique(np.stack([sources[keep], targets[keep]], axis=1), axis=0) if keep.any() \
+            else np.zeros((0, 2), dtype=np.int64)
+        self._set(nodes, pairs[:, 0], pairs[:, 1])
+
+    def _set(self, nodes: List[str], sources: np.ndarray, targets: np.ndarray, index: Dict[str, int] | None = None):
+        """(sources, targets) must be unique, free of self-citations and sorted by (source, target)."""
+        self.nodes = nodes
+        self.index: Dict[str, int] = index if index is not None else {uri: i for i, uri in enumerate(nodes)}
+        self.sources, self.targets = sources, targets
+
+        n = len(nodes)
+        # pairs are in (source, target) order: the out-CSR needs no sort and
+        # a stable sort by target gives the in-CSR with sources still sorted
+        self.out_indptr = _indptr(n, sources)
+        self.out_indices = targets.astype(np.int64)
+        self.in_indptr = _indptr(n, targets)
+        self.in_indices = sources[np.argsort(targets, kind="stable")].astype(np.int64)
+
+    @classmethod
+    def from_sorted(cls, nodes: List[str], sources: np.ndarray, targets: np.ndarray,
+                    index: Dict[str, int] | None = None) -> "CitationGraph":
+        """Rebuild from another graph's sources/targets, skipping the dedup and sort."""
+        graph = cls.__new__(cls)
+        graph._set(nodes, sources, targets, index=index)
+        return graph
+
+    @classmethod
+    def from_citations(cls, citations: Iterable[Dict], works: Iterable[str] | None = None) -> "CitationGraph":
+        """
+        Build from get_citation_edges() dicts. With `works`, nodes are exactly
+        those uris (edges to anything else are ignored); otherwise every
+        cited or citing uri becomes a node.
+        """
+        citations = list(citations)
+        if works is None:
+            nodes = list(dict.fromkeys(u for c in citations for u in (c["source"], c["target"])))
+        else:
+            nodes = list(dict.fromkeys(works))
+        index = {uri: i for i, uri in enumerate(nodes)}
+
+        pairs = [
+            (index[c["source"]], index[c["target"]])
+            for c in citations
+            if c["source"] in index and c["target"] in index
+        ]
+        arr = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+        return cls(nodes, arr[:, 0], arr[:, 1])
+
+    def grow(self, citations: Iterable[Dict], works: Iterable[str] | None = None):
+        """
+        The graph for newer citations, keeping this graph's node numbering
+        (new nodes are appended), plus a mask of the edges that are new.
+        None if a node or edge was removed, i.e. no incremental update is possible.
+
+        The citations are matched against this graph's (source, target)
+        sorted edge keys by binary search and only the new ones are merged
+        in, so nothing is rebuilt from the citation dicts.
+        """
+        citations = list(citations)
+        if works is None:
+            works = (u for c in citations for u in (c["source"], c["target"]))
+        works = list(dict.fromkeys(works))
+        index = dict(self.index)
+        nodes = list(self.nodes)
+        for w in works:
+            if w not in index:
+                index[w] = len(nodes)
+                nodes.append(w)
+        if len(nodes) != len(works):
+            # some old node is not among the works any more
+            return None
+
+        n = len(nodes)
+        sources, targets = (
+            np.fromiter(map(index.get, map(itemgetter(end), citations), repeat(-1)), dtype=np.int64, count=len(citations))
+            for end in ("source", "target")
+        )
+        keep = (sources >= 0) & (targets >= 0) & (sources != targets)
+        keys = np.sort(sources[keep] * n + targets[keep])
+        keys = keys[np.diff(keys, prepend=-1) != 0]
+
+        # old pairs are sorted by (source, target), so their keys are sorted too
+        old_keys = self.sources * n + self.targets
+        position = np.searchsorted(old_keys, keys)
+        found = position < len(old_keys)
+        found[found] = old_keys[position[found]] == keys[found]
+        seen = np.zeros(len(old_keys), bool)
+        seen[position[found]] = True
+        if not seen.all():
+            return None
+
+        added = keys[~found]
+        at = np.searchsorted(old_keys, added)
+        merged = np.insert(old_keys, at, added)
+        fresh = np.zeros(len(merged), bool)
+        fresh[at + np.arange(len(added))] = True
+
+        return CitationGraph.from_sorted(nodes, merged // n, merged % n, index=index), fresh
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.sources)
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.out_indptr)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.in_indptr)
+
+    def cited_by(self, i: int) -> np.ndarray:
+        return self.in_indices[self.in_indptr[i]:self.in_indptr[i + 1]]
+
+    def cites(self, i: int) -> np.ndarray:
+        return self.out_indices[self.out_indptr[i]:self.out_indptr[i + 1]]
+
+    def undirected_edges(self):
+        """Both directions of every edge, as (u, v) index arrays."""
+        return (
+            np.concatenate([self.sources, self.targets]),
+            np.concatenate([self.targets, self.sources]),
+        )
+
+    def connected_components(self) -> np.ndarray:
+        """
+        Component id per node, ignoring direction; ids are numbered from 0 by
+        decreasing component size. Min-label hooking plus pointer jumping,
+        so it converges in a few vectorized passes.
+        """
+        n = len(self.nodes)
+        label = np.arange(n)
+        u, v = self.undirected_edges()
+        while True:
+            hooked = label.copy()
+            np.minimum.at(hooked, label[u], label[v])
+            # pointer jumping: follow parents until every node points at a root
+            while True:
+                jumped = hooked[hooked]
+                if np.array_equal(jumped, hooked):
+                    break
+                hooked = jumped
+            if np.array_equal(hooked, label):
+                break
+            label = hooked
+        return _rank_by_size(label)
+
+
+def _rank_by_size(label: np.ndarray) -> np.ndarray:
+    """Renumber labels 0..k-1, largest group first."""
+    if len(label) == 0:
+        return label
+    uniq, inverse, counts = np.unique(label, return_inverse=True, return_counts=True)
+    rank = np.empty(len(uniq), dtype=np.int64)
+    rank[np.argsort(-counts, kind="stable")] = np.arange(len(uniq))
+    return rank[inverse]
@@ -0,0 +1,166 @@
+"""
+How are two works connected? Shortest citation paths over the local
+citation CSR: level-synchronous bidirectional BFS with a hop limit, and
+Yen's algorithm on top of it for the k shortest. Nothing here goes to the
+endpoint (an unbounded property path is not something Fuseki can answer).
+"""
+import heapq
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config.settings import PATH_MAX_HOPS
+from core.citation_graph import CitationGraph, _ranges
+from core.dataset_version import cached_per_version
+from core.work_graph import get_citation_edges
+
+# which edges a path may follow, from the first work to the second:
+#   any       citations in either direction
+#   cites     only citing -> cited (the first work builds on the second)
+#   cited_by  only cited -> citing
+DIRECTIONS = ("any", "cites", "cited_by")
+
+
+class PathFinder:
+    """Shortest paths between works of one CitationGraph."""
+
+    def __init__(self, graph: CitationGraph):
+        self.graph = graph
+        out = (graph.out_indptr, graph.out_indices)
+        into = (graph.in_indptr, graph.in_indices)
+        # (forward, backward) adjacency per direction
+        self._adjacency = {
+            "any": ((out, into), (out, into)),
+            "cites": ((out,), (into,)),
+            "cited_by": ((into,), (out,)),
+        }
+
+    @classmethod
+    def from_citations(cls, citations) -> "PathFinder":
+        return cls(CitationGraph.from_citations(citations))
+
+    def _shortest(
+        self, s: int, t: int, max_hops: int, direction: str,
+        banned_nodes: np.ndarray | None = None, banned_steps: np.ndarray | None = None,
+    ) -> List[int] | None:
+        """
+        Node indices of one shortest path s -> t of at most max_hops steps,
+        or None. Each round expands the smaller frontier by one level.
+        banned_steps are path steps u -> v encoded as u * n + v.
+        """
+        if s == t:
+            return [s]
+        n = len(self.graph)
+        adjacency = self._adjacency[direction]
+        dist = [np.full(n, -1), np.full(n, -1)]
+        parent = [np.full(n, -1), np.full(n, -1)]
+        dist[0][s], dist[1][t] = 0, 0
+        frontier = [np.array([s]), np.array([t])]
+        depth = [0, 0]
+
+        while depth[0] + depth[1] < max_hops and len(frontier[0]) and len(frontier[1]):
+            side = 0 if len(frontier[0]) <= len(frontier[1]) else 1
+            owner, reached = [], []
+            for indptr, indices in adjacency[side]:
+                o, position = _ranges(indptr, frontier[side])
+                owner.append(o)
+                reached.append(indices[position])
+            owner, reached = np.concatenate(owner), np.concatenate(reached)
+
+            keep = dist[side][reached] < 0
+            if banned_nodes is not None:
+                keep &= ~banned_nodes[reached]
+            if banned_steps is not None and len(banned_steps):
+                steps = owner * n + reached if side == 0 else reached * n + owner
+                keep &= ~np.isin(steps, banned_steps)
+            reached, first = np.unique(reached[keep], return_index=True)
+            owner = owner[keep][first]
+
+            depth[side] += 1
+            dist[side][reached] = depth[side]
+            parent[side][reached] = owner
+
+            met = reached[dist[1 - side][reached] >= 0]
+            if len(met):
+                middle = int(met[np.argmin(dist[1 - side][met])])
+                return _join(parent, middle, s, t)
+            frontier[side] = reached
+        return None
+
+    def paths(self, source: str, target: str, k: int = 1, max_hops: int = PATH_MAX_HOPS,
+              direction: str = "any") -> List[List[str]]:
+        """
+        Up to k shortest loop-free paths source -> target (as work uris),
+        shortest first. Empty if either work is not in the citation graph
+        or they are more than max_hops apart.
+        """
+        if direction not in DIRECTIONS:
+            raise ValueError(f"unknown direction {direction!r}")
+        index, nodes = self.graph.index, self.graph.nodes
+        if source not in index or target not in index:
+            return []
+        s, t = index[source], index[target]
+
+        first = self._shortest(s, t, max_hops, direction)
+        if first is None:
+            return []
+        found = [first]
+        seen = {tuple(first)}
+        candidates: List[Tuple[int, List[int]]] = []
+        n = len(self.graph)
+
+        # Yen: deviate from the last path at each of its nodes, with the
+        # steps already taken from that prefix and the prefix itself banned
+        while len(found) < k:
+            last = found[-1]
+            for i in range(len(last) - 1):
+                root = last[:i + 1]
+                steps = np.array([p[i] * n + p[i + 1] for p in found if p[:i + 1] == root and len(p) > i + 1])
+                banned = np.zeros(n, bool)
+                banned[root[:-1]] = True
+                spur = self._shortest(last[i], t, max_hops - i, direction, banned, steps)
+                if spur is not None:
+                    path = root[:-1] + spur
+                    if tuple(path) not in seen:
+                        seen.add(tuple(path))
+                        heapq.heappush(candidates, (len(path), path))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates)[1])
+
+        return [[nodes[i] for i in p] for p in found]
+
+
+def _join(parent, middle: int, s: int, t: int) -> List[int]:
+    head = [middle]
+    while head[-1] != s:
+        head.append(int(parent[0][head[-1]]))
+    tail = [middle]
+    while tail[-1] != t:
+        tail.append(int(parent[1][tail[-1]]))
+    return head[::-1] + tail[1:]
+
+
+def path_steps(paths: List[List[str]]) -> set:
+    """Every consecutive (u, v) of the paths, for picking the edges to draw."""
+    return {(p[i], p[i + 1]) for p in paths for i in range(len(p) - 1)}
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": None, "version": None}
+
+
+def snapshot_path_finder(snapshot) -> PathFinder:
+    """Path finder over a loaded snapshot's citations, built once per snapshot version (no endpoint access)."""
+    with _lock:
+        key = (snapshot.version, len(snapshot.citations))
+        if _index["index"] is None or key != _index["version"]:
+            _index.update(index=PathFinder.from_citations(snapshot.citations), version=key)
+        return _index["index"]
+
+
+@cached_per_version
+def get_path_finder(endpoint) -> PathFinder:
+    """Path finder over the live citation edges; with a snapshot, use snapshot_path_finder."""
+    return PathFinder.from_citations(get_citation_edges(endpoint))
@@ -0,0 +1,112 @@
+"""
+Cluster assignments and cluster-level aggregates for the level-of-detail
+overview: works grouped into super-nodes, citations summed between them.
+"""
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from config.settings import OVERVIEW_MAX_CLUSTERS, OVERVIEW_MIN_CLUSTER_SIZE
+from core.communities import community_map
+
+CLUSTER_KINDS = ("community", "venue", "year")
+OTHER = "other"
+UNKNOWN = "unknown"
+
+# ---------------------------
+# assignments
+# ---------------------------
+
+def _community_assignment(works: List[Dict], citations: List[Dict]) -> Dict[str, str]:
+    communities = community_map([w["uri"] for w in works], citations)
+    return {uri: f"c{label}" for uri, label in communities.items()}
+
+
+def _attribute_assignment(works: List[Dict], key: str) -> Dict[str, str]:
+    return {w["uri"]: str(w.get(key) or UNKNOWN) for w in works}
+
+
+def _cap(assignment: Dict[str, str]) -> Dict[str, str]:
+    """Keep the OVERVIEW_MAX_CLUSTERS largest groups; tiny and overflow groups become OTHER."""
+    keep = {
+        key for key, size in Counter(assignment.values()).most_common(OVERVIEW_MAX_CLUSTERS)
+        if size >= OVERVIEW_MIN_CLUSTER_SIZE
+    }
+    return {uri: key if key in keep else OTHER for uri, key in assignment.items()}
+
+
+_lock = threading.Lock()
+# (version, by) -> {work uri: cluster key}, only for the newest version
+_assignments: Dict[Tuple, Dict[str, str]] = {}
+
+
+def work_clusters(works: List[Dict], citations: List[Dict], by: str, version: str | None = None) -> Dict[str, str]:
+    """
+    Cluster key of every work: its citation community, venue or year.
+    Computed over the whole corpus (not the filtered view) so clusters stay
+    put while filtering, and kept per dataset version.
+    """
+    if by not in CLUSTER_KINDS:
+        raise ValueError(f"unknown cluster kind {by!r}")
+
+    key = (version, by)
+    with _lock:
+        if version is not None and key in _assignments:
+            return _assignments[key]
+
+    if by == "community":
+        assignment = _cap(_community_assignment(works, citations))
+    else:
+        assignment = _cap(_attribute_assignment(works, by))
+
+    if version is not None:
+        with _lock:
+            for old in [k for k in _assignments if k[0] != version]:
+                del _assignments[old]
+            _assignments[key] = assignment
+    return assignment
+
+
+# ---------------------------
+# aggregation
+# ---------------------------
+
+def cluster_label(by: str, key: str) -> str:
+    if key == OTHER:
+        return "Other works"
+    if key == UNKNOWN:
+        return f"Unknown {by}"
+    if by == "community":
+        return f"Community {key[1:]}"
+    if by == "venue":
+        return key.rstrip("/").rsplit("/", 1)[-1].rsplit("#", 1)[-1]
+    return key
+
+
+def summarize_clusters(works: List[Dict], citations: List[Dict], assignment: Dict[str, str], by: str):
+    """
+    Super-nodes and weighted super-edges for the visible works:
+
+        clusters: [{"key", "label", "size"}] (largest first)
+        edges:    [{"source", "target", "weight"}] between different clusters
+    """
+    visible = {w["uri"]: assignment.get(w["uri"], OTHER) for w in works}
+    sizes = Counter(visible.values())
+
+    weights = Counter()
+    for c in citations:
+        s, t = visible.get(c["source"]), visible.get(c["target"])
+        if s is not None and t is not None and s != t:
+            weights[(s, t)] += 1
+
+    clusters = [
+        {"key": key, "label": cluster_label(by, key), "size": size}
+        for key, size in sizes.most_common()
+    ]
+    edges = [{"source": s, "target": t, "weight": w} for (s, t), w in weights.items()]
+    return clusters, edges
+
+
+def cluster_members(works: List[Dict], assignment: Dict[str, str], key: str) -> List[Dict]:
+    """The works of one cluster, for drill-down."""
+    return [w for w in works if assignment.get(w["uri"], OTHER) == key]
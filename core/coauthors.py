@@ -0,0 +1,119 @@
+"""
+Co-authorship network from dc:creator, served locally: the sparse
+person × person weights Cᵀ·C of the work × person incidence C (number of
+shared works), plus each person's works. Kept in step with the works
+list by diffing, so a data change only touches the works that changed.
+"""
+import threading
+from collections import Counter
+from itertools import combinations
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from core.dataset_version import cached_per_version
+from core.keywords import incidence_pairs
+from core.work_graph import get_person_names
+
+
+class CoauthorIndex:
+    """Works per person and co-authorship weights between people."""
+
+    def __init__(self):
+        self._creators: Dict[str, Tuple[str, ...]] = {}
+        self._works: Dict[str, set] = {}
+        self._weights: Dict[str, Counter] = {}
+
+    def _apply(self, creators: Tuple[str, ...], work_uri: str, sign: int) -> None:
+        for person in creators:
+            works = self._works.setdefault(person, set())
+            if sign > 0:
+                works.add(work_uri)
+            else:
+                works.discard(work_uri)
+                if not works:
+                    del self._works[person]
+        for a, b in combinations(creators, 2):
+            for x, y in ((a, b), (b, a)):
+                row = self._weights.setdefault(x, Counter())
+                row[y] += sign
+                if row[y] <= 0:
+                    del row[y]
+                    if not row:
+                        del self._weights[x]
+
+    def _build(self, current: Dict[str, Tuple[str, ...]]) -> None:
+        """Bulk load: Cᵀ·C in one vectorized pass."""
+        people: Dict[str, int] = {}
+        rows, cols = [], []
+        for i, (uri, creators) in enumerate(current.items()):
+            for person in creators:
+                rows.append(i)
+                cols.append(people.setdefault(person, len(people)))
+                self._works.setdefault(person, set()).add(uri)
+        self._creators = dict(current)
+        if not rows:
+            return
+        names = list(people)
+        i, j, counts = incidence_pairs(np.array(rows), np.array(cols), len(current), len(names))
+        for a, b, count in zip(i.tolist(), j.tolist(), counts.tolist()):
+            self._weights.setdefault(names[a], Counter())[names[b]] = count
+            self._weights.setdefault(names[b], Counter())[names[a]] = count
+
+    def update(self, works: List[Dict]) -> int:
+        """Apply the works that were added, removed or got other creators; returns how many changed."""
+        current = {w["uri"]: tuple(sorted(set(w.get("creators") or []))) for w in works}
+        if not self._creators:
+            self._build(current)
+            return len(current)
+
+        changed = 0
+        for uri in self._creators.keys() - current.keys():
+            self._apply(self._creators.pop(uri), uri, -1)
+            changed += 1
+        for uri, creators in current.items():
+            old = self._creators.get(uri)
+            if old == creators:
+                continue
+            if old:
+                self._apply(old, uri, -1)
+            self._apply(creators, uri, +1)
+            self._creators[uri] = creators
+            changed += 1
+        return changed
+
+    def works_of(self, person_uri: str) -> set:
+        return self._works.get(person_uri, set())
+
+    def coauthors(self, person_uri: str, limit: int | None = None) -> List[Tuple[str, int]]:
+        """(co-author uri, shared works), most shared first."""
+        return self._weights.get(person_uri, Counter()).most_common(limit)
+
+    def weight(self, a: str, b: str) -> int:
+        return self._weights.get(a, Counter()).get(b, 0)
+
+    def people(self) -> List[str]:
+        return list(self._works)
+
+    def __contains__(self, person_uri: str) -> bool:
+        return person_uri in self._works
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": CoauthorIndex(), "version": None}
+
+
+def coauthor_index(works: List[Dict], version: str | None = None) -> CoauthorIndex:
+    """The process-wide index, updated incrementally when the works (version) change."""
+    with _lock:
+        key = (version, len(works))
+        if version is None or key != _index["version"]:
+            _index["index"].update(works)
+            _index["version"] = key
+        return _index["index"]
+
+
+@cached_per_version
+def get_people(endpoint) -> Dict[str, str]:
+    """person uri -> name, from the endpoint; with a snapshot, use its `people`."""
+    return get_person_names(endpoint)
@@ -0,0 +1,190 @@
+"""
+Community detection over the work -> work citation graph.
+
+Vectorized label propagation: each round, a random half of the active
+nodes takes the label most common among its neighbours (ties keep the
+current label, otherwise broken at random). Only nodes next to a change
+stay active, so after new citations only their surroundings are
+revisited.
+"""
+import logging
+import os
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from config.settings import COMMUNITIES_FILE
+from core.citation_graph import CitationGraph, _indptr, _ranges, _rank_by_size
+
+
+def _neighbours(adjacency, rows: np.ndarray):
+    """(row, neighbour) pairs of the given rows over every (indptr, indices) adjacency."""
+    owners, found = [], []
+    for indptr, indices in adjacency:
+        owner, position = _ranges(indptr, rows)
+        owners.append(owner)
+        found.append(indices[position])
+    return np.concatenate(owners), np.concatenate(found)
+
+
+def _propagate(n: int, adjacency, labels: np.ndarray, active: np.ndarray, max_rounds: int, seed: int) -> np.ndarray:
+    """
+    Label propagation over CSR adjacencies. Each round only gathers the
+    neighbour lists of the nodes it updates, so the work done is bounded by
+    the neighbourhood of the active set, not by the size of the graph.
+    """
+    rng = np.random.default_rng(seed)
+    labels = labels.copy()
+    degree = sum(np.diff(indptr) for indptr, _ in adjacency)
+    active = active & (degree > 0)
+
+    for _ in range(max_rounds):
+        candidates = np.flatnonzero(active)
+        if not len(candidates):
+            break
+        update = candidates[rng.random(len(candidates)) < 0.5]
+        if not len(update):
+            continue
+
+        node, neighbour = _neighbours(adjacency, update)
+        keys, counts = np.unique(node * n + labels[neighbour], return_counts=True)
+        node, label = keys // n, keys % n
+
+        # own label wins ties, random jitter breaks the remaining ones
+        score = counts + 0.5 * (label == labels[node]) + 0.01 * rng.random(len(counts))
+        best = np.lexsort((-score, node))
+        first = np.ones(len(best), bool)
+        first[1:] = node[best][1:] != node[best][:-1]
+        node, label = node[best][first], label[best][first]
+
+        changed = node[label != labels[node]]
+        labels[node] = label
+        active[update] = False
+        if len(changed):
+            active[_neighbours(adjacency, changed)[1]] = True
+            active[changed] = True
+    else:
+        logging.info(f"label propagation stopped after {max_rounds} rounds with {active.sum()} nodes active")
+    return labels
+
+
+def label_propagation(
+    n: int,
+    u: np.ndarray,
+    v: np.ndarray,
+    labels: np.ndarray | None = None,
+    active: np.ndarray | None = None,
+    max_rounds: int = 100,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Labels after propagating over the directed edge list u -> v (pass both
+    directions for an undirected graph). `labels` defaults to one label per
+    node, `active` to every node with an edge.
+    """
+    order = np.argsort(u, kind="stable")
+    adjacency = [(_indptr(n, u), v[order])]
+    labels = np.arange(n) if labels is None else labels
+    active = np.ones(n, bool) if active is None else active
+    return _propagate(n, adjacency, labels, active, max_rounds, seed)
+
+
+def _undirected(graph: CitationGraph):
+    """Both CSR directions of the graph, i.e. its undirected adjacency without building a new one."""
+    return [(graph.out_indptr, graph.out_indices), (graph.in_indptr, graph.in_indices)]
+
+
+class CommunityIndex:
+    """
+    Citation graph edges plus the community label of every work. update()
+    re-runs propagation only around added citations and new works; a
+    removed work or citation triggers a full recompute.
+    """
+
+    def __init__(self, nodes: List[str], sources: np.ndarray, targets: np.ndarray, labels: np.ndarray,
+                 graph: CitationGraph | None = None):
+        self.nodes = nodes
+        self.index = {uri: i for i, uri in enumerate(nodes)} if graph is None else graph.index
+        self.sources, self.targets = sources, targets
+        self.labels = labels
+        self._graph = graph
+
+    @property
+    def graph(self) -> CitationGraph:
+        if self._graph is None:
+            # sources/targets always come from a CitationGraph, so already sorted
+            self._graph = CitationGraph.from_sorted(self.nodes, self.sources, self.targets, index=self.index)
+        return self._graph
+
+    @classmethod
+    def build(cls, works: List[str], citations: List[Dict]) -> "CommunityIndex":
+        graph = CitationGraph.from_citations(citations, works=works)
+        n = len(graph)
+        labels = _propagate(n, _undirected(graph), np.arange(n), np.ones(n, bool), 100, 0)
+        return cls(graph.nodes, graph.sources, graph.targets, labels, graph=graph)
+
+    def update(self, works: List[str], citations: List[Dict]) -> "CommunityIndex":
+        """Index for the new works/citations; incremental when only additions happened."""
+        grown = self.graph.grow(citations, works)
+        if grown is None:
+            return CommunityIndex.build(works, citations)
+        graph, fresh = grown
+        n = len(graph)
+        if not fresh.any() and n == len(self.nodes):
+            return self
+
+        labels = np.concatenate([self.labels, np.arange(len(self.nodes), n)])
+        active = np.zeros(n, bool)
+        active[graph.sources[fresh]] = True
+        active[graph.targets[fresh]] = True
+        active[len(self.nodes):] = True
+        labels = _propagate(n, _undirected(graph), labels, active, 100, 0)
+        logging.info(f"communities updated for {fresh.sum()} new citations, {n - len(self.nodes)} new works")
+        return CommunityIndex(graph.nodes, graph.sources, graph.targets, labels, graph=graph)
+
+    def assignment(self) -> Dict[str, int]:
+        """work uri -> community id, numbered from 0 by decreasing size."""
+        return dict(zip(self.nodes, _rank_by_size(self.labels).tolist()))
+
+    # -- persistence -------------------------------------------
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        # fixed-width strings, so loading never needs pickle
+        np.savez_compressed(tmp, nodes=np.asarray(self.nodes, dtype=str), sources=self.sources,
+                            targets=self.targets, labels=self.labels)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CommunityIndex":
+        """Raises ValueError for files with pickled (object) arrays, e.g. ones written by older versions."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["nodes"].tolist(), data["sources"], data["targets"], data["labels"])
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": None}
+
+
+def community_map(works: List[str], citations: List[Dict], path: str = COMMUNITIES_FILE) -> Dict[str, int]:
+    """
+    Community id of every work. The index is kept in memory and in `path`,
+    and brought up to date incrementally from whatever was computed last.
+    """
+    with _lock:
+        index = _index["index"]
+        if index is None and os.path.exists(path):
+            try:
+                index = CommunityIndex.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"could not load communities from {path}: {e}")
+
+        updated = index.update(works, citations) if index is not None else CommunityIndex.build(works, citations)
+        if updated is not index:
+            try:
+                updated.save(path)
+            except OSError as e:
+                logging.error(f"could not save communities to {path}: {e}")
+        _index["index"] = updated
+        return updated.assignment()
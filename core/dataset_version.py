@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+
+from config.settings import DATASET_PROBE_INTERVAL, DATASET_MARKER_QUERY
+from core.query_builder import define_template, render_query, build_query
+from core.sparql_client import (
+    sparql, detached, result_cache, note_dataset_version, EndpointError, SchedulerBusy,
+)
+from core.triple_store import local_store_version
+
+define_template("dataset_triple_count", """
+    SELECT (COUNT(*) AS ?n) WHERE { ?s ?p ?o }
+    """)
+
+# ---------------------------
+# fingerprint probe
+# ---------------------------
+
+_lock = threading.Lock()
+# endpoint -> {"version", "checked", "failures"}
+_state: dict = {}
+_listeners = []
+
+# stands in for the fingerprint while no probe has succeeded yet, so results
+# are still cached (and dropped once the first real fingerprint comes in)
+UNKNOWN_VERSION = "unknown"
+
+
+def on_version_change(callback) -> None:
+    """Register callback(endpoint, old_version, new_version) for dataset changes."""
+    _listeners.append(callback)
+
+
+def _probe(endpoint) -> str:
+    # uncached: a cached answer is stamped with the version it is meant to check
+    rows = sparql(endpoint, render_query("dataset_triple_count"), cache=False)
+    parts = [r["n"]["value"] for r in rows]
+
+    if DATASET_MARKER_QUERY:
+        for r in sparql(endpoint, build_query(DATASET_MARKER_QUERY), cache=False):
+            parts.extend(f"{k}={v['value']}" for k, v in sorted(r.items()))
+
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def dataset_version(endpoint) -> str | None:
+    """
+    Fingerprint of the dataset behind endpoint (triple count plus the
+    optional DATASET_MARKER_QUERY answer).
+
+    The endpoint is probed at most every DATASET_PROBE_INTERVAL seconds,
+    backing off while probes fail; in between (and on failure) the last
+    known fingerprint is returned. None until the first probe succeeds.
+    """
+    now = time.monotonic()
+    with _lock:
+        state = _state.setdefault(endpoint, {"version": None, "checked": None, "failures": 0})
+        interval = DATASET_PROBE_INTERVAL * (2 ** min(state["failures"], 6))
+        if state["checked"] is not None and now - state["checked"] < interval:
+            return state["version"]
+        # claim this probe so concurrent reruns keep using the old answer
+        state["checked"] = now
+        old = state["version"]
+
+    try:
+        with detached():
+            version = _probe(endpoint)
+    except (EndpointError, SchedulerBusy) as e:
+        logging.warning(f"dataset version probe failed: {e}")
+        with _lock:
+            state["failures"] += 1
+        if old is None:
+            note_dataset_version(endpoint, UNKNOWN_VERSION)
+        return old
+
+    with _lock:
+        state["failures"] = 0
+        state["version"] = version
+    note_dataset_version(endpoint, version)
+
+    if old is not None and version != old:
+        logging.info(f"dataset at {endpoint} changed: {old} -> {version}")
+        for callback in list(_listeners):
+            try:
+                callback(endpoint, old, version)
+            except Exception as e:
+                logging.error(f"version change listener failed: {e}")
+    return version
+
+
+def current_version(endpoint) -> str | None:
+    """
+    Version the app's data is served at: the local mirror's fingerprint
+    when LOCAL_STORE_PATH is set (the endpoint is not probed), otherwise
+    dataset_version(endpoint).
+    """
+    return local_store_version() or dataset_version(endpoint)
+
+
+# ---------------------------
+# version-tagged caching
+# ---------------------------
+
+def cached_per_version(fn):
+    """
+    Cache fn(endpoint, *args) under the dataset fingerprint. Entries for
+    older fingerprints are dropped as soon as the dataset changes, so the
+    cache can live as long as the data does. Until the first probe
+    succeeds, entries are kept under UNKNOWN_VERSION. With a local mirror,
+    its fingerprint is used instead (see current_version).
+    """
+    cache = {}
+    cache_lock = threading.Lock()
+    # endpoints with entries under UNKNOWN_VERSION
+    unknown = set()
+
+    @wraps(fn)
+    def wrapper(endpoint, *args):
+        version = current_version(endpoint)
+        key = (endpoint, version or UNKNOWN_VERSION, args)
+        with cache_lock:
+            if version is not None and endpoint in unknown:
+                # the first real fingerprint: what was cached before it may be out of date
+                unknown.discard(endpoint)
+                for k in [k for k in cache if k[0] == endpoint and k[1] == UNKNOWN_VERSION]:
+                    del cache[k]
+            if key in cache:
+                return cache[key]
+
+        value = fn(endpoint, *args)
+
+        with cache_lock:
+            cache[key] = value
+            if version is None:
+                unknown.add(endpoint)
+        return value
+
+    def _drop(endpoint, old, new):
+        with cache_lock:
+            for key in [k for k in cache if k[0] == endpoint and k[1] != new]:
+                del cache[key]
+
+    on_version_change(_drop)
+    wrapper.cache_clear = lambda: (cache.clear(), unknown.clear())
+    return wrapper
+
+
+# last-good query results are answers for the old data once it changes
+on_version_change(lambda endpoint, old, new: result_cache.clear(endpoint))
@@ -0,0 +1,134 @@
+"""
+Inverted index from argument-layer entities (artifacts, approaches,
+issues, ...) to the works that use, introduce or address them, so "which
+other works use artifact X" is a dict lookup instead of reverse queries.
+
+Postings come from the works' local graphs: the whole snapshot when one
+is loaded (re-indexing only works whose fingerprint changed), otherwise
+every work opened so far.
+"""
+import threading
+from typing import Dict, List, Set, Tuple
+
+from config.settings import PREFIXES
+
+
+def _expand(curie: str) -> str:
+    prefix, local = curie.split(":", 1)
+    return PREFIXES[prefix] + local
+
+
+# work -> entity links of the argument layer, and the entity classes
+ENTITY_PREDICATES = {
+    _expand(c): c.split(":", 1)[1]
+    for c in ("idea:uses", "idea:introduces", "idea:concernsIssue", "idea:realizes",
+              "idea:hasAssumption", "idea:proposesIdea", "idea:respondsTo")
+}
+ENTITY_CLASSES = {
+    _expand(c): c.split(":", 1)[1]
+    for c in ("idea:Artifact", "idea:Approach", "idea:Issue", "idea:Assumption", "idea:Idea")
+}
+
+
+def work_entities(rows: List[Dict]) -> Dict[str, Set[str]]:
+    """Argument entities in one work's local graph rows -> their roles (link or class names)."""
+    entities: Dict[str, Set[str]] = {}
+    for r in rows:
+        o = r["o"]
+        role = ENTITY_PREDICATES.get(r["p"]["value"])
+        if role and o.get("type") == "uri":
+            entities.setdefault(o["value"], set()).add(role)
+        for side in ("s", "o"):
+            cls = ENTITY_CLASSES.get(r.get(f"{side}Type", {}).get("value", ""))
+            if cls and r[side].get("type") == "uri":
+                entities.setdefault(r[side]["value"], set()).add(cls)
+    return entities
+
+
+class EntityIndex:
+    """
+    entity uri -> {work uri: roles}, with the reverse map for replacing a
+    work's postings. Safe to share between sessions: readers and writers
+    take the same lock.
+    """
+
+    def __init__(self):
+        # reentrant: sync() and add_work() go through remove_work()
+        self._lock = threading.RLock()
+        self._works: Dict[str, Dict[str, Set[str]]] = {}
+        self._entities: Dict[str, Set[str]] = {}
+        self._fingerprints: Dict[str, str | None] = {}
+
+    def add_work(self, work_uri: str, rows: List[Dict], fingerprint: str | None = None) -> None:
+        """(Re)index one work from its local graph rows."""
+        entities = work_entities(rows)
+        with self._lock:
+            self.remove_work(work_uri)
+            for entity, roles in entities.items():
+                self._works.setdefault(entity, {})[work_uri] = roles
+            self._entities[work_uri] = set(entities)
+            self._fingerprints[work_uri] = fingerprint
+
+    def remove_work(self, work_uri: str) -> None:
+        with self._lock:
+            for entity in self._entities.pop(work_uri, ()):
+                postings = self._works.get(entity, {})
+                postings.pop(work_uri, None)
+                if not postings:
+                    self._works.pop(entity, None)
+            self._fingerprints.pop(work_uri, None)
+
+    def sync(self, snapshot) -> int:
+        """
+        Bring the index in line with a snapshot: works that are new, gone or
+        have a different fingerprint (or none to compare) are re-indexed.
+        Returns the number of works touched.
+        """
+        fingerprints = snapshot.fingerprints
+        touched = 0
+        with self._lock:
+            for uri in self._entities.keys() - snapshot.neighbourhoods.keys():
+                self.remove_work(uri)
+                touched += 1
+            for uri, entry in snapshot.neighbourhoods.items():
+                fingerprint = fingerprints.get(uri)
+                if uri in self._entities and fingerprint is not None and self._fingerprints.get(uri) == fingerprint:
+                    continue
+                self.add_work(uri, entry["rows"], fingerprint)
+                touched += 1
+        return touched
+
+    def works_for(self, entity_uri: str, exclude: str | None = None) -> List[Tuple[str, List[str]]]:
+        """(work uri, sorted roles) of every indexed work linked to the entity."""
+        with self._lock:
+            postings = list(self._works.get(entity_uri, {}).items())
+        return sorted((work, sorted(roles)) for work, roles in postings if work != exclude)
+
+    def __contains__(self, entity_uri: str) -> bool:
+        with self._lock:
+            return entity_uri in self._works
+
+    @property
+    def work_count(self) -> int:
+        with self._lock:
+            return len(self._entities)
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": EntityIndex(), "snapshot": None}
+
+
+def entity_index(snapshot=None) -> EntityIndex:
+    """The process-wide index, synced whenever a different snapshot is passed."""
+    with _lock:
+        index = _index["index"]
+        if snapshot is not None and snapshot is not _index["snapshot"]:
+            index.sync(snapshot)
+            _index["snapshot"] = snapshot
+        return index
+
+
+def index_work(work_uri: str, rows: List[Dict]) -> None:
+    """Add a work loaded live (not from the snapshot) to the index."""
+    with _lock:
+        _index["index"].add_work(work_uri, rows)
@@ -0,0 +1,117 @@
+"""
+Faceted filtering of the works list without the endpoint: every venue,
+year and discipline keyword maps to a bitmap over work positions (a
+Python int, bit i = works[i]). Filters are ANDs of bitmaps and the count
+of a facet value is a popcount, so a filter change costs microseconds.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+FACETS = ("venue", "year", "keyword")
+# a work has at most one venue and year; counts for these ignore their own
+# selection (they are alternatives), keyword counts narrow the selection
+SINGLE_VALUED = ("venue", "year")
+
+Selection = Dict[str, Iterable[str]]
+
+
+def _facet_values(work: Dict, facet: str) -> List[str]:
+    if facet == "keyword":
+        return work.get("keywords") or []
+    value = work.get(facet)
+    return [value] if value else []
+
+
+class FacetIndex:
+    """Bitmaps of the works having each facet value."""
+
+    def __init__(self, works: List[Dict]):
+        self.works = works
+        n = len(works)
+        self.all = (1 << n) - 1
+        self._bitmaps: Dict[str, Dict[str, int]] = {}
+        for facet in FACETS:
+            positions = defaultdict(list)
+            for i, w in enumerate(works):
+                for value in _facet_values(w, facet):
+                    positions[value].append(i)
+            self._bitmaps[facet] = {value: _bitmap(n, ids) for value, ids in positions.items()}
+
+    def values(self, facet: str) -> List[str]:
+        return list(self._bitmaps[facet])
+
+    def bitmap(self, facet: str, value: str) -> int:
+        return self._bitmaps[facet].get(value, 0)
+
+    def select(self, selection: Selection, skip: str | None = None) -> int:
+        """
+        Works matching the selection: the AND over facets. Several values of
+        a single-valued facet (e.g. a range of years) are alternatives and
+        OR-ed; several keywords must all be present. Facets without a
+        restriction are left out of the selection (an empty list matches nothing).
+        """
+        bits = self.all
+        for facet, values in selection.items():
+            if facet == skip:
+                continue
+            if facet in SINGLE_VALUED:
+                either = 0
+                for value in values:
+                    either |= self.bitmap(facet, value)
+                bits &= either
+            else:
+                for value in values:
+                    bits &= self.bitmap(facet, value)
+        return bits
+
+    def counts(self, facet: str, within: int) -> Dict[str, int]:
+        """Number of works in `within` per value of facet."""
+        return {value: (bits & within).bit_count() for value, bits in self._bitmaps[facet].items()}
+
+    def facet_counts(self, selection: Selection) -> Dict[str, Dict[str, int]]:
+        """Live counts for every facet under the current selection."""
+        return {
+            facet: self.counts(facet, self.select(selection, skip=facet if facet in SINGLE_VALUED else None))
+            for facet in FACETS
+        }
+
+    def works_in(self, bits: int) -> List[Dict]:
+        """The works of a bitmap, in their original order."""
+        if bits == self.all:
+            return self.works
+        return [self.works[i] for i in _positions(len(self.works), bits)]
+
+    @staticmethod
+    def size(bits: int) -> int:
+        return bits.bit_count()
+
+
+def _bitmap(n: int, ids: List[int]) -> int:
+    bits = np.zeros(n, dtype=bool)
+    bits[ids] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def _positions(n: int, bits: int) -> List[int]:
+    raw = np.frombuffer(bits.to_bytes((n + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")[:n]).tolist()
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": None, "version": None}
+
+
+def facet_index(works: List[Dict], version: str | None = None) -> FacetIndex:
+    """The index over `works`, rebuilt only when the works (or their version) change."""
+    with _lock:
+        index = _index["index"]
+        # the size guards against a failed (empty) load cached under the version
+        key = (version, len(works))
+        if index is not None and (index.works is works or (version is not None and key == _index["version"])):
+            return index
+        index = FacetIndex(works)
+        _index.update(index=index, version=key)
+        return index
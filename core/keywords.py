@@ -0,0 +1,166 @@
+"""
+Discipline keyword frequencies for the keyword cloud, kept locally instead
+of a GROUP BY over every work per page load. The corpus-wide counts are
+maintained incrementally by diffing the works list; counts for a facet
+selection come from the facet bitmaps.
+
+Also the keyword co-occurrence network (Kᵀ·K of the work × keyword
+incidence matrix K), for the keyword overview.
+"""
+import heapq
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config.settings import KEYWORD_GRAPH_MAX_KEYWORDS, KEYWORD_GRAPH_MIN_COUNT, KEYWORD_GRAPH_MIN_PMI
+from core.citation_graph import _ranges
+from core.facets import FacetIndex, Selection
+
+# ---------------------------
+# frequencies
+# ---------------------------
+
+class KeywordIndex:
+    """Number of works per discipline keyword."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self._keywords: Dict[str, Tuple[str, ...]] = {}
+
+    def update(self, works: List[Dict]) -> int:
+        """Apply the works that were added, removed or re-tagged; returns how many changed."""
+        current = {w["uri"]: tuple(sorted(set(w.get("keywords") or []))) for w in works}
+        changed = 0
+        for uri in self._keywords.keys() - current.keys():
+            self.counts.subtract(self._keywords.pop(uri))
+            changed += 1
+        for uri, keywords in current.items():
+            old = self._keywords.get(uri)
+            if old == keywords:
+                continue
+            if old:
+                self.counts.subtract(old)
+            self.counts.update(keywords)
+            self._keywords[uri] = keywords
+            changed += 1
+        if changed:
+            self.counts = +self.counts  # drop keywords that reached zero
+        return changed
+
+    def top(self, limit: int = 30) -> List[Dict]:
+        """Same shape as core.work_graph.get_top_keywords."""
+        return [{"uri": uri, "count": count} for uri, count in self.counts.most_common(limit)]
+
+
+def top_keywords_in(facets: FacetIndex, selection: Selection, limit: int = 30) -> List[Dict]:
+    """Top keywords among the works of a facet selection (e.g. venue X in 2023)."""
+    counts = facets.counts("keyword", facets.select(selection))
+    best = heapq.nlargest(limit, ((c, uri) for uri, c in counts.items() if c))
+    return [{"uri": uri, "count": count} for count, uri in best]
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": KeywordIndex(), "version": None}
+
+
+def top_keywords(works: List[Dict], facets: FacetIndex, selection: Selection | None = None,
+                 version: str | None = None, limit: int = 30) -> List[Dict]:
+    """
+    Keyword cloud entries: corpus-wide from the incremental index, or for
+    the facet selection when one is given.
+    """
+    if selection:
+        return top_keywords_in(facets, selection, limit)
+    with _lock:
+        key = (version, len(works))
+        if version is None or key != _index["version"]:
+            _index["index"].update(works)
+            _index["version"] = key
+        return _index["index"].top(limit)
+
+
+# ---------------------------
+# co-occurrence network
+# ---------------------------
+
+def incidence_pairs(rows: np.ndarray, cols: np.ndarray, n_rows: int, n_cols: int):
+    """
+    Off-diagonal upper triangle of Mᵀ·M for the 0/1 incidence matrix with
+    entries (rows, cols), as (i, j, count) arrays with i < j. Computed by
+    pairing up the columns of every row (no sparse library needed).
+    """
+    order = np.lexsort((cols, rows))
+    rows, cols = rows[order], cols[order]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    a = np.repeat(cols, np.diff(indptr)[rows])
+    b = cols[_ranges(indptr, rows)[1]]
+    upper = a < b
+    pairs, counts = np.unique(a[upper] * n_cols + b[upper], return_counts=True)
+    return pairs // n_cols, pairs % n_cols, counts
+
+
+def cooccurrence(
+    works: List[Dict],
+    max_keywords: int = KEYWORD_GRAPH_MAX_KEYWORDS,
+    min_count: int = KEYWORD_GRAPH_MIN_COUNT,
+    min_pmi: float = KEYWORD_GRAPH_MIN_PMI,
+):
+    """
+    Co-occurrence network of the max_keywords most frequent keywords:
+
+        nodes: [{"uri", "count"}]                  (works per keyword)
+        edges: [{"source", "target", "count", "pmi"}]
+
+    An edge needs at least min_count shared works and a pointwise mutual
+    information log(n·c_ij / (c_i·c_j)) of at least min_pmi, so pairs that
+    co-occur only as often as chance would have it are left out.
+    """
+    ids: Dict[str, int] = {}
+    rows, cols = [], []
+    for i, w in enumerate(works):
+        for kw in set(w.get("keywords") or []):
+            rows.append(i)
+            cols.append(ids.setdefault(kw, len(ids)))
+    if not ids:
+        return [], []
+    keywords = list(ids)
+    rows, cols = np.array(rows), np.array(cols)
+
+    freq = np.bincount(cols, minlength=len(keywords))
+    kept = np.argsort(-freq, kind="stable")[:max_keywords]
+    keep = np.zeros(len(keywords), bool)
+    keep[kept] = True
+    rows, cols = rows[keep[cols]], cols[keep[cols]]
+
+    n = len(works)
+    nodes = [{"uri": keywords[k], "count": int(freq[k])} for k in kept.tolist()]
+    edges = []
+    for i, j, count in zip(*(x.tolist() for x in incidence_pairs(rows, cols, n, len(keywords)))):
+        if count < min_count:
+            continue
+        pmi = math.log(n * count / (freq[i] * freq[j]))
+        if pmi >= min_pmi:
+            edges.append({"source": keywords[i], "target": keywords[j], "count": count, "pmi": pmi})
+    return nodes, edges
+
+
+_graph_lock = threading.Lock()
+_graphs: Dict[Tuple, Tuple] = {}
+
+
+def keyword_network(works: List[Dict], version: str | None = None):
+    """cooccurrence() over the whole corpus, kept for the newest dataset version."""
+    key = (version, len(works))
+    with _graph_lock:
+        if version is not None and key in _graphs:
+            return _graphs[key]
+    network = cooccurrence(works)
+    if version is not None:
+        with _graph_lock:
+            _graphs.clear()
+            _graphs[key] = network
+    return network
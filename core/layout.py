@@ -0,0 +1,278 @@
+"""
+Server-side graph layout, so the browser gets positioned nodes and can
+render with physics off.
+
+Vectorized Fruchterman-Reingold: exact all-pairs repulsion for small
+graphs and, beyond EXACT_REPULSION_LIMIT nodes, a grid approximation
+(other cells act through their centroid, nodes sharing a cell repel
+exactly). Layouts are cached per graph content, and each graph name
+remembers its last positions (per session, for a bounded number of
+graphs) so a filtered or extended graph starts from where its nodes
+already were instead of jumping around.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+
+from config.settings import LAYOUT_CACHE_SIZE, LAYOUT_ITERATIONS, LAYOUT_WARM_MAX_NEW, LAYOUT_WARM_STARTS
+
+EXACT_REPULSION_LIMIT = 500
+# pixels between adjacent nodes in the returned coordinates
+NODE_SPACING = 120.0
+
+Position = Tuple[float, float]
+
+# ---------------------------
+# forces
+# ---------------------------
+
+def _pairwise(pos: np.ndarray, other: np.ndarray, weight: np.ndarray, k: float) -> np.ndarray:
+    """Sum over `other` of weight * k^2 / d along the unit vector, i.e. weight * k^2 * delta / d^2."""
+    dx = pos[:, 0, None] - other[None, :, 0]
+    dy = pos[:, 1, None] - other[None, :, 1]
+    w = weight * (k * k) / np.maximum(dx * dx + dy * dy, 1e-4)
+    return np.stack([(dx * w).sum(1), (dy * w).sum(1)], axis=1)
+
+
+def _exact_repulsion(pos: np.ndarray, k: float, rows: np.ndarray | None = None, chunk: int = 1024) -> np.ndarray:
+    """Repulsion on `rows` (default: every node) from all nodes."""
+    ones = np.ones(len(pos))
+    disp = np.zeros_like(pos)
+    rows = np.arange(len(pos)) if rows is None else rows
+    for start in range(0, len(rows), chunk):
+        part = rows[start:start + chunk]
+        disp[part] = _pairwise(pos[part], pos, ones, k)
+    return disp
+
+
+def _grid_repulsion(pos: np.ndarray, k: float, cells: int, max_pairs: int = 2_000_000) -> np.ndarray:
+    lo = pos.min(0)
+    extent = np.maximum(pos.max(0) - lo, 1e-9)
+    # refine the grid until the exact near field stays affordable
+    while True:
+        cell_xy = np.minimum(((pos - lo) / (extent / cells)).astype(np.int64), cells - 1)
+        cell = cell_xy[:, 0] * cells + cell_xy[:, 1]
+        counts = np.bincount(cell, minlength=cells * cells)
+        if (counts ** 2).sum() <= max_pairs or cells >= 256:
+            break
+        cells *= 2
+
+    occupied = np.nonzero(counts)[0]
+    mass = counts[occupied].astype(float)
+    centroids = np.stack([
+        np.bincount(cell, weights=pos[:, d], minlength=cells * cells)[occupied] for d in (0, 1)
+    ], axis=1) / mass[:, None]
+    own = np.searchsorted(occupied, cell)
+
+    # far field: every other occupied cell as one heavy node at its centroid
+    disp = np.zeros_like(pos)
+    for start in range(0, len(pos), 1024):
+        rows = slice(start, start + 1024)
+        weight = np.broadcast_to(mass, (len(pos[rows]), len(mass))).copy()
+        weight[np.arange(len(weight)), own[rows]] = 0.0
+        disp[rows] = _pairwise(pos[rows], centroids, weight, k)
+
+    # near field: exact over every pair of nodes sharing a cell
+    order = np.argsort(cell, kind="stable")
+    cell_start = np.searchsorted(cell[order], occupied)
+    reps = counts[cell[order]]
+    first = np.repeat(np.arange(len(pos)), reps)
+    offset = np.arange(reps.sum()) - np.repeat(np.cumsum(reps) - reps, reps)
+    second = np.repeat(cell_start[own[order]], reps) + offset
+    a, b = order[first], order[second]
+    keep = a != b
+    a, b = a[keep], b[keep]
+
+    delta = pos[a] - pos[b]
+    force = delta * (k * k / np.maximum((delta ** 2).sum(1), 1e-4))[:, None]
+    for d in (0, 1):
+        disp[:, d] += np.bincount(a, weights=force[:, d], minlength=len(pos))
+    return disp
+
+
+def _seed_from_neighbours(pos: np.ndarray, known: np.ndarray, src: np.ndarray, dst: np.ndarray,
+                          rng: np.random.Generator, rounds: int = 5) -> None:
+    """
+    Move unknown rows to the centroid of their known neighbours (plus a
+    little jitter), round by round, so chains of new nodes follow the nodes
+    they hang off. Rows without any placed neighbour keep their position.
+    """
+    known = known.copy()
+    a, b = np.concatenate([src, dst]), np.concatenate([dst, src])
+    for _ in range(rounds):
+        use = ~known[a] & known[b]
+        if not use.any():
+            break
+        count = np.bincount(a[use], minlength=len(pos))
+        seeded = np.flatnonzero(count)
+        for d in (0, 1):
+            total = np.bincount(a[use], weights=pos[b[use], d], minlength=len(pos))
+            pos[seeded, d] = total[seeded] / count[seeded]
+        pos[seeded] += rng.normal(0, 0.1, (len(seeded), 2))
+        known[seeded] = True
+
+
+def _iterate(pos, src, dst, movable, temperature, iterations, k, side, cells) -> None:
+    """`iterations` Fruchterman-Reingold steps of the movable rows, cooling linearly from `temperature`."""
+    rows = np.flatnonzero(movable)
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        if len(pos) <= EXACT_REPULSION_LIMIT:
+            disp = _exact_repulsion(pos, k, rows)
+        else:
+            disp = _grid_repulsion(pos, k, cells)
+
+        delta = pos[src] - pos[dst]
+        dist = np.maximum(np.linalg.norm(delta, axis=1), 1e-4)
+        pull = delta * (dist / k)[:, None]          # d^2 / k along the unit vector
+        np.add.at(disp, src, -pull)
+        np.add.at(disp, dst, pull)
+
+        # weak gravity keeps disconnected components on screen
+        disp -= 0.05 * pos * np.linalg.norm(pos, axis=1, keepdims=True) / side
+
+        length = np.maximum(np.linalg.norm(disp, axis=1, keepdims=True), 1e-9)
+        step = disp / length * np.minimum(length, temperature)
+        pos[rows] += step[rows]
+        temperature -= cooling
+
+
+def fruchterman_reingold(
+    n: int,
+    edges: np.ndarray,
+    iterations: int = LAYOUT_ITERATIONS,
+    init: np.ndarray | None = None,
+    fixed: np.ndarray | None = None,
+    settled: np.ndarray | None = None,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Positions (n, 2) in units of the ideal edge length. `edges` is an (m, 2)
+    int array of node indices; `init` seeds positions (NaN rows start at the
+    centroid of their placed neighbours, or at random); rows with `fixed`
+    set are not moved.
+
+    Rows with `settled` set come from a finished layout (a warm start): the
+    other movable rows first get a full-temperature run with the settled
+    ones held in place, then a short, cool pass relaxes everything.
+    """
+    if n == 0:
+        return np.zeros((0, 2))
+    rng = np.random.default_rng(seed)
+    k = 1.0
+    side = np.sqrt(n) * k
+
+    pos = rng.uniform(-side / 2, side / 2, (n, 2))
+    movable = np.ones(n, bool) if fixed is None else ~fixed
+
+    src, dst = (edges[:, 0], edges[:, 1]) if len(edges) else (np.zeros(0, int), np.zeros(0, int))
+    if init is not None:
+        known = ~np.isnan(init).any(1)
+        pos[known] = init[known]
+        _seed_from_neighbours(pos, known, src, dst, rng)
+    cells = max(2, int(np.sqrt(n / 8)))
+
+    if settled is None or not settled.any():
+        _iterate(pos, src, dst, movable, side / 10, iterations, k, side, cells)
+        return pos
+
+    # warm start: place the new nodes against the old layout, which stays put ...
+    new = movable & ~settled
+    if new.any():
+        _iterate(pos, src, dst, new, side / 10, iterations, k, side, cells)
+    # ... then settle everything without unfolding the graph again
+    _iterate(pos, src, dst, movable, 0.05 * k, max(1, iterations // 3), k, side, cells)
+    return pos
+
+
+# ---------------------------
+# cached layouts
+# ---------------------------
+
+_lock = threading.Lock()
+_layouts: "OrderedDict[str, Dict[Hashable, Position]]" = OrderedDict()
+# (graph name, scope) -> positions of its last layout (warm start for the
+# next one); scoped per session so one user's graph never seeds another's
+_last: "OrderedDict[Tuple[str, Hashable], Dict[Hashable, Position]]" = OrderedDict()
+
+
+def _remember(name: str, scope: Hashable, positions: Dict[Hashable, Position]) -> None:
+    """Record the last layout of (name, scope); caller holds _lock."""
+    _last[(name, scope)] = positions
+    _last.move_to_end((name, scope))
+    while len(_last) > LAYOUT_WARM_STARTS:
+        _last.popitem(last=False)
+
+
+def layout_key(name: str, node_ids: Iterable[Hashable], edges: Iterable[Tuple[Hashable, Hashable]], extra=()) -> str:
+    """Content key of a graph: same nodes, edges and pins give the same layout."""
+    h = hashlib.sha1(name.encode("utf-8"))
+    for part in (sorted(map(str, node_ids)), sorted(f"{s}\t{t}" for s, t in edges), sorted(map(str, extra))):
+        h.update("\n".join(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def compute_layout(
+    name: str,
+    node_ids: List[Hashable],
+    edges: List[Tuple[Hashable, Hashable]],
+    pinned: Dict[Hashable, Position] | None = None,
+    initial: Dict[Hashable, Position] | None = None,
+    scope: Hashable = None,
+) -> Dict[Hashable, Position]:
+    """
+    Pixel positions {node_id: (x, y)} for a graph, cached per (name, nodes,
+    edges, pins). `pinned` nodes keep the given coordinates; `initial` are
+    starting guesses for nodes the last layout of `name` did not have.
+    Warm starts only come from earlier layouts of the same `scope` (e.g. the
+    session); the content cache is shared.
+    """
+    pinned = pinned or {}
+    initial = initial or {}
+    key = layout_key(name, node_ids, edges, (f"{n}@{x:.0f},{y:.0f}" for n, (x, y) in pinned.items()))
+    with _lock:
+        if key in _layouts:
+            _layouts.move_to_end(key)
+            _remember(name, scope, _layouts[key])
+            return _layouts[key]
+        previous = _last.get((name, scope), {})
+
+    index = {nid: i for i, nid in enumerate(node_ids)}
+    pairs = np.array(
+        [(index[s], index[t]) for s, t in edges if s in index and t in index and s != t],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    init = np.full((len(node_ids), 2), np.nan)
+    fixed = np.zeros(len(node_ids), bool)
+    settled = np.zeros(len(node_ids), bool)
+    jitter = np.random.default_rng(0).normal(0, 0.5, init.shape)
+    for nid, i in index.items():
+        if nid in pinned:
+            init[i] = np.asarray(pinned[nid]) / NODE_SPACING
+            fixed[i] = True
+        elif nid in previous:
+            init[i] = np.asarray(previous[nid]) / NODE_SPACING
+            settled[i] = True
+        elif nid in initial:
+            init[i] = np.asarray(initial[nid]) / NODE_SPACING + jitter[i]
+
+    # mostly new nodes: a warm start would pin the graph to a few old ones,
+    # so lay it out cold (still starting from the known positions)
+    new = (~fixed & ~settled).sum()
+    if new > LAYOUT_WARM_MAX_NEW * max(1, (~fixed).sum()):
+        settled[:] = False
+
+    pos = fruchterman_reingold(len(node_ids), pairs, init=init, fixed=fixed, settled=settled)
+    positions = {nid: (float(x) * NODE_SPACING, float(y) * NODE_SPACING) for nid, (x, y) in zip(node_ids, pos)}
+
+    with _lock:
+        _layouts[key] = positions
+        while len(_layouts) > LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+        _remember(name, scope, positions)
+    return positions
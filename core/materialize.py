@@ -0,0 +1,305 @@
+"""
+Offline materialization of every work neighbourhood into a local snapshot.
+
+    python -m core.materialize --workers 4 --rate 5
+
+Lists all works page by page, fetches each work's local graph (first hop,
+argument and approach neighbourhoods) and the properties of every
+resource in it on a thread pool under a rate limit, and writes a
+versioned, gzip'ed snapshot that app.py serves the work view from.
+
+    python -m core.materialize --incremental
+
+patches the current snapshot instead: only works whose fingerprint
+changed (or that SNAPSHOT_CHANGE_QUERY reports) are fetched again.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from datetime import datetime, timezone
+from typing import Dict, Iterable
+
+from config.settings import IDEA_ENDPOINTS, SNAPSHOT_DIR, SNAPSHOT_CHANGE_QUERY
+from core.dataset_version import dataset_version
+from core.query_builder import define_template, render_query, LITERAL, VALUES
+from core.batch_loader import fetch_grouped
+from core.resource_inspector import get_resource_properties_many
+from core.snapshot import write_snapshot, read_snapshot_file, current_snapshot_file
+from core.sparql_client import sparql, Priority, query_priority, make_endpoint
+from core.work_graph import (
+    get_citation_edges, get_person_names, get_work_local_graph, list_all_works,
+    neighbourhood_loaders, neighbourhood_resources,
+)
+
+# every triple of the resources around a neighbourhood centre (a work, its
+# argument node or its approach node): the centre's own, its objects' and
+# the subjects pointing at it. Each branch binds ?center itself, so the
+# result does not depend on how the engine joins VALUES into the UNION.
+define_template("neighbourhood_triples", """
+    SELECT DISTINCT ?center ?r ?p ?o
+    WHERE {
+        VALUES ?center { $centers }
+
+        { ?center ?p ?o . BIND(?center AS ?r) }
+        UNION
+        { ?center ?p1 ?r . FILTER(isIRI(?r)) ?r ?p ?o }
+        UNION
+        { ?r ?p1 ?center . ?r ?p ?o }
+    }
+    """, centers=VALUES)
+
+# works per fingerprint query (three VALUES entries each)
+FINGERPRINT_BATCH = 50
+
+if SNAPSHOT_CHANGE_QUERY:
+    define_template("changed_works", SNAPSHOT_CHANGE_QUERY, since=LITERAL)
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_work_entry(endpoint, work_uri: str, limiter: RateLimiter, loaders=None):
+    """Local graph of one work plus the properties of every resource in it."""
+    limiter.acquire()
+    is_skeleton, rows = get_work_local_graph(endpoint, work_uri, loaders=loaders)
+
+    limiter.acquire()
+    props = get_resource_properties_many(endpoint, neighbourhood_resources(work_uri, rows))
+    properties = {
+        uri: [{"p": r["p"], "o": r["o"]} for r in prop_rows]
+        for uri, prop_rows in props.items()
+    }
+    return {"skeleton": is_skeleton, "rows": rows}, properties
+
+
+def _term(binding: Dict) -> list:
+    """A result binding as comparable parts; blank node labels are not stable, so they are dropped."""
+    if binding["type"] == "bnode":
+        return ["bnode"]
+    return [binding["type"], binding["value"], binding.get("xml:lang", ""), binding.get("datatype", "")]
+
+
+def work_fingerprints(endpoint, uris: Iterable[str]) -> Dict[str, str]:
+    """
+    Per-work content hash: SHA1 over the sorted triples of every resource
+    in the neighbourhood fetch_work_entry materializes (first hop, argument
+    and approach nodes, their properties), so any edit there changes it.
+    Fetched FINGERPRINT_BATCH works per query, sorted and hashed here.
+    """
+    uris = list(uris)
+    fingerprints = {}
+    for start in range(0, len(uris), FINGERPRINT_BATCH):
+        centers = {}
+        for uri in uris[start:start + FINGERPRINT_BATCH]:
+            for center in (uri, f"{uri}_research_problem", f"{uri}_research_approach"):
+                centers[center] = uri
+        grouped = fetch_grouped(endpoint, "neighbourhood_triples", "centers", "center", centers, cache=False)
+
+        triples = {uri: set() for uri in centers.values()}
+        for center, rows in grouped.items():
+            triples[centers[center]].update(
+                json.dumps([r["r"]["value"], r["p"]["value"], *_term(r["o"])]) for r in rows
+            )
+        for uri, lines in triples.items():
+            fingerprints[uri] = hashlib.sha1("\n".join(sorted(lines)).encode("utf-8")).hexdigest()
+    return fingerprints
+
+
+def changed_works(endpoint, since: str) -> set:
+    """Works SNAPSHOT_CHANGE_QUERY reports as modified after `since` (ISO timestamp)."""
+    rows = sparql(endpoint, render_query("changed_works", since=since))
+    return {r["work"]["value"] for r in rows if "work" in r}
+
+
+def fetch_entries(endpoint, uris: Iterable[str], workers: int, rate: float):
+    """Fetch the snapshot entries of uris on a rate-limited pool: (neighbourhoods, properties, failed)."""
+    uris = list(uris)
+    limiter = RateLimiter(rate, burst=workers)
+    neighbourhoods, properties, failed = {}, {}, []
+    # shared by the workers, so their 2-/3-hop lookups are batched together
+    loaders = neighbourhood_loaders(endpoint)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            # copy_context: the pool threads keep BACKGROUND priority
+            pool.submit(copy_context().run, fetch_work_entry, endpoint, uri, limiter, loaders): uri
+            for uri in uris
+        }
+        for i, fut in enumerate(as_completed(futures), 1):
+            uri = futures[fut]
+            try:
+                entry, props = fut.result()
+            except Exception as e:
+                logging.error(f"failed to materialize {uri}: {e}")
+                failed.append(uri)
+                continue
+            neighbourhoods[uri] = entry
+            properties.update(props)
+            if i % 50 == 0:
+                logging.info(f"{i}/{len(uris)} works done")
+
+    if failed:
+        logging.warning(f"{len(failed)} works could not be fetched and are served live")
+    return neighbourhoods, properties, failed
+
+
+def materialize(
+    endpoint,
+    directory: str = SNAPSHOT_DIR,
+    workers: int = 4,
+    rate: float = 5.0,
+    page_size: int = 500,
+    max_works: int | None = None,
+) -> str:
+    started = time.monotonic()
+    version = dataset_version(endpoint)
+
+    with query_priority(Priority.BACKGROUND):
+        works = list_all_works(endpoint, page_size, max_works)
+        citations = get_citation_edges(endpoint)
+        people = get_person_names(endpoint)
+        # refresh() only compares fingerprints without a change query
+        fingerprints = {} if SNAPSHOT_CHANGE_QUERY else work_fingerprints(endpoint, [w["uri"] for w in works])
+        logging.info(f"materializing {len(works)} works, {len(citations)} citations")
+
+        neighbourhoods, properties, _ = fetch_entries(endpoint, [w["uri"] for w in works], workers, rate)
+
+    path = write_snapshot({
+        "version": version,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "endpoint": str(endpoint),
+        "works": works,
+        "citations": citations,
+        "people": people,
+        "fingerprints": {w["uri"]: fingerprints.get(w["uri"]) for w in works},
+        "neighbourhoods": neighbourhoods,
+        "properties": properties,
+    }, directory)
+    logging.info(f"materialized {len(neighbourhoods)} works in {time.monotonic() - started:.0f}s")
+    return path
+
+
+def refresh(
+    endpoint,
+    directory: str = SNAPSHOT_DIR,
+    workers: int = 4,
+    rate: float = 5.0,
+    page_size: int = 500,
+) -> str:
+    """
+    Patch the current snapshot: re-fetch only works that are new, changed
+    (by fingerprint, or per SNAPSHOT_CHANGE_QUERY when configured) or
+    missing from the last run, and drop works that are gone. The work
+    listing and citation edges are one query each and are replaced whole.
+    Falls back to a full materialize() without a usable snapshot.
+    """
+    path = current_snapshot_file(directory)
+    old = read_snapshot_file(path) if path else None
+    if old is None or ("fingerprints" not in old and not SNAPSHOT_CHANGE_QUERY):
+        logging.info("no snapshot to refresh incrementally; materializing everything")
+        return materialize(endpoint, directory, workers, rate, page_size)
+
+    started = time.monotonic()
+    version = dataset_version(endpoint)
+    old_fingerprints = old.get("fingerprints", {})
+    neighbourhoods = old.get("neighbourhoods", {})
+
+    with query_priority(Priority.BACKGROUND):
+        works = list_all_works(endpoint, page_size)
+        uris = {w["uri"] for w in works}
+
+        # the change query is the cheaper signal, so fingerprints are not
+        # fetched alongside it; turning it off later re-fetches every work once
+        if SNAPSHOT_CHANGE_QUERY:
+            fingerprints = {}
+            changed = changed_works(endpoint, old.get("created") or "") & uris
+        else:
+            fingerprints = work_fingerprints(endpoint, uris)
+            changed = {u for u in uris if fingerprints.get(u) != old_fingerprints.get(u)}
+        changed |= uris - neighbourhoods.keys()
+        removed = neighbourhoods.keys() - uris
+
+        if not changed and not removed and version == old.get("version"):
+            logging.info("snapshot is up to date")
+            return path
+
+        logging.info(f"refreshing {len(changed)} changed works, dropping {len(removed)}")
+        citations = get_citation_edges(endpoint)
+        people = get_person_names(endpoint)
+        fresh, props, _ = fetch_entries(endpoint, changed, workers, rate)
+
+    for uri in changed | removed:
+        neighbourhoods.pop(uri, None)
+    neighbourhoods.update(fresh)
+
+    # keep properties only for resources some work still shows
+    properties = old.get("properties", {})
+    properties.update(props)
+    referenced = set()
+    for uri, entry in neighbourhoods.items():
+        referenced.update(neighbourhood_resources(uri, entry["rows"]))
+    properties = {uri: rows for uri, rows in properties.items() if uri in referenced}
+
+    path = write_snapshot({
+        **old,
+        "version": version,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "works": works,
+        "citations": citations,
+        "people": people,
+        "fingerprints": {uri: fingerprints.get(uri) for uri in uris},
+        "neighbourhoods": neighbourhoods,
+        "properties": properties,
+    }, directory)
+    logging.info(f"refreshed {len(fresh)} works in {time.monotonic() - started:.0f}s")
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Materialize all work neighbourhoods into a local snapshot.")
+    parser.add_argument("--endpoint", action="append", help="SPARQL endpoint (repeat for replicas); default IDEA_ENDPOINTS")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=5.0, help="query batches per second (0 = unlimited)")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--max-works", type=int, default=None)
+    parser.add_argument("--incremental", action="store_true", help="patch the current snapshot with changed works only")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    endpoint = make_endpoint(args.endpoint or IDEA_ENDPOINTS)
+    if args.incremental:
+        refresh(endpoint, args.out, args.workers, args.rate, args.page_size)
+    else:
+        materialize(endpoint, args.out, args.workers, args.rate, args.page_size, args.max_works)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+
+from config.settings import POPULARITY_FILE, POPULARITY_HALF_LIFE, PREWARM_TOP_N
+from core.dataset_version import on_version_change
+from core.resource_inspector import get_resource_properties, get_resource_properties_many
+from core.sparql_client import Priority, query_priority, detached, EndpointError, SchedulerBusy
+from core.work_graph import get_work_local_graph, neighbourhood_resources
+
+# ---------------------------
+# decayed popularity
+# ---------------------------
+
+class PopularityTracker:
+    """
+    Exponentially decayed open counts per uri, kept separately per kind
+    ("work" or "node"). A hit is worth 1 now and half of that after
+    `half_life` seconds. Scores are saved to `path` so a restart keeps them.
+    """
+
+    def __init__(self, path: str = POPULARITY_FILE, half_life: float = POPULARITY_HALF_LIFE, save_every: float = 30.0):
+        self.path = path
+        self.half_life = half_life
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        # kind -> uri -> [score, updated_at]
+        self._scores = {}
+        self._last_save = 0.0
+        self.load()
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def record(self, uri: str, kind: str = "work") -> None:
+        if not uri:
+            return
+        now = time.time()
+        with self._lock:
+            entries = self._scores.setdefault(kind, {})
+            score, updated_at = entries.get(uri, (0.0, now))
+            entries[uri] = [self._decayed(score, updated_at, now) + 1.0, now]
+            due = now - self._last_save >= self.save_every
+        if due:
+            self.save()
+
+    def top(self, n: int, kind: str = "work") -> list:
+        now = time.time()
+        with self._lock:
+            entries = self._scores.get(kind, {})
+            ranked = sorted(
+                ((self._decayed(s, t, now), uri) for uri, (s, t) in entries.items()),
+                reverse=True,
+            )
+        return [uri for _, uri in ranked[:n]]
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"could not load popularity file {self.path}: {e}")
+            return
+        with self._lock:
+            self._scores = {kind: {uri: list(v) for uri, v in entries.items()} for kind, entries in data.items()}
+
+    def save(self) -> None:
+        with self._lock:
+            data = {kind: dict(entries) for kind, entries in self._scores.items()}
+            self._last_save = time.time()
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.error(f"could not save popularity file {self.path}: {e}")
+
+
+popularity = PopularityTracker()
+
+# ---------------------------
+# background warmer
+# ---------------------------
+
+class CacheWarmer:
+    """
+    Re-runs the work view's queries for the most popular works (and the
+    property lookups of the most popular nodes) at BACKGROUND priority, so
+    their results sit in the query result cache before anyone clicks.
+    Runs once after start-up and again whenever the dataset version changes.
+
+    Works are warmed `workers` at a time. Each issues the same per-work
+    queries as the work view: batching lookups across works would cache
+    VALUES queries that no click ever repeats.
+    """
+
+    def __init__(self, endpoint, tracker: PopularityTracker = popularity, top_n: int = PREWARM_TOP_N,
+                 workers: int = 4):
+        self.endpoint = endpoint
+        self.tracker = tracker
+        self.top_n = top_n
+        self.workers = workers
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+        self._thread.start()
+        self.trigger()
+
+    def trigger(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.warm()
+            except Exception as e:
+                logging.error(f"cache warming failed: {e}")
+
+    def _warm_work(self, work: str) -> None:
+        _, rows = get_work_local_graph(self.endpoint, work)
+        get_resource_properties_many(self.endpoint, neighbourhood_resources(work, rows))
+
+    def warm(self) -> int:
+        """One warming pass; returns the number of works refreshed."""
+        done = 0
+        with query_priority(Priority.BACKGROUND), detached(), \
+                ThreadPoolExecutor(max_workers=self.workers) as pool:
+            # copy_context: the pool threads keep BACKGROUND priority and stay detached
+            futures = [
+                pool.submit(copy_context().run, self._warm_work, work)
+                for work in self.tracker.top(self.top_n, "work")
+            ]
+            try:
+                for fut in as_completed(futures):
+                    fut.result()
+                    done += 1
+                for node in self.tracker.top(self.top_n, "node"):
+                    get_resource_properties(self.endpoint, node)
+            except (EndpointError, SchedulerBusy) as e:
+                # the endpoint is busy with real users; try again on the next trigger
+                logging.info(f"cache warming stopped after {done} works: {e}")
+            finally:
+                for fut in futures:
+                    fut.cancel()
+        logging.info(f"cache warming refreshed {done} works")
+        return done
+
+
+_warmers: dict = {}
+_warmers_lock = threading.Lock()
+
+
+def start_warmer(endpoint) -> CacheWarmer:
+    """Start (once per process) the warmer for endpoint."""
+    with _warmers_lock:
+        warmer = _warmers.get(endpoint)
+        if warmer is None:
+            warmer = _warmers[endpoint] = CacheWarmer(endpoint)
+            warmer.start()
+        return warmer
+
+
+def _rewarm(endpoint, old, new):
+    warmer = _warmers.get(endpoint)
+    if warmer is not None:
+        warmer.trigger()
+
+
+on_version_change(_rewarm)
@@ -1,12 +1,196 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
 from config.settings import PREFIXES
 
-def prefix_block():
-    lines = [f"PREFIX {p}: <{uri}>" for p, uri in PREFIXES.items()]
+# ---------------------------
+# prefix handling
+# ---------------------------
+
+# IRIs, string literals and comments are stripped before looking for
+# prefixed names, so "http:" inside <...> or "a:b" inside "..." never
+# pulls in a PREFIX line.
+_IRI_REF = re.compile(r"<[^<>\"{}|^`\\\s]*>")
+_STRING = re.compile(r"\"(?:[^\"\\\n]|\\.)*\"|'(?:[^'\\\n]|\\.)*'")
+_COMMENT = re.compile(r"#[^\n]*")
+_PREFIXED_NAME = re.compile(r"(?<![\w?$:.-])([A-Za-z][\w.-]*)?:")
+
+
+def used_prefixes(body: str) -> list[str]:
+    """
+    Return the known prefixes referenced in a query body,
+    in the order they are declared in config.settings.PREFIXES.
+    """
+    text = _IRI_REF.sub(" ", body)
+    text = _STRING.sub(" ", text)
+    text = _COMMENT.sub(" ", text)
+    found = {m.group(1) for m in _PREFIXED_NAME.finditer(text) if m.group(1)}
+    return [p for p in PREFIXES if p in found]
+
+
+def prefix_block(names=None):
+    if names is None:
+        names = PREFIXES.keys()
+    lines = [f"PREFIX {p}: <{PREFIXES[p]}>" for p in names]
     return "\n".join(lines)
 
+
 def build_query(body: str):
-    return prefix_block() + "\n\n" + body.strip()
+    """Prepend only the PREFIX lines the body actually uses."""
+    body = body.strip()
+    block = prefix_block(used_prefixes(body))
+    if not block:
+        return body
+    return block + "\n\n" + body
+
+
+# ---------------------------
+# term serialization
+# ---------------------------
+
+IRI = "iri"
+LITERAL = "literal"
+VALUES = "values"
+INTEGER = "integer"
+
+_IRI_FORBIDDEN = re.compile(r"[\x00-\x20<>\"{}|^`\\]")
+
+_LITERAL_ESCAPES = {
+    "\\": "\\\\",
+    "\"": "\\\"",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\t": "\\t",
+    "\b": "\\b",
+    "\f": "\\f",
+}
+
+
+def sparql_iri(value: str) -> str:
+    """Serialize an IRI as <...>, rejecting characters IRIREF does not allow."""
+    if not isinstance(value, str) or not value or _IRI_FORBIDDEN.search(value):
+        raise ValueError(f"not a valid IRI: {value!r}")
+    return f"<{value}>"
+
+
+def sparql_literal(value) -> str:
+    """Serialize a plain string literal with all quoting/escapes applied."""
+    text = str(value)
+    return "\"" + "".join(_LITERAL_ESCAPES.get(ch, ch) for ch in text) + "\""
+
+
+def sparql_integer(value) -> str:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"not an integer: {value!r}")
+    return str(value)
+
+
+def sparql_values(values) -> str:
+    """Serialize an iterable of IRIs as the body of a VALUES block."""
+    if isinstance(values, str):
+        values = [values]
+    return " ".join(sparql_iri(v) for v in values)
+
+
+_SERIALIZERS = {
+    IRI: sparql_iri,
+    LITERAL: sparql_literal,
+    VALUES: sparql_values,
+    INTEGER: sparql_integer,
+}
+
 
+# ---------------------------
+# named query templates
+# ---------------------------
+
+class SparqlQuery(str):
+    """
+    Query text that remembers the template it was rendered from.
+    Behaves exactly like the plain string everywhere else.
+    """
+    template: str | None
+
+    def __new__(cls, text: str, template: str | None = None):
+        obj = super().__new__(cls, text)
+        obj.template = template
+        return obj
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    name: str
+    params: tuple[tuple[str, str], ...]
+    # literal text and parameter names, alternating: text, name, text, ...
+    segments: tuple[str, ...]
+
+
+_TEMPLATES: dict[str, tuple[str, dict[str, str]]] = {}
+
+
+def define_template(name: str, body: str, **params: str) -> str:
+    """
+    Register a named query template.
+
+    Parameters are referenced in the body as $name and declared with
+    their kind (IRI, LITERAL, VALUES or INTEGER), e.g.
+
+        define_template("props", "SELECT ?p ?o WHERE { $s ?p ?o }", s=IRI)
+
+    Only declared names are substituted, so ordinary $vars stay intact.
+    """
+    for param, kind in params.items():
+        if kind not in _SERIALIZERS:
+            raise ValueError(f"unknown parameter kind {kind!r} for ${param}")
+        if not re.search(rf"\${param}\b", body):
+            raise ValueError(f"template {name!r} does not use ${param}")
+    _TEMPLATES[name] = (body, dict(params))
+    compile_template.cache_clear()
+    return name
+
+
+@lru_cache(maxsize=None)
+def compile_template(name: str) -> CompiledTemplate:
+    body, params = _TEMPLATES[name]
+    text = build_query(body)
+
+    if params:
+        names = "|".join(sorted(params, key=len, reverse=True))
+        segments = tuple(re.split(rf"\$({names})\b", text))
+    else:
+        segments = (text,)
+
+    return CompiledTemplate(
+        name=name,
+        params=tuple(params.items()),
+        segments=segments,
+    )
+
+
+def render_query(name: str, **values) -> SparqlQuery:
+    """Bind parameter values into a compiled template."""
+    tpl = compile_template(name)
+    kinds = dict(tpl.params)
+
+    missing = kinds.keys() - values.keys()
+    extra = values.keys() - kinds.keys()
+    if missing or extra:
+        raise ValueError(
+            f"template {name!r}: missing {sorted(missing)}, unexpected {sorted(extra)}"
+        )
+
+    bound = {p: _SERIALIZERS[kind](values[p]) for p, kind in kinds.items()}
+    parts = [
+        seg if i % 2 == 0 else bound[seg]
+        for i, seg in enumerate(tpl.segments)
+    ]
+    return SparqlQuery("".join(parts), name)
+
+
+# ---------------------------
+# display helpers
+# ---------------------------
 
 def replace_prefixes_if_uri(uri: str) -> str:
     if not uri or not isinstance(uri, str):
@@ -18,5 +202,3 @@ def replace_prefixes_if_uri(uri: str) -> str:
 
 def is_resource(value: str) -> bool:
     return value.startswith("http://") or value.startswith("https://")
-
-
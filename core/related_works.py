@@ -0,0 +1,153 @@
+"""
+Related works from the citation graph, precomputed so a click is a dict
+lookup:
+
+    coupling    (A·Aᵀ)  works sharing references with a work
+    co-citation (Aᵀ·A)  works cited together with it
+
+where A is the citing -> cited adjacency. Only the top-k per work are kept.
+"""
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from config.settings import RELATED_WORKS_TOP_K, RELATED_WORKS_MAX_FANOUT
+from core.citation_graph import CitationGraph, _ranges
+
+Related = List[Tuple[str, int]]
+
+
+def shared_neighbour_top_k(
+    first_ptr: np.ndarray, first_idx: np.ndarray,
+    second_ptr: np.ndarray, second_idx: np.ndarray,
+    rows: np.ndarray, k: int, max_fanout: int, chunk_pairs: int = 4_000_000,
+) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Top-k of row i of M·Mᵀ for the given rows: the nodes j reachable as
+    i -first-> c -second-> j, ranked by the number of such c. Middle nodes
+    with more than max_fanout second-step neighbours are skipped (they
+    relate everything to everything).
+    """
+    fanout = np.diff(second_ptr)
+    result: Dict[int, List[Tuple[int, int]]] = {}
+
+    # group rows into chunks whose expansion stays under chunk_pairs
+    owner, position = _ranges(first_ptr, rows)
+    middle = first_idx[position]
+    useful = fanout[middle] <= max_fanout
+    owner, middle = owner[useful], middle[useful]
+    cost = np.cumsum(fanout[middle])
+    bounds = np.searchsorted(cost, np.arange(chunk_pairs, cost[-1] + chunk_pairs, chunk_pairs)) if len(cost) else []
+
+    start = 0
+    for end in list(bounds) + [len(owner)]:
+        # never split one row across chunks
+        while end < len(owner) and end > 0 and owner[end] == owner[end - 1]:
+            end += 1
+        if end <= start:
+            continue
+        o, m = owner[start:end], middle[start:end]
+        _, pos = _ranges(second_ptr, m)
+        i = np.repeat(o, fanout[m])
+        j = second_idx[pos]
+        keep = i != j
+        i, j = i[keep], j[keep]
+
+        n = len(second_ptr) - 1
+        keys, counts = np.unique(i * n + j, return_counts=True)
+        i, j = keys // n, keys % n
+        order = np.lexsort((j, -counts, i))
+        i, j, counts = i[order], j[order], counts[order]
+        row_start = np.r_[0, np.nonzero(i[1:] != i[:-1])[0] + 1]
+        rank = np.arange(len(i)) - np.repeat(row_start, np.diff(np.r_[row_start, len(i)]))
+        top = rank < k
+        for a, b, c in zip(i[top].tolist(), j[top].tolist(), counts[top].tolist()):
+            result.setdefault(a, []).append((b, c))
+        start = end
+    return result
+
+
+class RelatedWorksIndex:
+    """Top-k coupled and co-cited works per work, for O(1) lookup."""
+
+    def __init__(self, graph: CitationGraph, k: int = RELATED_WORKS_TOP_K, max_fanout: int = RELATED_WORKS_MAX_FANOUT):
+        self.graph = graph
+        self.k = k
+        self.max_fanout = max_fanout
+        self._coupling: Dict[str, Related] = {}
+        self._cocitation: Dict[str, Related] = {}
+
+    @classmethod
+    def build(cls, citations: List[Dict], **kwargs) -> "RelatedWorksIndex":
+        index = cls(CitationGraph.from_citations(citations), **kwargs)
+        index._recompute(np.arange(len(index.graph)), np.arange(len(index.graph)))
+        return index
+
+    def _recompute(self, coupling_rows: np.ndarray, cocitation_rows: np.ndarray) -> None:
+        g, nodes = self.graph, self.graph.nodes
+        # coupling: i cites c, c is cited by j
+        coupling = shared_neighbour_top_k(
+            g.out_indptr, g.out_indices, g.in_indptr, g.in_indices, coupling_rows, self.k, self.max_fanout,
+        )
+        # co-citation: i is cited by c, c cites j
+        cocitation = shared_neighbour_top_k(
+            g.in_indptr, g.in_indices, g.out_indptr, g.out_indices, cocitation_rows, self.k, self.max_fanout,
+        )
+        for rows, table, fresh in ((coupling_rows, self._coupling, coupling), (cocitation_rows, self._cocitation, cocitation)):
+            for i in rows.tolist():
+                related = fresh.get(i)
+                if related:
+                    table[nodes[i]] = [(nodes[j], count) for j, count in related]
+                else:
+                    table.pop(nodes[i], None)
+
+    def update(self, citations: List[Dict]) -> "RelatedWorksIndex":
+        """Bring the index up to date; only rows touched by added citations are recomputed."""
+        grown = self.graph.grow(citations)
+        if grown is None:
+            return RelatedWorksIndex.build(citations, k=self.k, max_fanout=self.max_fanout)
+        graph, fresh = grown
+        if not fresh.any():
+            return self
+
+        updated = RelatedWorksIndex(graph, self.k, self.max_fanout)
+        updated._coupling, updated._cocitation = dict(self._coupling), dict(self._cocitation)
+
+        # a new edge s -> c changes coupling for s and everyone else citing c,
+        # and co-citation for c and everything else s cites
+        src, dst = graph.sources[fresh], graph.targets[fresh]
+        coupling_rows = np.unique(np.concatenate([src, graph.in_indices[_ranges(graph.in_indptr, np.unique(dst))[1]]]))
+        cocitation_rows = np.unique(np.concatenate([dst, graph.out_indices[_ranges(graph.out_indptr, np.unique(src))[1]]]))
+        updated._recompute(coupling_rows, cocitation_rows)
+        logging.info(f"related works updated for {fresh.sum()} new citations")
+        return updated
+
+    def coupled(self, uri: str) -> Related:
+        """Works sharing references with uri, most shared first."""
+        return self._coupling.get(uri, [])
+
+    def cocited(self, uri: str) -> Related:
+        """Works most often cited together with uri."""
+        return self._cocitation.get(uri, [])
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": None, "version": None}
+
+
+def related_works_index(citations: List[Dict], version: str | None = None) -> RelatedWorksIndex:
+    """
+    The process-wide index, updated incrementally to these citations. With
+    a dataset version, citations are only looked at again when it changes.
+    """
+    with _lock:
+        index = _index["index"]
+        # the size guards against a failed (empty) load cached under the version
+        key = (version, len(citations))
+        if index is not None and version is not None and key == _index["version"]:
+            return index
+        index = index.update(citations) if index is not None else RelatedWorksIndex.build(citations)
+        _index.update(index=index, version=key)
+        return index
@@ -1,42 +1,68 @@
-from core.query_builder import build_query
+from core.query_builder import define_template, render_query, LITERAL, VALUES
 from core.sparql_client import sparql
+from core.batch_loader import BatchLoader, fetch_grouped
+from core.triple_store import get_local_store
 
-def search_paper_by_title(endpoint, title):
-    query = build_query(f"""
-    SELECT ?paper ?label WHERE {{
+define_template("search_paper_by_title", """
+    SELECT ?paper ?label WHERE {
         ?paper a idea:Paper ;
                rdfs:label ?label .
-        FILTER(CONTAINS(LCASE(?label), LCASE("{title}")))
-    }}
+        FILTER(CONTAINS(LCASE(?label), LCASE($title)))
+    }
     LIMIT 100
-    """)
-    return sparql(endpoint, query)
+    """, title=LITERAL)
 
-
-def get_venues(endpoint):
-    query = build_query("""
+define_template("venues", """
     SELECT DISTINCT ?venue WHERE {
         ?p a idea:Paper ; idea:hasVenue ?venue .
     }
     """)
-    return sparql(endpoint, query)
 
-
-def get_years(endpoint):
-    query = build_query("""
+define_template("years", """
     SELECT DISTINCT ?year WHERE {
         ?p a idea:Paper ; idea:year ?year .
     }
     ORDER BY DESC(?year)
     """)
+
+define_template("resource_properties", """
+    SELECT ?resource ?p ?o WHERE {
+        VALUES ?resource { $resources }
+        ?resource ?p ?o .
+    }
+    """, resources=VALUES)
+
+
+def search_paper_by_title(endpoint, title):
+    query = render_query("search_paper_by_title", title=title)
+    return sparql(endpoint, query)
+
+
+def get_venues(endpoint):
+    query = render_query("venues")
+    return sparql(endpoint, query)
+
+
+def get_years(endpoint):
+    query = render_query("years")
     return sparql(endpoint, query)
 
 
 def get_resource_properties(endpoint, resource_uri):
-    query = build_query(f"""
-    SELECT ?p ?o WHERE {{
-        <{resource_uri}> ?p ?o .
-    }}
-    """)
+    store = get_local_store()
+    if store is not None:
+        return store.resource_properties(resource_uri)
+    query = render_query("resource_properties", resources=[resource_uri])
     return sparql(endpoint, query)
 
+
+def get_resource_properties_many(endpoint, resource_uris):
+    """Properties of many resources in as few VALUES queries as fit, keyed by uri."""
+    store = get_local_store()
+    if store is not None:
+        return {uri: store.resource_properties(uri) for uri in dict.fromkeys(resource_uris)}
+    return fetch_grouped(endpoint, "resource_properties", "resources", "resource", resource_uris)
+
+
+def resource_properties_loader(endpoint) -> BatchLoader:
+    return BatchLoader(lambda uris: get_resource_properties_many(endpoint, uris))
@@ -0,0 +1,156 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+from config.settings import SNAPSHOT_DIR, SNAPSHOT_KEEP
+
+SNAPSHOT_FORMAT = 1
+POINTER_FILE = "snapshot.json"
+
+# ---------------------------
+# reading / writing
+# ---------------------------
+
+def snapshot_path(directory: str, version: str | None) -> str:
+    return os.path.join(directory, f"snapshot-{version or 'unversioned'}.json.gz")
+
+
+def write_snapshot(data: Dict, directory: str = SNAPSHOT_DIR) -> str:
+    """
+    Write a gzip'ed JSON snapshot named after its dataset version and point
+    the pointer file at it. Both writes are atomic (tmp file + rename), so
+    readers never see a half-written snapshot. Afterwards only the newest
+    SNAPSHOT_KEEP snapshot files are kept.
+    """
+    os.makedirs(directory, exist_ok=True)
+    data = {**data, "format": SNAPSHOT_FORMAT}
+    path = snapshot_path(directory, data.get("version"))
+
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+    pointer = os.path.join(directory, POINTER_FILE)
+    with open(pointer + ".tmp", "w") as f:
+        json.dump({"file": os.path.basename(path), "version": data.get("version"), "created": data.get("created")}, f)
+    os.replace(pointer + ".tmp", pointer)
+
+    logging.info(f"snapshot written: {path}")
+    prune_snapshots(directory, keep=SNAPSHOT_KEEP, current=path)
+    return path
+
+
+def prune_snapshots(directory: str, keep: int, current: str | None = None) -> List[str]:
+    """
+    Delete all but the `keep` newest snapshot files (never `current`).
+    Returns the deleted paths.
+    """
+    paths = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.startswith("snapshot-") and name.endswith(".json.gz")
+    ]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    if current in paths:
+        paths.remove(current)
+        paths.insert(0, current)
+
+    deleted = []
+    for path in paths[max(keep, 1):]:
+        try:
+            os.remove(path)
+            deleted.append(path)
+        except OSError as e:
+            logging.error(f"could not delete old snapshot {path}: {e}")
+    if deleted:
+        logging.info(f"deleted {len(deleted)} old snapshots")
+    return deleted
+
+
+def read_snapshot_file(path: str) -> Dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path}: unsupported snapshot format {data.get('format')}")
+    return data
+
+
+def current_snapshot_file(directory: str = SNAPSHOT_DIR) -> str | None:
+    pointer = os.path.join(directory, POINTER_FILE)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, "r") as f:
+        name = json.load(f).get("file")
+    path = os.path.join(directory, name) if name else None
+    return path if path and os.path.exists(path) else None
+
+
+# ---------------------------
+# serving
+# ---------------------------
+
+class Snapshot:
+    """
+    A materialized copy of the work listing, the citation edges and every
+    work's local graph (first hop + argument + approach neighbourhoods),
+    plus the properties of each resource in those graphs. Answers the
+    work-centric view without touching the endpoint.
+    """
+
+    def __init__(self, data: Dict):
+        self.version = data.get("version")
+        self.created = data.get("created")
+        self.works: List[Dict] = data.get("works", [])
+        self.citations: List[Dict] = data.get("citations", [])
+        self.people: Dict[str, str] = data.get("people", {})
+        self.fingerprints: Dict[str, str | None] = data.get("fingerprints", {})
+        self.neighbourhoods: Dict[str, Dict] = data.get("neighbourhoods", {})
+        self.properties: Dict[str, List[Dict]] = data.get("properties", {})
+
+    def has_work(self, work_uri: str) -> bool:
+        return work_uri in self.neighbourhoods
+
+    def work_local_graph(self, work_uri: str):
+        """Same (is_skeleton, rows) shape as core.work_graph.get_work_local_graph."""
+        entry = self.neighbourhoods[work_uri]
+        return entry["skeleton"], entry["rows"]
+
+    def resource_properties(self, uri: str) -> List[Dict] | None:
+        """Rows with ?p ?o bindings, or None if uri was not materialized."""
+        return self.properties.get(uri)
+
+
+_lock = threading.Lock()
+_loaded: Dict = {"path": None, "mtime": None, "snapshot": None}
+
+
+def load_snapshot(directory: str = SNAPSHOT_DIR) -> Snapshot | None:
+    """
+    The current snapshot, or None if none has been materialized. Loaded
+    once per process and reloaded only when the pointer moves to a new file.
+    """
+    path = current_snapshot_file(directory)
+    if path is None:
+        return None
+
+    mtime = os.path.getmtime(path)
+    with _lock:
+        if _loaded["path"] == path and _loaded["mtime"] == mtime:
+            return _loaded["snapshot"]
+
+    started = time.monotonic()
+    try:
+        snapshot = Snapshot(read_snapshot_file(path))
+    except (OSError, ValueError) as e:
+        logging.error(f"could not load snapshot {path}: {e}")
+        return None
+    logging.info(f"loaded snapshot {path} ({len(snapshot.works)} works) in {time.monotonic() - started:.1f}s")
+
+    with _lock:
+        _loaded.update(path=path, mtime=mtime, snapshot=snapshot)
+    return snapshot
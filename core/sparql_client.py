@@ -1,8 +1,22 @@
 import aiohttp
 import asyncio
-from SPARQLWrapper import SPARQLWrapper, JSON
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from contextvars import copy_context
+from contextvars import ContextVar
+from enum import IntEnum
 import logging
 
+from config.settings import (
+    MAX_CONCURRENT_QUERIES, MAX_QUEUED_QUERIES, QUERY_ADMISSION_TIMEOUT,
+    QUERY_TIMEOUTS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT,
+    STALE_GRACE, RESULT_CACHE_SIZE,
+    REPLICA_EWMA_ALPHA, HEDGE_READS, HEDGE_PERCENTILE, HEDGE_MIN_DELAY, HEDGE_MIN_SAMPLES,
+)
+
 
 # async def async_sparql(endpoint, query):
 #     async with aiohttp.ClientSession() as session:
@@ -14,44 +28,820 @@ import logging
 #             data = await resp.json()
 #             return data["results"]["bindings"]
 
-async def async_sparql(endpoint, query: str):
+class EndpointError(RuntimeError):
+    """
+    The endpoint did not answer with a result. Unlike an empty result,
+    this is raised for HTTP errors, connection failures and timeouts.
+    """
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def counts_against_endpoint(self) -> bool:
+        # 4xx means our query was bad, not that the endpoint is unhealthy
+        return self.status is None or self.status >= 500
+
+
+class QueryTimeout(EndpointError):
+    """The query family's deadline passed before the endpoint answered."""
+
+
+class CircuitOpen(EndpointError):
+    """The endpoint failed repeatedly; calls are refused until the reset timeout."""
+
+
+async def async_sparql(endpoint, query: str, timeout: float | None = None):
     headers = {
         "Accept": "application/sparql-results+json",
         "Content-Type": "application/sparql-query"
     }
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(endpoint, headers=headers, data=query) as resp:
-            text = await resp.text()
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            async with session.post(endpoint, headers=headers, data=query) as resp:
+                text = await resp.text()
+
+                # lazy arguments: nothing is formatted unless debug logging is on
+                logging.debug("SPARQL %s %s: %.500s", resp.status, resp.headers.get("Content-Type"), text)
+
+                if resp.status != 200:
+                    logging.error(f"[Fuseki ERROR {resp.status}] {text}")
+                    raise EndpointError(f"{endpoint} answered {resp.status}: {text[:200]}", resp.status)
+
+                # checked before the ClientError below: ContentTypeError is one, but a 200
+                # with an HTML error or login page is a bad answer, not an unreachable endpoint
+                try:
+                    return (await resp.json())["results"]["bindings"]
+                except (aiohttp.ContentTypeError, ValueError, KeyError, TypeError) as e:
+                    logging.error(f"bad response from {endpoint}: {text[:500]}")
+                    raise EndpointError(
+                        f"{endpoint} sent a bad response ({resp.headers.get('Content-Type')}): {e}", resp.status,
+                    )
+    except asyncio.TimeoutError:
+        raise QueryTimeout(f"{endpoint} did not answer within {timeout}s")
+    except aiohttp.ClientError as e:
+        raise EndpointError(f"{endpoint} unreachable: {e}")
+
+# ---------------------------
+# admission control / scheduling
+# ---------------------------
+
+class Priority(IntEnum):
+    """Lower value is served first."""
+    INTERACTIVE = 0   # a user click is waiting on this
+    PAGE_LOAD = 1     # regular rerun of the page
+    BACKGROUND = 2    # prefetch, warming, bulk jobs
+
+
+class SchedulerBusy(RuntimeError):
+    """The queue for this priority is full, or admission timed out."""
+
+
+class QueryCancelled(Exception):
+    """The selection that issued this query was superseded; its result is dropped."""
+
 
-            # ---- DEBUG OUTPUT ----
-            print("SPARQL STATUS:", resp.status)
-            print("SPARQL MIMETYPE:", resp.headers.get("Content-Type"))
-            print("SPARQL RESPONSE TEXT:", text[:500])
-            # -----------------------
+_query_priority: ContextVar[Priority] = ContextVar("query_priority", default=Priority.PAGE_LOAD)
+_query_session: ContextVar[str | None] = ContextVar("query_session", default=None)
 
-            if resp.status != 200:
-                logging.error(f"[Fuseki ERROR {resp.status}] {text}")
-                return []
 
+# ---------------------------
+# cancellation
+# ---------------------------
+
+class CancelToken:
+    """
+    Shared by all queries issued for one selection. Cancelling it aborts
+    their HTTP requests, removes them from the scheduler queue and makes
+    sparql() raise QueryCancelled instead of returning their rows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._callbacks = {}
+        self._next_id = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        for cb in callbacks:
             try:
-                return (await resp.json())["results"]["bindings"]
+                cb()
             except Exception as e:
-                logging.error("JSON decode failed")
-                logging.error(text)
-                raise e
+                logging.error(f"cancel callback failed: {e}")
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled:
+            raise QueryCancelled()
+
+    def add_callback(self, cb):
+        """Call cb on cancel (right away if already cancelled); returns a remover."""
+        with self._lock:
+            if not self._cancelled:
+                key = self._next_id
+                self._next_id += 1
+                self._callbacks[key] = cb
+                return lambda: self._remove_callback(key)
+        cb()
+        return lambda: None
+
+    def _remove_callback(self, key) -> None:
+        with self._lock:
+            self._callbacks.pop(key, None)
+
+
+_cancel_token: ContextVar[CancelToken | None] = ContextVar("cancel_token", default=None)
+
+_selection_lock = threading.Lock()
+# session -> (selection key, token)
+_selections: dict = {}
+
+
+def begin_selection(session_id: str | None, key) -> CancelToken:
+    """
+    Bind the current context to the token of the session's selection `key`.
+
+    When `key` differs from the session's previous selection, the previous
+    token is cancelled first, so everything still queued or in flight for
+    the old selection is aborted and its results are dropped.
+    """
+    with _selection_lock:
+        previous = _selections.get(session_id)
+        if previous is not None and previous[0] == key and not previous[1].cancelled:
+            token = previous[1]
+        else:
+            token = CancelToken()
+            _selections[session_id] = (key, token)
+
+    if previous is not None and previous[1] is not token:
+        previous[1].cancel()
+
+    _cancel_token.set(token)
+    return token
+
+
+def current_cancel_token() -> CancelToken | None:
+    return _cancel_token.get()
+
+
+@contextmanager
+def detached():
+    """Queries inside the block are not tied to the current selection's token."""
+    token = _cancel_token.set(None)
+    try:
+        yield
+    finally:
+        _cancel_token.reset(token)
+
+
+@contextmanager
+def query_priority(priority: Priority):
+    """Run every query issued inside the block with the given priority."""
+    token = _query_priority.set(priority)
+    try:
+        yield
+    finally:
+        _query_priority.reset(token)
+
+
+def set_query_session(session_id: str | None) -> None:
+    """Tag queries issued from the current context with a session for fair sharing."""
+    _query_session.set(session_id)
+
+
+class _Ticket:
+    __slots__ = ("priority", "session", "granted", "cancelled", "enqueued_at")
+
+    def __init__(self, priority, session):
+        self.priority = priority
+        self.session = session
+        self.granted = threading.Event()
+        self.cancelled = False
+        self.enqueued_at = time.monotonic()
+
+
+class QueryScheduler:
+    """
+    Global concurrency cap in front of the endpoint.
+
+    Waiting queries are kept per priority class and, inside a class, per
+    session; free slots go to the highest priority first and round-robin
+    across sessions, so one busy session cannot starve the others. Each
+    class has a bounded queue: when it is full the caller gets
+    SchedulerBusy instead of piling more work onto the triplestore.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_QUERIES,
+        max_queued: int = MAX_QUEUED_QUERIES,
+        admission_timeout: float = QUERY_ADMISSION_TIMEOUT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.admission_timeout = admission_timeout
+
+        self._lock = threading.Lock()
+        self._active = 0
+        # priority -> session -> deque[_Ticket]
+        self._queues = {p: OrderedDict() for p in Priority}
+        self._queued = {p: 0 for p in Priority}
+        self._stats = {
+            p: {"count": 0, "rejected": 0, "wait_s": 0.0, "service_s": 0.0, "max_wait_s": 0.0}
+            for p in Priority
+        }
+
+    # -- public ------------------------------------------------
+
+    def run(
+        self,
+        fn,
+        priority: Priority | None = None,
+        session: str | None = None,
+        token: CancelToken | None = None,
+    ):
+        """Wait for a slot, run fn() in the calling thread and return its result."""
+        priority = _query_priority.get() if priority is None else Priority(priority)
+        session = _query_session.get() if session is None else session
+        token = _cancel_token.get() if token is None else token
+
+        if token is not None:
+            token.raise_if_cancelled()
+
+        ticket = self._admit(priority, session, token)
+        wait = time.monotonic() - ticket.enqueued_at
+
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            service = time.monotonic() - started
+            self._release(ticket, wait, service)
+            logging.debug(
+                f"[query {priority.name.lower()}] wait={wait * 1000:.1f}ms service={service * 1000:.1f}ms"
+            )
+
+    def stats(self) -> dict:
+        """Per priority: counts plus queue wait and service time, kept separately."""
+        with self._lock:
+            out = {}
+            for p, s in self._stats.items():
+                n = s["count"] or 1
+                out[p.name.lower()] = {
+                    **s,
+                    "queued": self._queued[p],
+                    "avg_wait_s": s["wait_s"] / n,
+                    "avg_service_s": s["service_s"] / n,
+                }
+            out["active"] = self._active
+            return out
+
+    # -- internals ---------------------------------------------
+
+    def _admit(self, priority, session, token=None) -> _Ticket:
+        ticket = _Ticket(priority, session)
+
+        with self._lock:
+            if self._queued[priority] >= self.max_queued:
+                self._stats[priority]["rejected"] += 1
+                raise SchedulerBusy(f"{priority.name.lower()} queue is full ({self.max_queued} waiting)")
+            self._queues[priority].setdefault(session, deque()).append(ticket)
+            self._queued[priority] += 1
+            self._grant_locked()
+
+        remove_cb = token.add_callback(lambda: self._withdraw(ticket)) if token else None
+        try:
+            granted = ticket.granted.wait(self.admission_timeout)
+        finally:
+            if remove_cb:
+                remove_cb()
+
+        if ticket.cancelled:
+            raise QueryCancelled()
+        if granted:
+            return ticket
+
+        with self._lock:
+            # granted between the timeout and taking the lock: keep the slot
+            if ticket.granted.is_set():
+                return ticket
+            self._dequeue_locked(ticket)
+            self._stats[priority]["rejected"] += 1
+        raise SchedulerBusy(f"no query slot within {self.admission_timeout:.0f}s")
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        """Drop a still-waiting ticket whose selection was cancelled."""
+        with self._lock:
+            if ticket.granted.is_set():
+                return
+            self._dequeue_locked(ticket)
+            ticket.cancelled = True
+            ticket.granted.set()
+
+    def _dequeue_locked(self, ticket: _Ticket) -> None:
+        sessions = self._queues[ticket.priority]
+        sessions[ticket.session].remove(ticket)
+        if not sessions[ticket.session]:
+            del sessions[ticket.session]
+        self._queued[ticket.priority] -= 1
+
+    def _grant_locked(self) -> None:
+        while self._active < self.max_concurrency:
+            ticket = self._next_locked()
+            if ticket is None:
+                return
+            self._active += 1
+            ticket.granted.set()
+
+    def _next_locked(self) -> _Ticket | None:
+        for p in Priority:
+            sessions = self._queues[p]
+            if not sessions:
+                continue
+            # round-robin: take from the first session, then move it to the back
+            session, tickets = next(iter(sessions.items()))
+            ticket = tickets.popleft()
+            del sessions[session]
+            if tickets:
+                sessions[session] = tickets
+            self._queued[p] -= 1
+            return ticket
+        return None
+
+    def _release(self, ticket: _Ticket, wait: float, service: float) -> None:
+        with self._lock:
+            self._active -= 1
+            s = self._stats[ticket.priority]
+            s["count"] += 1
+            s["wait_s"] += wait
+            s["service_s"] += service
+            s["max_wait_s"] = max(s["max_wait_s"], wait)
+            self._grant_locked()
+
+
+scheduler = QueryScheduler()
+
+
+# ---------------------------
+# circuit breaker
+# ---------------------------
+
+class CircuitBreaker:
+    """
+    closed → open after `failure_threshold` consecutive failures;
+    open → half-open after `reset_timeout`, letting a single probe through;
+    the probe's outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self, endpoint) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpen(f"{endpoint} is failing; not sending queries for now")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logging.warning(f"circuit opened after {self._failures} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
 
-def sparql(endpoint, query):
-    return asyncio.run(async_sparql(endpoint, query))
+    def release_probe(self) -> None:
+        """The probe ended without a verdict (e.g. cancelled); let another one through."""
+        with self._lock:
+            self._probing = False
 
-def execute_query_convert(endpoint: str, query: str):
+
+_breakers: dict = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(endpoint) -> CircuitBreaker:
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker()
+        return _breakers[endpoint]
+
+
+def query_timeout(query) -> float:
+    """Deadline for the query's family (the template it was rendered from)."""
+    family = getattr(query, "template", None)
+    return QUERY_TIMEOUTS.get(family, QUERY_TIMEOUTS["default"])
+
+
+# ---------------------------
+# last-good results / stale serving
+# ---------------------------
+
+class StaleRows(list):
+    """Rows from the last good answer, served because a fresh one was not available."""
+
+    def __init__(self, rows, fetched_at: float):
+        super().__init__(rows)
+        self.stale = True
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class ResultCache:
+    """
+    Bounded LRU of the last good rows per (endpoint, query text), each
+    stamped with the dataset version that was current when the fetch began.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, rows, version: str | None = None) -> None:
+        with self._lock:
+            self._entries[key] = (list(rows), time.time(), version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, endpoint=None) -> None:
+        """Drop everything, or only the entries of one endpoint."""
+        with self._lock:
+            if endpoint is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == endpoint]:
+                del self._entries[key]
+
+
+result_cache = ResultCache()
+
+# endpoint -> dataset fingerprint last seen by core.dataset_version
+_dataset_versions: dict = {}
+
+
+def note_dataset_version(endpoint, version: str | None) -> None:
+    """
+    Record the endpoint's current dataset fingerprint. Cached results
+    stamped with it are answered straight from the cache until it changes.
+    """
+    _dataset_versions[endpoint] = version
+
+_stale_notices: ContextVar[list | None] = ContextVar("stale_notices", default=None)
+
+# fetches that outlived their grace period keep running here and refresh the cache
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sparql-refresh")
+_inflight: dict = {}
+_inflight_lock = threading.Lock()
+
+
+@contextmanager
+def allow_stale():
+    """
+    Inside the block, a query that has a cached last-good result waits at
+    most STALE_GRACE seconds (or not at all while the circuit is open) and
+    otherwise returns that result as StaleRows; the fresh fetch continues
+    in the background and refreshes the cache.
+
+    Yields a list that collects the query families served stale, so the
+    page can say it is showing cached data.
+    """
+    notices = []
+    token = _stale_notices.set(notices)
+    try:
+        yield notices
+    finally:
+        _stale_notices.reset(token)
+
+
+async def _cancellable(coro, token: CancelToken | None):
+    """Await coro, cancelling the task (and closing its connection) when token fires."""
+    task = asyncio.ensure_future(coro)
+    if token is None:
+        return await task
+
+    loop = asyncio.get_running_loop()
+    remove_cb = token.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
     try:
-        sparql = SPARQLWrapper(endpoint)
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
-        return results["results"]["bindings"]
-    except Exception as e:
-        logging.error(query)
-        logging.error(e)
-        return []
+        return await task
+    except asyncio.CancelledError:
+        if token.cancelled:
+            raise QueryCancelled()
+        raise
+    finally:
+        remove_cb()
+
+
+# ---------------------------
+# replica pool
+# ---------------------------
+
+def _linked_token(parent: CancelToken | None):
+    """A child token that is also cancelled when parent is."""
+    child = CancelToken()
+    if parent is None:
+        return child, lambda: None
+    return child, parent.add_callback(child.cancel)
+
+
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sparql-hedge")
+
+
+class EndpointPool:
+    """
+    Read-only replicas of one dataset, used like a single endpoint.
+
+    Each query goes to the replica with the lowest recent latency (EWMA);
+    replicas whose circuit is open are tried last. If the chosen replica
+    has not answered after the HEDGE_PERCENTILE latency of recent queries,
+    a duplicate goes to the next replica and the first answer wins, the
+    other request being cancelled. Failures fail over to the next replica.
+    """
+
+    def __init__(self, endpoints, hedge: bool = HEDGE_READS, alpha: float = REPLICA_EWMA_ALPHA):
+        self.endpoints = tuple(endpoints)
+        if not self.endpoints:
+            raise ValueError("an endpoint pool needs at least one endpoint")
+        self.hedge = hedge
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._ewma = {url: None for url in self.endpoints}
+        self._samples = deque(maxlen=200)
+
+    def __repr__(self):
+        return f"EndpointPool({', '.join(self.endpoints)})"
+
+    def __eq__(self, other):
+        return isinstance(other, EndpointPool) and other.endpoints == self.endpoints
+
+    def __hash__(self):
+        return hash(self.endpoints)
+
+    # -- latency bookkeeping -----------------------------------
+
+    def _record(self, url, latency: float, sample: bool = True) -> None:
+        with self._lock:
+            prev = self._ewma[url]
+            self._ewma[url] = latency if prev is None else self.alpha * latency + (1 - self.alpha) * prev
+            if sample:
+                self._samples.append(latency)
+
+    def _penalize(self, url) -> None:
+        with self._lock:
+            prev = self._ewma[url] or 1.0
+            self._ewma[url] = prev * 2
+
+    def ranked(self) -> list:
+        with self._lock:
+            ewma = dict(self._ewma)
+        # unmeasured replicas first (EWMA 0) so every replica gets measured
+        return sorted(
+            self.endpoints,
+            key=lambda url: (breaker_for(url).state == "open", ewma[url] or 0.0),
+        )
+
+    def hedge_delay(self) -> float | None:
+        with self._lock:
+            if not self.hedge or len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        idx = min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE))
+        return max(samples[idx], HEDGE_MIN_DELAY)
+
+    def is_down(self) -> bool:
+        return all(breaker_for(url).state == "open" for url in self.endpoints)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {url: {"ewma_s": self._ewma[url], "circuit": breaker_for(url).state} for url in self.endpoints}
+
+    # -- fetching ----------------------------------------------
+
+    def _timed(self, url, query, priority, session, token):
+        started = time.monotonic()
+        try:
+            rows = _fetch(url, query, priority, session, token)
+        except EndpointError as e:
+            if e.counts_against_endpoint:
+                self._penalize(url)
+            raise
+        except QueryCancelled:
+            # lost a hedge race: it took at least this long, so rank it accordingly
+            self._record(url, time.monotonic() - started, sample=False)
+            raise
+        self._record(url, time.monotonic() - started)
+        return rows
+
+    def _hedged(self, primary, backups, query, priority, session, token, failed):
+        """
+        Query primary, hedging with backups[0] if it is slow. Replicas that
+        fail are added to `failed`; backups itself is left alone.
+        """
+        delay = self.hedge_delay()
+        if delay is None or not backups:
+            try:
+                return self._timed(primary, query, priority, session, token)
+            except EndpointError:
+                failed.add(primary)
+                raise
+
+        # each attempt runs in its own copy of the caller's context (priority, session)
+        attempts = {}
+        t1, unlink1 = _linked_token(token)
+        f1 = _hedge_pool.submit(copy_context().run, self._timed, primary, query, priority, session, t1)
+        attempts[f1] = (primary, t1, unlink1)
+
+        try:
+            done, _ = wait([f1], timeout=delay)
+            if not done:
+                secondary = backups[0]
+                logging.info(f"hedging slow read on {primary} with {secondary}")
+                t2, unlink2 = _linked_token(token)
+                f2 = _hedge_pool.submit(copy_context().run, self._timed, secondary, query, priority, session, t2)
+                attempts[f2] = (secondary, t2, unlink2)
+
+            pending, errors = set(attempts), []
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    try:
+                        rows = f.result()
+                    except EndpointError as e:
+                        failed.add(attempts[f][0])
+                        errors.append(e)
+                        continue
+                    except QueryCancelled as e:
+                        errors.append(e)
+                        continue
+                    for other, (_, t, _) in attempts.items():
+                        if other is not f:
+                            t.cancel()
+                    return rows
+
+            # prefer reporting an endpoint failure over our own cancellation
+            errors.sort(key=lambda e: isinstance(e, QueryCancelled))
+            raise errors[0]
+        finally:
+            for _, _, unlink in attempts.values():
+                unlink()
+
+    def fetch(self, query, priority=None, session=None, token=None):
+        order = self.ranked()
+        failed = set()
+        last_error = None
+        while order:
+            primary = order.pop(0)
+            try:
+                return self._hedged(primary, order, query, priority, session, token, failed)
+            except EndpointError as e:
+                if not e.counts_against_endpoint:
+                    raise
+                last_error = e
+                # a hedge replica stays in line unless it failed as well
+                order = [url for url in order if url not in failed]
+                if order:
+                    logging.warning(f"{primary} failed ({e}); failing over")
+        raise last_error
+
+
+def make_endpoint(endpoints):
+    """A single URL stays a plain string; several become an EndpointPool."""
+    if isinstance(endpoints, str):
+        return endpoints
+    endpoints = [e for e in endpoints if e]
+    if len(endpoints) == 1:
+        return endpoints[0]
+    return EndpointPool(endpoints)
+
+
+def _is_down(endpoint) -> bool:
+    if isinstance(endpoint, EndpointPool):
+        return endpoint.is_down()
+    return breaker_for(endpoint).state == "open"
+
+
+def _fetch(endpoint, query, priority, session, token):
+    breaker = breaker_for(endpoint)
+    breaker.before_call(endpoint)
+    timeout = query_timeout(query)
+
+    try:
+        rows = scheduler.run(
+            lambda: asyncio.run(_cancellable(async_sparql(endpoint, query, timeout), token)),
+            priority=priority,
+            session=session,
+            token=token,
+        )
+    except EndpointError as e:
+        if e.counts_against_endpoint:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    except BaseException:
+        breaker.release_probe()
+        raise
+
+    breaker.record_success()
+    return rows
+
+
+def _fetch_any(endpoint, query, priority, session, token, cache: bool = True):
+    version = _dataset_versions.get(endpoint)
+    if isinstance(endpoint, EndpointPool):
+        rows = endpoint.fetch(query, priority, session, token)
+    else:
+        rows = _fetch(endpoint, query, priority, session, token)
+    if cache:
+        result_cache.put((endpoint, str(query)), rows, version)
+    return rows
+
+
+def _serve_stale(entry, query, notices):
+    rows, fetched_at, _ = entry
+    notices.append(getattr(query, "template", None) or "query")
+    return StaleRows(rows, fetched_at)
+
+
+def sparql(endpoint, query, priority: Priority | None = None, session: str | None = None, cache: bool = True):
+    token = _cancel_token.get()
+    notices = _stale_notices.get()
+    key = (endpoint, str(query))
+    # cache=False: always ask the endpoint and keep no copy (e.g. the dataset
+    # version probes, which must see changes the version-stamped cache hides)
+    entry = result_cache.get(key) if cache else None
+
+    # fetched against the dataset version that is still current: nothing to revalidate
+    if entry is not None and entry[2] is not None and entry[2] == _dataset_versions.get(endpoint):
+        return list(entry[0])
+
+    if notices is None:
+        entry = None
+
+    if entry is None:
+        rows = _fetch_any(endpoint, query, priority, session, token, cache=cache)
+    else:
+        if _is_down(endpoint):
+            return _serve_stale(entry, query, notices)
+
+        with _inflight_lock:
+            future = _inflight.get(key)
+            if future is None:
+                # no cancel token: the refresh is worth finishing even if this selection is not
+                ctx = copy_context()
+                ctx.run(_cancel_token.set, None)
+                future = _refresh_pool.submit(ctx.run, _fetch_any, endpoint, query, priority, session, None)
+                _inflight[key] = future
+                future.add_done_callback(lambda f: _inflight.pop(key, None))
+        try:
+            rows = future.result(timeout=STALE_GRACE)
+        except FutureTimeout:
+            return _serve_stale(entry, query, notices)
+        except (EndpointError, SchedulerBusy):
+            return _serve_stale(entry, query, notices)
+
+    # finished, but the selection moved on meanwhile: don't hand back stale rows
+    if token is not None:
+        token.raise_if_cancelled()
+    return rows
@@ -0,0 +1,61 @@
+"""
+Citation edges partitioned by the citing work's year. Edges are stored
+sorted by that year with a prefix offset per year, so the citations of
+any year range are one contiguous slice, with no scan and no query.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Tuple
+
+
+def work_year(work: Dict) -> int | None:
+    year = str(work.get("year") or "")[:4]
+    return int(year) if year.isdigit() and len(year) == 4 else None
+
+
+class TimeSlicedCitations:
+    """
+    years[k] is the k-th distinct citing year, edges of that year are
+    edges[offsets[k]:offsets[k + 1]]. Citations from works without a
+    (known) year are kept apart in `undated`.
+    """
+
+    def __init__(self, works: List[Dict], citations: List[Dict]):
+        year_of = {w["uri"]: work_year(w) for w in works}
+        dated = [(year_of.get(c["source"]), c) for c in citations]
+        self.undated = [c for y, c in dated if y is None]
+        dated = sorted(((y, c) for y, c in dated if y is not None), key=lambda yc: yc[0])
+        self.edges = [c for _, c in dated]
+
+        self.years: List[int] = []
+        self.offsets: List[int] = []
+        for i, (y, _) in enumerate(dated):
+            if not self.years or self.years[-1] != y:
+                self.years.append(y)
+                self.offsets.append(i)
+        self.offsets.append(len(self.edges))
+
+    def between(self, first: int, last: int) -> List[Dict]:
+        """Citations made by works of years first..last (inclusive)."""
+        lo = self.offsets[bisect_left(self.years, first)]
+        hi = self.offsets[bisect_right(self.years, last)]
+        return self.edges[lo:hi]
+
+    def span(self) -> Tuple[int, int] | None:
+        return (self.years[0], self.years[-1]) if self.years else None
+
+
+_lock = threading.Lock()
+_index: Dict = {"index": None, "version": None}
+
+
+def time_sliced_citations(works: List[Dict], citations: List[Dict], version: str | None = None) -> TimeSlicedCitations:
+    """The index for these works/citations, rebuilt only when they (their version) change."""
+    with _lock:
+        index = _index["index"]
+        key = (version, len(works), len(citations))
+        if index is not None and version is not None and key == _index["version"]:
+            return index
+        index = TimeSlicedCitations(works, citations)
+        _index.update(index=index, version=key)
+        return index
@@ -0,0 +1,596 @@
+"""
+Embedded, read-only mirror of the IDEA KG for the app's fixed query shapes.
+
+A dump (N-Triples, or Turtle when rdflib is installed) is loaded into a
+term dictionary plus three sorted integer indexes (SPO, POS, OSP). The
+shapes core.work_graph and core.resource_inspector ask for — 1-hop
+in/out around a uri, outgoing-only around approach nodes, resource
+properties, the work listing and citations — become binary searches on
+those arrays instead of SPARQL queries. Results use the same JSON
+binding shape as the endpoint.
+
+Enable with LOCAL_STORE_PATH=<dump file>, or better, convert the dump once
+
+    python -m core.triple_store dump.nt local_cache/store
+
+and point LOCAL_STORE_PATH at the directory: it is memory-mapped, so
+start-up is instant and all Streamlit workers share one copy in the page
+cache.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from config.settings import LOCAL_STORE_PATH, PREFIXES
+
+RDF_TYPE = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+SUBCLASS_OF = "<http://www.w3.org/2000/01/rdf-schema#subClassOf>"
+FABIO_WORK = "<http://purl.org/spar/fabio/Work>"
+XSD_GYEAR = "http://www.w3.org/2001/XMLSchema#gYear"
+
+
+def _iri(curie: str) -> str:
+    prefix, local = curie.split(":", 1)
+    return f"<{PREFIXES[prefix]}{local}>"
+
+
+# same alternatives as the OPTIONAL label paths in core.work_graph
+NEIGHBOR_LABEL_PREDICATES = [
+    _iri(c) for c in ("dc:title", "dct:title", "rdfs:label", "skos:prefLabel", "foaf:name", "idea:hasLabel")
+]
+FIRST_HOP_LABEL_PREDICATES = NEIGHBOR_LABEL_PREDICATES + [_iri("fabio:hasDiscipline")]
+WORK_LABEL_PREDICATES = [_iri(c) for c in ("dc:title", "dct:title", "rdfs:label")]
+
+# ---------------------------
+# N-Triples terms
+# ---------------------------
+
+_TERM = r'(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)'
+_TRIPLE = re.compile(rf"^\s*{_TERM}\s+{_TERM}\s+{_TERM}\s*\.\s*$")
+_LITERAL = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?$')
+_ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+_SIMPLE_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+
+def _unescape(text: str) -> str:
+    def sub(m):
+        e = m.group(1)
+        if e[0] in "uU" and len(e) > 1:
+            return chr(int(e[1:], 16))
+        return _SIMPLE_ESCAPES.get(e, e)
+    return _ESCAPE.sub(sub, text)
+
+
+def encode_literal(lexical: str, lang: str | None = None, datatype: str | None = None) -> str:
+    """Canonical N-Triples token for a literal (used as the dictionary key)."""
+    escaped = (
+        lexical.replace("\\", "\\\\").replace('"', '\\"')
+        .replace("\n", "\\n").replace("\r", "\\r")
+    )
+    if lang:
+        return f'"{escaped}"@{lang}'
+    if datatype:
+        return f'"{escaped}"^^<{datatype}>'
+    return f'"{escaped}"'
+
+
+def _canonical(token: str) -> str:
+    if token.startswith('"'):
+        m = _LITERAL.match(token)
+        return encode_literal(_unescape(m.group(1)), m.group(2), m.group(3))
+    return token
+
+
+@lru_cache(maxsize=65536)
+def _decode(token: str) -> tuple:
+    if token.startswith("<"):
+        return (("type", "uri"), ("value", token[1:-1]))
+    if token.startswith("_:"):
+        return (("type", "bnode"), ("value", token[2:]))
+    m = _LITERAL.match(token)
+    binding = (("type", "literal"), ("value", _unescape(m.group(1))))
+    if m.group(2):
+        binding += (("xml:lang", m.group(2)),)
+    elif m.group(3):
+        binding += (("datatype", m.group(3)),)
+    return binding
+
+
+def term_binding(token: str) -> Dict:
+    """SPARQL JSON result binding for an N-Triples token."""
+    return dict(_decode(token))
+
+
+def parse_ntriples(lines: Iterable[str]) -> Iterable[Tuple[str, str, str]]:
+    for n, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        m = _TRIPLE.match(line)
+        if m is None:
+            logging.warning(f"skipping unparsable N-Triples line {n}: {line[:120]}")
+            continue
+        yield tuple(_canonical(t) for t in m.groups())
+
+
+def parse_turtle(path: str) -> Iterable[Tuple[str, str, str]]:
+    try:
+        import rdflib
+    except ImportError:
+        raise RuntimeError("loading Turtle needs rdflib (pip install rdflib); N-Triples works without it")
+
+    def token(term):
+        if isinstance(term, rdflib.URIRef):
+            return f"<{term}>"
+        if isinstance(term, rdflib.BNode):
+            return f"_:{term}"
+        return encode_literal(str(term), term.language, str(term.datatype) if term.datatype else None)
+
+    graph = rdflib.Graph()
+    graph.parse(path, format="turtle")
+    for s, p, o in graph:
+        yield token(s), token(p), token(o)
+
+
+# ---------------------------
+# term dictionaries
+# ---------------------------
+
+class TermDict:
+    """In-memory term dictionary; ids are positions in the sorted token list."""
+
+    def __init__(self, terms: List[str]):
+        self._terms = terms
+        self._ids = {t: i for i, t in enumerate(terms)}
+
+    def __len__(self):
+        return len(self._terms)
+
+    def __iter__(self):
+        return iter(self._terms)
+
+    def id_of(self, token: str) -> int | None:
+        return self._ids.get(token)
+
+    def token(self, term_id: int) -> str:
+        return self._terms[term_id]
+
+
+class MappedTermDict:
+    """
+    Term dictionary over a memory-mapped string table: the UTF-8 tokens in
+    sorted order back to back, plus an offset array (n + 1 entries). Ids
+    are positions, so id -> token is a slice and token -> id a binary search;
+    nothing is decoded up front.
+    """
+
+    def __init__(self, table_path: str, offsets_path: str):
+        with open(table_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets = np.load(offsets_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        return (self.token(i) for i in range(len(self)))
+
+    def _bytes(self, term_id: int) -> bytes:
+        return self._buf[int(self._offsets[term_id]):int(self._offsets[term_id + 1])]
+
+    def id_of(self, token: str) -> int | None:
+        key = token.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self) and self._bytes(lo) == key else None
+
+    def token(self, term_id: int) -> str:
+        return self._bytes(term_id).decode("utf-8")
+
+
+# ---------------------------
+# store
+# ---------------------------
+
+STORE_FORMAT = 1
+STORE_FILES = ("terms.bin", "terms.offsets.npy", "spo.npy", "pos.npy", "osp.npy")
+
+
+class TripleStore:
+    """
+    Term dictionary (id <-> N-Triples token) and the triples as int arrays
+    sorted three ways: spo by (s, p, o), pos by (p, o, s), osp by (o, s, p).
+    Each index keeps its columns in that order and is stored column-major,
+    shape (3, n), so the binary searches run over contiguous memory.
+
+    Built in memory from a dump, or opened from the on-disk layout written
+    by save(), in which case every array is memory-mapped and shared
+    through the page cache by all processes that open it.
+    """
+
+    def __init__(self, terms, spo: np.ndarray, pos: np.ndarray, osp: np.ndarray):
+        self.terms = terms
+        self.spo, self.pos, self.osp = spo, pos, osp
+        self._work_classes = None
+        self._works = None
+
+    # -- loading -----------------------------------------------
+
+    @classmethod
+    def build(cls, terms: List[str], triples: np.ndarray) -> "TripleStore":
+        """Sort terms (ids follow UTF-8 byte order) and build the three indexes."""
+        order = sorted(range(len(terms)), key=terms.__getitem__)
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[order] = np.arange(len(terms))
+        terms = [terms[i] for i in order]
+
+        dtype = np.int32 if len(terms) < 2 ** 31 else np.int64
+        triples = rank[np.asarray(triples, dtype=np.int64).reshape(-1, 3)]
+        triples = np.unique(triples, axis=0).astype(dtype)
+        s, p, o = triples[:, 0], triples[:, 1], triples[:, 2]
+        return cls(
+            TermDict(terms),
+            np.ascontiguousarray(triples[np.lexsort((o, p, s))].T),
+            np.ascontiguousarray(triples[np.lexsort((s, o, p))][:, [1, 2, 0]].T),
+            np.ascontiguousarray(triples[np.lexsort((p, s, o))][:, [2, 0, 1]].T),
+        )
+
+    @classmethod
+    def from_triples(cls, triples: Iterable[Tuple[str, str, str]]) -> "TripleStore":
+        ids, terms, encoded = {}, [], []
+        for triple in triples:
+            row = []
+            for token in triple:
+                i = ids.get(token)
+                if i is None:
+                    i = ids[token] = len(terms)
+                    terms.append(token)
+                row.append(i)
+            encoded.append(row)
+        return cls.build(terms, np.array(encoded, dtype=np.int64).reshape(-1, 3))
+
+    @classmethod
+    def load(cls, path: str) -> "TripleStore":
+        """Open a store directory written by save(), or parse a dump file."""
+        started = time.monotonic()
+        if os.path.isdir(path):
+            store = cls.open(path)
+        elif path.endswith((".ttl", ".turtle")):
+            store = cls.from_triples(parse_turtle(path))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                store = cls.from_triples(parse_ntriples(f))
+        logging.info(f"loaded {len(store)} triples from {path} in {time.monotonic() - started:.1f}s")
+        return store
+
+    def save(self, directory: str) -> None:
+        """
+        Write the on-disk layout: terms.bin + terms.offsets.npy (string table),
+        spo/pos/osp.npy (triple indexes) and meta.json. Each file is
+        replaced atomically and meta.json goes last.
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        def replace(name, write):
+            path = os.path.join(directory, name)
+            with open(path + ".tmp", "wb") as f:
+                write(f)
+            os.replace(path + ".tmp", path)
+
+        encoded = [t.encode("utf-8") for t in self.terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        replace("terms.bin", lambda f: f.writelines(encoded))
+        replace("terms.offsets.npy", lambda f: np.save(f, offsets))
+        for name in ("spo", "pos", "osp"):
+            replace(f"{name}.npy", lambda f: np.save(f, np.ascontiguousarray(getattr(self, name))))
+
+        meta = {"format": STORE_FORMAT, "terms": len(encoded), "triples": len(self)}
+        replace("meta.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+    @classmethod
+    def open(cls, directory: str) -> "TripleStore":
+        """Memory-map a directory written by save(); nothing is read up front."""
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("format") != STORE_FORMAT:
+            raise ValueError(f"{directory}: unsupported store format {meta.get('format')}")
+
+        path = lambda name: os.path.join(directory, name)
+        return cls(
+            MappedTermDict(path("terms.bin"), path("terms.offsets.npy")),
+            *(np.load(path(f"{name}.npy"), mmap_mode="r") for name in ("spo", "pos", "osp")),
+        )
+
+    def __len__(self):
+        return self.spo.shape[1]
+
+    # -- term dictionary ---------------------------------------
+
+    def term_id(self, token: str) -> int | None:
+        return self.terms.id_of(token)
+
+    def term(self, term_id: int) -> str:
+        return self.terms.token(term_id)
+
+    def _uri_id(self, uri: str) -> int | None:
+        return self.term_id(f"<{uri}>")
+
+    # -- index lookups -----------------------------------------
+
+    @staticmethod
+    def _slice(index: np.ndarray, first: int, second: int | None = None) -> np.ndarray:
+        """Rows (k, 3) of a column-major index matching its first (and second) column."""
+        col = index[0]
+        lo, hi = np.searchsorted(col, first, "left"), np.searchsorted(col, first, "right")
+        if second is not None:
+            col = index[1, lo:hi]
+            lo, hi = lo + np.searchsorted(col, second, "left"), lo + np.searchsorted(col, second, "right")
+        return index[:, lo:hi].T
+
+    def outgoing(self, s: int) -> np.ndarray:
+        """(s, p, o) rows with this subject."""
+        return self._slice(self.spo, s)
+
+    def incoming(self, o: int) -> np.ndarray:
+        """(o, s, p) rows with this object."""
+        return self._slice(self.osp, o)
+
+    def objects(self, s: int, p: int | None) -> List[int]:
+        if p is None:
+            return []
+        return self._slice(self.spo, s, p)[:, 2].tolist()
+
+    def subjects(self, p: int | None, o: int | None) -> List[int]:
+        if p is None or o is None:
+            return []
+        return self._slice(self.pos, p, o)[:, 2].tolist()
+
+    # -- shared helpers ----------------------------------------
+
+    def _objects_any(self, s: int, predicates: List[str]) -> List[int]:
+        out = []
+        for p in predicates:
+            out.extend(self.objects(s, self.term_id(p)))
+        return out
+
+    def work_classes(self) -> set:
+        """fabio:Work and its rdfs:subClassOf* descendants."""
+        if self._work_classes is None:
+            sub = self.term_id(SUBCLASS_OF)
+            root = self.term_id(FABIO_WORK)
+            seen, stack = set(), [root] if root is not None else []
+            while stack:
+                c = stack.pop()
+                if c in seen:
+                    continue
+                seen.add(c)
+                stack.extend(self.subjects(sub, c))
+            self._work_classes = seen
+        return self._work_classes
+
+    def work_ids(self) -> set:
+        rdf_type = self.term_id(RDF_TYPE)
+        works = set()
+        for c in self.work_classes():
+            works.update(self.subjects(rdf_type, c))
+        return works
+
+    def _neighbour_rows(self, node: int, incoming: bool, labels: List[str], extra: Dict) -> List[Dict]:
+        """
+        Rows for ?s ?p ?o around node, with OPTIONAL ?sType / ?oType / ?label
+        expanded the way SPARQL does (one row per combination).
+        """
+        rdf_type = self.term_id(RDF_TYPE)
+        edges = [(node, p, o) for _, p, o in self.outgoing(node).tolist()]
+        if incoming:
+            edges += [(s, p, node) for _, s, p in self.incoming(node).tolist()]
+
+        rows = []
+        for s, p, o in edges:
+            s_types = self.objects(s, rdf_type) or [None]
+            o_types = self.objects(o, rdf_type) or [None]
+            o_labels = self._objects_any(o, labels) or [None]
+            base = {"s": term_binding(self.term(s)), "p": term_binding(self.term(p)), "o": term_binding(self.term(o)), **extra}
+            for st in s_types:
+                for ot in o_types:
+                    for lb in o_labels:
+                        row = dict(base)
+                        if st is not None:
+                            row["sType"] = term_binding(self.term(st))
+                        if ot is not None:
+                            row["oType"] = term_binding(self.term(ot))
+                        if lb is not None:
+                            row["label"] = term_binding(self.term(lb))
+                        rows.append(row)
+        return rows
+
+    # -- the app's query shapes --------------------------------
+
+    def first_hop(self, work_uri: str) -> List[Dict]:
+        """core.work_graph._get_first_hop"""
+        node = self._uri_id(work_uri)
+        if node is None:
+            return []
+        return self._neighbour_rows(node, True, FIRST_HOP_LABEL_PREDICATES, {})
+
+    def argument_neighbors(self, arg_uri: str) -> List[Dict]:
+        """core.work_graph.get_argument_neighbors (self-loops dropped, like its FILTER)."""
+        node = self._uri_id(arg_uri)
+        if node is None:
+            return []
+        extra = {"arg": {"type": "uri", "value": arg_uri}, "layer": {"type": "literal", "value": "argument_neighbor"}}
+        rows = self._neighbour_rows(node, True, NEIGHBOR_LABEL_PREDICATES, extra)
+        return [r for r in rows if not (r["s"]["value"] == arg_uri and r["o"]["value"] == arg_uri)]
+
+    def approach_neighbors(self, approach_uri: str) -> List[Dict]:
+        """core.work_graph.get_approach_neighbors (outgoing edges only)."""
+        node = self._uri_id(approach_uri)
+        if node is None:
+            return []
+        extra = {"ap": {"type": "uri", "value": approach_uri}, "layer": {"type": "literal", "value": "argument_subneighbor"}}
+        return self._neighbour_rows(node, False, NEIGHBOR_LABEL_PREDICATES, extra)
+
+    def resource_properties(self, uri: str) -> List[Dict]:
+        """core.resource_inspector.get_resource_properties"""
+        node = self._uri_id(uri)
+        if node is None:
+            return []
+        resource = {"type": "uri", "value": uri}
+        return [
+            {"resource": resource, "p": term_binding(self.term(p)), "o": term_binding(self.term(o))}
+            for _, p, o in self.outgoing(node).tolist()
+        ]
+
+    def all_works(self, limit: int = 500, offset: int = 0) -> List[Dict]:
+        """core.work_graph.get_all_works, same ordering and paging."""
+        # the store never changes once built, so the sorted listing is built once and sliced
+        if self._works is None:
+            self._works = self._sorted_works()
+        return [dict(w) for w in self._works[offset:offset + limit]]
+
+    def _sorted_works(self) -> List[Dict]:
+        publisher = self.term_id(_iri("dc:publisher"))
+        date = self.term_id(_iri("dc:date"))
+        discipline = self.term_id(_iri("fabio:hasDiscipline"))
+        creator = self.term_id(_iri("dc:creator"))
+
+        works = []
+        for w in self.work_ids():
+            uri = term_binding(self.term(w))["value"]
+            labels = self._objects_any(w, WORK_LABEL_PREDICATES)
+            label = term_binding(self.term(labels[0]))["value"] if labels else None
+
+            year = None
+            events = self.objects(w, publisher)
+            venue = term_binding(self.term(events[0]))["value"] if events else None
+            for event in events:
+                for d in self.objects(event, date):
+                    lexical = term_binding(self.term(d))["value"][:4]
+                    if lexical.isdigit() and len(lexical) == 4:
+                        year = lexical
+                        break
+                if year:
+                    break
+            keywords = sorted({term_binding(self.term(k))["value"] for k in self.objects(w, discipline)})
+            creators = sorted({
+                term_binding(self.term(c))["value"] for c in self.objects(w, creator)
+                if self.term(c).startswith("<")
+            })
+            works.append({
+                "uri": uri, "label": label if label is not None else uri, "year": year, "venue": venue,
+                "keywords": keywords, "creators": creators, "_sort": (label or uri).lower(),
+            })
+
+        works.sort(key=lambda w: (w["_sort"], w["uri"]))
+        return [{k: v for k, v in w.items() if k != "_sort"} for w in works]
+
+    def person_names(self) -> Dict[str, str]:
+        """core.work_graph.get_person_names."""
+        creator = self.term_id(_iri("dc:creator"))
+        if creator is None:
+            return {}
+        names = {}
+        for person in set(self._slice(self.pos, creator)[:, 1].tolist()):
+            token = self.term(person)
+            if not token.startswith("<"):
+                continue
+            uri = term_binding(token)["value"]
+            labels = self._objects_any(person, [_iri("foaf:name"), _iri("rdfs:label")])
+            names[uri] = term_binding(self.term(labels[0]))["value"] if labels else uri
+        return names
+
+    def citation_edges(self) -> List[Dict]:
+        """core.work_graph.get_citation_edges: doco cites target, source contains the doco's section."""
+        cites = self.term_id(_iri("cito:cites"))
+        has_content = self.term_id(_iri("c4o:hasContent"))
+        contains = self.term_id(_iri("po:contains"))
+        if cites is None:
+            return []
+
+        works = self.work_ids()
+        pairs = set()
+        for _, target, doco in self._slice(self.pos, cites).tolist():
+            if target not in works:
+                continue
+            for section in self.subjects(has_content, doco):
+                for source in self.subjects(contains, section):
+                    if source in works:
+                        pairs.add((source, target))
+
+        return [
+            {"source": self.term(s)[1:-1], "target": self.term(t)[1:-1], "predicate": "cito:cites"}
+            for s, t in sorted(pairs)
+        ]
+
+
+# ---------------------------
+# process-wide instance
+# ---------------------------
+
+_lock = threading.Lock()
+_store = {"path": None, "store": None, "version": None}
+
+
+def _file_version(path: str) -> str:
+    # a saved directory is complete once meta.json is replaced, so that dates it
+    target = os.path.join(path, "meta.json") if os.path.isdir(path) else path
+    stat = os.stat(target)
+    key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def get_local_store() -> TripleStore | None:
+    """The local mirror configured by LOCAL_STORE_PATH, loaded once; None if not configured."""
+    if not LOCAL_STORE_PATH:
+        return None
+    with _lock:
+        if _store["path"] != LOCAL_STORE_PATH:
+            # stat first: a dump rewritten while loading then reads as a newer version
+            _store["version"] = _file_version(LOCAL_STORE_PATH)
+            _store["store"] = TripleStore.load(LOCAL_STORE_PATH)
+            _store["path"] = LOCAL_STORE_PATH
+        return _store["store"]
+
+
+def local_store_version() -> str | None:
+    """
+    Fingerprint of the loaded local mirror (path, mtime and size of its
+    file, or of meta.json for a store directory); None if not configured.
+    """
+    if get_local_store() is None:
+        return None
+    return _store["version"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert an N-Triples/Turtle dump into the memory-mapped store layout.")
+    parser.add_argument("dump", help="N-Triples (.nt) or Turtle (.ttl) file")
+    parser.add_argument("out", help="store directory (point LOCAL_STORE_PATH here)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    store = TripleStore.load(args.dump)
+    store.save(args.out)
+    logging.info(f"wrote {len(store)} triples, {len(store.terms)} terms to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
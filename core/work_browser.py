@@ -1,24 +1,29 @@
-from core.query_builder import build_query 
+from core.query_builder import define_template, render_query, IRI
 from core.sparql_client import sparql 
 
 
-def get_all_works(endpoint):
-    query = build_query("""
+define_template("browser_works", """
         SELECT DISTINCT ?work WHERE { 
             ?work rdf:type ?type .
             ?type rdfs:subClassOf* fabio:Work .                
         }
         LIMIT 50
         """)
+
+define_template("work_triples", """
+    SELECT ?s ?p ?o WHERE {
+        $work ?p ?o .
+        BIND($work AS ?s)
+    }
+    """, work=IRI)
+
+
+def get_all_works(endpoint):
+    query = render_query("browser_works")
     
     return sparql(endpoint, query) 
 
 
 def get_work_triples(endpoint, work_uri):
-    query = build_query(f"""
-    SELECT ?s ?p ?o WHERE {{
-        <{work_uri}> ?p ?o .
-        BIND(<{work_uri}> AS ?s)
-    }}
-    """)
-    return sparql(endpoint, query)
\ No newline at end of file
+    query = render_query("work_triples", work=work_uri)
+    return sparql(endpoint, query)
@@ -1,10 +1,12 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 from core.sparql_client import sparql
-from core.query_builder import build_query
+from core.query_builder import define_template, render_query, is_resource, IRI, VALUES, INTEGER
 
-from config.settings import ARGUMENT_PREFIXES, STRUCTURE_PREFIXES, PERSON_PREFIXES, KEYWORD_PREFIXES, EVENT_PREFIXES, CITATION_PROPS, CITO_NS, FABIO_NS
+from config.settings import ARGUMENT_PREFIXES, CITATION_PROPS
 from core.graph_builder import triples_to_graph
+from core.batch_loader import BatchLoader, fetch_grouped
+from core.triple_store import get_local_store
 
 def _make_prefix_tests(var_name: str, prefixes: list[str]) -> str:
     """Return OR-ed SPARQL STRSTARTS tests for a variable, e.g. ?type."""
@@ -29,10 +31,9 @@ def _iri_or_tests(var: str, prefixes: List[str]) -> str:
     return " || ".join([f'STRSTARTS(STR({var}), "{p}")' for p in prefixes])
 
 
-def get_work_core_triples(endpoint, work):
-    query = build_query(f"""
-    SELECT ?s ?p ?o WHERE {{
-      BIND(<{work}> AS ?s)
+define_template("work_core_triples", """
+    SELECT ?s ?p ?o WHERE {
+      BIND($work AS ?s)
       ?s ?p ?o .
       FILTER(?p IN (
          dc:title,
@@ -40,17 +41,14 @@ def get_work_core_triples(endpoint, work):
          dc:abstract,
          fabio:hasPublicationYear
       ))
-    }}
-    """)
+    }
+    """, work=IRI)
+
+def get_work_core_triples(endpoint, work):
+    query = render_query("work_core_triples", work=work)
     return sparql(endpoint, query)
 
-def get_citation_edges(sparql_endpoint: str, limit: int = 2000):
-    """
-    Return directed citation edges between Works.
-    An edge exists if ?citing ?p ?cited and ?p rdfs:subPropertyOf* cito:cites.
-    Both endpoints must be fabio:Work (or subclass) instances.
-    """
-    query = build_query("""
+define_template("citation_edges", """
     SELECT DISTINCT ?sourceWork ?targetWork
     WHERE {
         # find citing doco elements
@@ -69,6 +67,18 @@ def get_citation_edges(sparql_endpoint: str, limit: int = 2000):
     }
     """)
 
+def get_citation_edges(sparql_endpoint: str, limit: int = 2000):
+    """
+    Return directed citation edges between Works.
+    An edge exists if ?citing ?p ?cited and ?p rdfs:subPropertyOf* cito:cites.
+    Both endpoints must be fabio:Work (or subclass) instances.
+    """
+    store = get_local_store()
+    if store is not None:
+        return store.citation_edges()
+
+    query = render_query("citation_edges")
+
     rows = sparql(sparql_endpoint, query)
 
     citations = []
@@ -80,10 +90,9 @@ def get_citation_edges(sparql_endpoint: str, limit: int = 2000):
         })
     return citations
 
-def get_work_structural_triples(endpoint, work):
-    query = build_query(f"""
-    SELECT ?s ?p ?o WHERE {{
-       <{work}> ?p ?o .
+define_template("work_structural_triples", """
+    SELECT ?s ?p ?o WHERE {
+       $work ?p ?o .
        FILTER (
          STRSTARTS(STR(?p), STR(doco:)) ||
          STRSTARTS(STR(?p), STR(deo:))  ||
@@ -95,21 +104,26 @@ def get_work_structural_triples(endpoint, work):
          STRSTARTS(STR(?p), STR(foaf:))  ||
          STRSTARTS(STR(?p), STR(semsur:))
        )
-    }}
-    """)
+    }
+    """, work=IRI)
+
+def get_work_structural_triples(endpoint, work):
+    query = render_query("work_structural_triples", work=work)
     return sparql(endpoint, query)
 
-def get_work_argument_triples(endpoint, work):
-    query = build_query(f"""
-    SELECT ?s ?p ?o WHERE {{
-      <{work}> ?p ?o .
+define_template("work_argument_triples", """
+    SELECT ?s ?p ?o WHERE {
+      $work ?p ?o .
       FILTER (
          STRSTARTS(STR(?o), STR(amo:)) ||
          STRSTARTS(STR(?o), STR(idea:)) ||
          STRSTARTS(STR(?o), STR(semsur:))
       )
-    }}
-    """)
+    }
+    """, work=IRI)
+
+def get_work_argument_triples(endpoint, work):
+    query = render_query("work_argument_triples", work=work)
     return sparql(endpoint, query)
 
 
@@ -145,32 +159,44 @@ def build_work_graph(
 # all works + basic metadata
 # ---------------------------
 
-def get_all_works(sparql_endpoint: str, limit: int = 500):
-    """
-    Return all instances of fabio:Work or its subclasses.
-    Requires that your ontology (with rdfs:subClassOf links) is loaded
-    into the same dataset or exposed via reasoning.
-    """
-    query = build_query(f"""
-    SELECT DISTINCT ?work (SAMPLE(?label0) AS ?label) (SAMPLE(?yearClean) AS ?year)
-    WHERE {{
+define_template("all_works", """
+    SELECT DISTINCT ?work (SAMPLE(?label0) AS ?label) (SAMPLE(?yearClean) AS ?year) (SAMPLE(?event) AS ?venue)
+           (GROUP_CONCAT(DISTINCT STR(?kw); separator=" ") AS ?keywords)
+           (GROUP_CONCAT(DISTINCT STR(?creator); separator=" ") AS ?creators)
+    WHERE {
         ?work rdf:type ?type .
         ?type rdfs:subClassOf* fabio:Work .
 
-        OPTIONAL {{ ?work dc:title|dct:title|rdfs:label ?label0 }}
+        OPTIONAL { ?work dc:title|dct:title|rdfs:label ?label0 }
+        OPTIONAL { ?work fabio:hasDiscipline ?kw }
+        OPTIONAL { ?work dc:creator ?creator . FILTER(isIRI(?creator)) }
 
-        OPTIONAL {{
+        OPTIONAL {
             ?work dc:publisher ?event .
             ?event dc:date ?year0 .
 
             # Keep only the lexical year component and cast to an xsd:gYear
             BIND( xsd:gYear( SUBSTR(STR(?year0), 1, 4) ) AS ?yearClean )
-        }}
-    }}
+        }
+    }
     GROUP BY ?work
-    ORDER BY LCASE(COALESCE(STR(?label), STR(?work)))
-    LIMIT {limit}
-    """)
+    ORDER BY LCASE(COALESCE(STR(?label), STR(?work))) ?work
+    LIMIT $limit
+    OFFSET $offset
+    """, limit=INTEGER, offset=INTEGER)
+
+def get_all_works(sparql_endpoint: str, limit: int = 500, offset: int = 0):
+    """
+    Return all instances of fabio:Work or its subclasses.
+    Requires that your ontology (with rdfs:subClassOf links) is loaded
+    into the same dataset or exposed via reasoning.
+    Page with offset; the ordering is total, so pages do not overlap.
+    """
+    store = get_local_store()
+    if store is not None:
+        return store.all_works(limit, offset)
+
+    query = render_query("all_works", limit=limit, offset=offset)
 
     rows = sparql(sparql_endpoint, query)
     print(f"Fetched {len(rows)} works from endpoint.")
@@ -179,9 +205,28 @@ def get_all_works(sparql_endpoint: str, limit: int = 500):
         uri   = row["work"]["value"]
         label = row.get("label", {}).get("value", uri)
         year  = row.get("year", {}).get("value")
-        works.append({"uri": uri, "label": label, "year": year})
+        venue = row.get("venue", {}).get("value")
+        # discipline keyword IRIs, space separated (IRIs cannot contain spaces)
+        keywords = row.get("keywords", {}).get("value", "").split()
+        creators = row.get("creators", {}).get("value", "").split()
+        works.append({
+            "uri": uri, "label": label, "year": year, "venue": venue,
+            "keywords": keywords, "creators": creators,
+        })
     return works
 
+
+def list_all_works(sparql_endpoint: str, page_size: int = 500, max_works: int | None = None):
+    """Page through get_all_works until a short page comes back."""
+    works, offset = [], 0
+    while True:
+        page = get_all_works(sparql_endpoint, limit=page_size, offset=offset)
+        works.extend(page)
+        offset += page_size
+        if len(page) < page_size or (max_works and len(works) >= max_works):
+            break
+    return works[:max_works] if max_works else works
+
 # def get_all_works(sparql_endpoint: str, limit: int = 500):
 #     """
 #     Return:
@@ -192,7 +237,7 @@ def get_all_works(sparql_endpoint: str, limit: int = 500):
 #     # 1) Fetch all works
 #     # -------------------------
 #     query_works = build_query(f"""
-#     SELECT DISTINCT ?work (SAMPLE(?label0) AS ?label) (SAMPLE(?yearClean) AS ?year)
+#     SELECT DISTINCT ?work (SAMPLE(?label0) AS ?label) (SAMPLE(?yearClean) AS ?year) (SAMPLE(?event) AS ?venue)
 #     WHERE {{
 #         ?work rdf:type ?type .
 #         ?type rdfs:subClassOf* fabio:Work .
@@ -258,18 +303,41 @@ def get_all_works(sparql_endpoint: str, limit: int = 500):
 
 
 # ---------------------------
-# citations across works
+# people (dc:creator of works)
 # ---------------------------
 
-def get_work_citations(sparql_endpoint: str) -> List[Dict[str, str]]:
+define_template("person_names", """
+    SELECT ?person (SAMPLE(?name0) AS ?name)
+    WHERE {
+        ?work dc:creator ?person .
+        FILTER(isIRI(?person))
+        OPTIONAL { ?person foaf:name|rdfs:label ?name0 }
+    }
+    GROUP BY ?person
+    """)
+
+def get_person_names(sparql_endpoint: str) -> Dict[str, str]:
     """
-    Return citation edges between work nodes.
+    Name of every creator of a work, keyed by person uri (the uri itself
+    when the person has no foaf:name / rdfs:label).
     """
-    prop_filters = " || ".join([f"(?p = <{p}>)" for p in CITATION_PROPS]) or "false"
+    store = get_local_store()
+    if store is not None:
+        return store.person_names()
 
-    q = build_query(f"""
+    rows = sparql(sparql_endpoint, render_query("person_names"))
+    return {
+        r["person"]["value"]: r.get("name", {}).get("value", r["person"]["value"])
+        for r in rows
+    }
+
+# ---------------------------
+# citations across works
+# ---------------------------
+
+define_template("work_citations", """
     SELECT DISTINCT ?citing ?cited
-    WHERE {{
+    WHERE {
         ?citing rdf:type ?t1 .
         ?t1 rdfs:subClassOf* fabio:Work .
 
@@ -277,9 +345,15 @@ def get_work_citations(sparql_endpoint: str) -> List[Dict[str, str]]:
         ?t2 rdfs:subClassOf* fabio:Work .
 
         ?citing ?p ?cited .
-        FILTER({prop_filters})
-    }}
-    """)
+        VALUES ?p { $props }
+    }
+    """, props=VALUES)
+
+def get_work_citations(sparql_endpoint: str) -> List[Dict[str, str]]:
+    """
+    Return citation edges between work nodes.
+    """
+    q = render_query("work_citations", props=CITATION_PROPS)
 
     rows = sparql(sparql_endpoint, q)
     edges = []
@@ -294,22 +368,24 @@ def get_work_citations(sparql_endpoint: str) -> List[Dict[str, str]]:
 # sidebar – keyword cloud
 # ---------------------------
 
-def get_top_keywords(sparql_endpoint: str, limit: int = 30):
-    """
-    Top discipline keywords (fabio:hasDiscipline) across works.
-    """
-    q = build_query(f"""
+define_template("top_keywords", """
     SELECT ?kw (COUNT(*) AS ?count)
-    WHERE {{
+    WHERE {
         ?work rdf:type ?type .
         ?type rdfs:subClassOf* fabio:Work .
 
         ?work fabio:hasDiscipline ?kw .
-    }}
+    }
     GROUP BY ?kw
     ORDER BY DESC(?count)
-    LIMIT {limit}
-    """)
+    LIMIT $limit
+    """, limit=INTEGER)
+
+def get_top_keywords(sparql_endpoint: str, limit: int = 30):
+    """
+    Top discipline keywords (fabio:hasDiscipline) across works.
+    """
+    q = render_query("top_keywords", limit=limit)
 
     rows = sparql(sparql_endpoint, q)
     return [
@@ -321,21 +397,23 @@ def get_top_keywords(sparql_endpoint: str, limit: int = 30):
 # section hierarchy
 # ---------------------------
 
+define_template("section_hierarchy", """
+    SELECT DISTINCT ?sec ?secType ?secTypeLabel
+    WHERE {
+        $work po:contains ?sec .
+
+        OPTIONAL { ?sec rdf:type ?secType . }
+        OPTIONAL { ?secType rdfs:label ?secTypeLabel }
+    }
+    ORDER BY ?sec
+    """, work=IRI)
+
 def get_section_hierarchy(sparql_endpoint: str, work_uri: str):
     """
     For now: one-level hierarchy – work -> sections.
     Uses po:contains and deo:* section types.
     """
-    q = build_query(f"""
-    SELECT DISTINCT ?sec ?secType ?secTypeLabel
-    WHERE {{
-        <{work_uri}> po:contains ?sec .
-
-        OPTIONAL {{ ?sec rdf:type ?secType . }}
-        OPTIONAL {{ ?secType rdfs:label ?secTypeLabel }}
-    }}
-    ORDER BY ?sec
-    """)
+    q = render_query("section_hierarchy", work=work_uri)
 
     rows = sparql(sparql_endpoint, q)
     sections = []
@@ -350,135 +428,168 @@ def get_section_hierarchy(sparql_endpoint: str, work_uri: str):
 # local graph around a work
 # ---------------------------
 
-def _get_first_hop(sparql_endpoint: str, work_uri: str):
-    """
-    1-hop around work, classify each triple into
-    structure / argument / metadata / other.
-    """
-    struct_tests = _iri_or_tests("?type", STRUCTURE_PREFIXES)
-    arg_tests = _iri_or_tests("?type", ARGUMENT_PREFIXES)
-
-    person_tests = _iri_or_tests("?type", PERSON_PREFIXES)
-    keyword_tests = _iri_or_tests("?type", KEYWORD_PREFIXES)
-    event_tests = _iri_or_tests("?type", EVENT_PREFIXES)
-
-    # metadata: people, events, keywords
-    meta_tests = f"({person_tests}) || ({keyword_tests}) || ({event_tests})"
-
-    q = build_query(f"""
+define_template("first_hop", """
     SELECT ?s ?p ?o ?sType ?oType ?label ?layer
-    WHERE {{
-        VALUES ?work {{ <{work_uri}> }}
+    WHERE {
+        VALUES ?work { $work }
 
-        {{
+        {
             BIND(?work AS ?s)
             ?work ?p ?o .
-        }}
+        }
         UNION
-        {{
+        {
             ?s ?p ?work .
             BIND(?work AS ?o)
-        }}
+        }
 
-        OPTIONAL {{ ?s rdf:type ?sType }}
-        OPTIONAL {{ ?o rdf:type ?oType }}
+        OPTIONAL { ?s rdf:type ?sType }
+        OPTIONAL { ?o rdf:type ?oType }
 
-        OPTIONAL {{
+        OPTIONAL {
             ?o dc:title|dct:title|rdfs:label|skos:prefLabel|
                 foaf:name|idea:hasLabel|fabio:hasDiscipline ?label .
-        }}
+        }
 
         BIND(COALESCE(?oType, ?sType) AS ?type)
 
-    }}
-    """)
-
-    return sparql(sparql_endpoint, q)
+    }
+    """, work=IRI)
 
-def get_argument_neighbors(
-    sparql_endpoint: str,
-    arg_node: str
-):
+def _get_first_hop(sparql_endpoint: str, work_uri: str):
     """
-    1-hop neighbors around a set of argument nodes.
-    Marked as layer = 'argument_neighbor'.
+    1-hop around work, classify each triple into
+    structure / argument / metadata / other.
     """
-    if not arg_node:
-        return []
+    store = get_local_store()
+    if store is not None:
+        return store.first_hop(work_uri)
 
-    values = f"<{arg_node}>"
+    q = render_query("first_hop", work=work_uri)
 
-    q = build_query(f"""
-    SELECT ?s ?p ?o ?sType ?oType ?label ?layer
-    WHERE {{
-        VALUES ?arg {{ {values} }}
+    return sparql(sparql_endpoint, q)
 
-        {{
+
+define_template("argument_neighbors", """
+    SELECT ?arg ?s ?p ?o ?sType ?oType ?label ?layer
+    WHERE {
+        VALUES ?arg { $args }
+
+        {
             BIND(?arg AS ?s)
             ?arg ?p ?o .
-        }}
+        }
         UNION
-        {{
+        {
             ?s ?p ?arg .
             BIND(?arg AS ?o)
-        }}
+        }
 
         FILTER(?s != ?arg || ?o != ?arg)
 
-        OPTIONAL {{ ?s rdf:type ?sType }}
-        OPTIONAL {{ ?o rdf:type ?oType }}
+        OPTIONAL { ?s rdf:type ?sType }
+        OPTIONAL { ?o rdf:type ?oType }
 
-        OPTIONAL {{
+        OPTIONAL {
             ?o dc:title|dct:title|rdfs:label|skos:prefLabel|
                 foaf:name|idea:hasLabel ?label .
-        }}
+        }
 
         BIND("argument_neighbor" AS ?layer)
-    }}
-    """)
-
-    return sparql(sparql_endpoint, q)
+    }
+    """, args=VALUES)
 
-def get_approach_neighbors(sparql_endpoint: str, approach_node: str):
+def get_argument_neighbors(
+    sparql_endpoint: str,
+    arg_node: str
+):
     """
-    Expand Approach → Artifact / Assumption / Framework / Algorithm / Idea, etc.
-    Layer = 'argument_subneighbor'
+    1-hop neighbors around a set of argument nodes.
+    Marked as layer = 'argument_neighbor'.
     """
-    if not approach_node:
+    if not arg_node:
         return []
 
-    values = f"<{approach_node}>"
+    store = get_local_store()
+    if store is not None:
+        return store.argument_neighbors(arg_node)
 
-    q = build_query(f"""
-    SELECT ?s ?p ?o ?sType ?oType ?label ?layer
-    WHERE {{
-        VALUES ?ap {{ {values} }}
+    q = render_query("argument_neighbors", args=[arg_node])
+
+    return sparql(sparql_endpoint, q)
+
+
+def get_argument_neighbors_many(sparql_endpoint: str, arg_nodes: List[str]):
+    """Batched get_argument_neighbors: one VALUES query per length-limited chunk."""
+    store = get_local_store()
+    if store is not None:
+        return {n: store.argument_neighbors(n) for n in dict.fromkeys(arg_nodes)}
+    return fetch_grouped(sparql_endpoint, "argument_neighbors", "args", "arg", arg_nodes)
+
+
+define_template("approach_neighbors", """
+    SELECT ?ap ?s ?p ?o ?sType ?oType ?label ?layer
+    WHERE {
+        VALUES ?ap { $approaches }
 
         # outgoing edges
-        {{
+        {
             BIND(?ap AS ?s)
             ?ap ?p ?o .
-        }}
+        }
 
-        OPTIONAL {{ ?s rdf:type ?sType }}
-        OPTIONAL {{ ?o rdf:type ?oType }}
+        OPTIONAL { ?s rdf:type ?sType }
+        OPTIONAL { ?o rdf:type ?oType }
 
-        OPTIONAL {{
+        OPTIONAL {
             ?o dc:title|dct:title|rdfs:label|skos:prefLabel|
                 foaf:name|idea:hasLabel ?label .
-        }}
+        }
 
         BIND("argument_subneighbor" AS ?layer)
-    }}
-    """)
+    }
+    """, approaches=VALUES)
+
+def get_approach_neighbors(sparql_endpoint: str, approach_node: str):
+    """
+    Expand Approach → Artifact / Assumption / Framework / Algorithm / Idea, etc.
+    Layer = 'argument_subneighbor'
+    """
+    if not approach_node:
+        return []
+
+    store = get_local_store()
+    if store is not None:
+        return store.approach_neighbors(approach_node)
+
+    q = render_query("approach_neighbors", approaches=[approach_node])
 
     return sparql(sparql_endpoint, q)
 
 
+def get_approach_neighbors_many(sparql_endpoint: str, approach_nodes: List[str]):
+    """Batched get_approach_neighbors, keyed by approach node."""
+    store = get_local_store()
+    if store is not None:
+        return {n: store.approach_neighbors(n) for n in dict.fromkeys(approach_nodes)}
+    return fetch_grouped(sparql_endpoint, "approach_neighbors", "approaches", "ap", approach_nodes)
+
+def argument_neighbors_loader(sparql_endpoint: str) -> BatchLoader:
+    return BatchLoader(lambda nodes: get_argument_neighbors_many(sparql_endpoint, nodes))
+
+def approach_neighbors_loader(sparql_endpoint: str) -> BatchLoader:
+    return BatchLoader(lambda nodes: get_approach_neighbors_many(sparql_endpoint, nodes))
+
+def neighbourhood_loaders(sparql_endpoint: str) -> Tuple[BatchLoader, BatchLoader]:
+    """(argument, approach) neighbour loaders; share one pair between works fetched together."""
+    return argument_neighbors_loader(sparql_endpoint), approach_neighbors_loader(sparql_endpoint)
+
+
 def get_work_local_graph(
     sparql_endpoint: str,
     work_uri: str,
-    expand_arguments: bool = True
+    expand_arguments: bool = True,
+    loaders: Tuple[BatchLoader, BatchLoader] | None = None,
 ):
     """
     Return:
@@ -487,6 +598,10 @@ def get_work_local_graph(
       - layer=metadata
       - layer=argument_neighbor        (2-hop)
       - layer=argument_subneighbor     (3-hop: Approach → Artifact)
+
+    The 2-hop and 3-hop lookups go through `loaders` (see
+    neighbourhood_loaders): callers fetching many works concurrently pass
+    one shared pair, so their lookups are batched into VALUES queries.
     """
     # 1-hop
     rows = _get_first_hop(sparql_endpoint, work_uri)
@@ -516,17 +631,16 @@ def get_work_local_graph(
 
     # ------------------------------------------------
     # 2-hop: neighbors around argument nodes
-    # ------------------------------------------------
-    second_hop = get_argument_neighbors(sparql_endpoint, arg_node)
-
-    # Collect Approach nodes among second-hop
-    approach_node = f"{work_uri}_research_approach"
-
-    # ------------------------------------------------
     # 3-hop: expand Approach → Artifacts / Assumptions
     # ------------------------------------------------
-    third_hop = []
-    third_hop = get_approach_neighbors(sparql_endpoint, approach_node)
+    # both nodes follow from the work uri, so the two lookups are requested
+    # together and run concurrently (and batched with other works' lookups)
+    approach_node = f"{work_uri}_research_approach"
+    argument_loader, approach_loader = loaders or neighbourhood_loaders(sparql_endpoint)
+    second_future = argument_loader.load(arg_node)
+    third_future = approach_loader.load(approach_node)
+    second_hop = second_future.result()
+    third_hop = third_future.result()
     # print(f"3-hop subneighbors around Approach node {approach_node}: {third_hop}")
     # print("3-hop oType list: ", set([r.get("oType", {}).get("value") for r in third_hop]))
     # ------------------------------------------------
@@ -547,6 +661,21 @@ def get_work_local_graph(
     return False, combined
 
 
+def neighbourhood_resources(work_uri: str, rows: List[Dict]) -> List[str]:
+    """
+    Resource URIs of a work's local graph, the work first, in row order.
+    Used for the batched node-properties lookup, so the same work always
+    produces the same (cacheable) batch.
+    """
+    uris = [work_uri]
+    for r in rows:
+        for key in ("s", "o"):
+            value = r[key]["value"]
+            if r[key].get("type") == "uri" and is_resource(value):
+                uris.append(value)
+    return list(dict.fromkeys(uris))
+
+
 # def get_work_local_graph(
 #     sparql_endpoint: str,
 #     work_uri: str,
@@ -12,6 +12,8 @@ import math
 import random
 from decouple import config
 from util import include_css, download_image, save_uploaded_file, replace_values_in_index_html
+from core.sparql_client import scheduler, set_query_session, Priority, SchedulerBusy
+from core.dataset_version import dataset_version, on_version_change
 import json
 from SPARQLWrapper import SPARQLWrapper, JSON, POST
 from pprint import pprint, pformat   
@@ -22,6 +24,7 @@ from streamlit_agraph import agraph, Node, Edge, Config
 from streamlit_tags import st_tags, st_tags_sidebar
 import seaborn as sns
 import signal
+import uuid
 
 PAGE_ICON = config('PAGE_ICON')
 PAGE_IMAGE = config('PAGE_IMAGE')
@@ -31,6 +34,7 @@ META_DESCRIPTION = config('META_DESCRIPTION', default=None)
 REPLACE_INDEX_HTML_CONTENT = config('REPLACE_INDEX_HTML_CONTENT', default=False, cast=bool)
 CANONICAL_URL = config('CANONICAL_URL', default=None)
 ADDITIONAL_HTML_HEAD_CONTENT = config('ADDITIONAL_HTML_HEAD_CONTENT', default="")
+QUERY_CACHE_MAX_ENTRIES = config('QUERY_CACHE_MAX_ENTRIES', default=1024, cast=int)
 
 PAGE_TITLE = "KinGVisher -- Knowledge Graph Visualizer"
 MIN_WIDTH = 10
@@ -184,6 +188,10 @@ sparql_endpoint = st.sidebar.text_input("SPARQL endpoint:", key="sparql_endpoint
 specific_graph = st.sidebar.text_input("Specific graph:", key="specific_graph", help="optional parameter: if empty, the default graph will be used")
 
 
+if "query_session" not in st.session_state:
+    st.session_state["query_session"] = uuid.uuid4().hex
+set_query_session(st.session_state["query_session"])
+
 if sparql_endpoint != None and validators.url(sparql_endpoint):
     sparql = SPARQLWrapper(sparql_endpoint)
     st.header(f"KinGVisher – Knowledge Graph Visualizer for&nbsp;[{sparql_endpoint}]({sparql_endpoint}) ", help="Used prefixes: \n* " + "\n* ".join([f"`{prefix}: {prefix_url}`" for prefix, prefix_url in PREFIXES.items()]))
@@ -193,9 +201,13 @@ else:
     st.info("Please provide a valid SPARQL endpoint, e.g., %s or %s" % (DBPEDIA_ENDPOINT, WIKIDATA_ENDPOINT))
     st.stop()
 
-def execute_query_convert(sparql_endpoint, query_string):
+def execute_query_convert(sparql_endpoint, query_string, priority=Priority.PAGE_LOAD):
     try:
-        return query_execution_and_convert(sparql_endpoint, query_string)
+        return query_execution_and_convert(sparql_endpoint, query_string, dataset_version(sparql_endpoint), priority)
+    except SchedulerBusy as e:
+        logging.warning(e)
+        st.warning("The endpoint is busy, please retry in a moment.")
+        return []
     except Exception as e:
         logging.error(e)
         logging.error(query_string)
@@ -203,14 +215,25 @@ def execute_query_convert(sparql_endpoint, query_string):
         st.error(e)
         return []
 
-@st.cache_data(show_spinner="Fetching data from triplestore ...", ttl="7d")
-def query_execution_and_convert(sparql_endpoint, query_string):
+@st.cache_data(show_spinner="Fetching data from triplestore ...", max_entries=QUERY_CACHE_MAX_ENTRIES)
+def query_execution_and_convert(sparql_endpoint, query_string, version, _priority=Priority.PAGE_LOAD):
+    # version (core.dataset_version) is part of the cache key, so no time-based expiry is needed:
+    # entries live as long as the data does and are dropped when it changes (see below)
     logging.info("execute_query_convert_and_count on " + sparql_endpoint + ":" + query_string)
     sparql.setQuery(query_string)
     sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
+    # _priority is left out of the cache key: the same query answers the same at any priority
+    results = scheduler.run(lambda: sparql.query().convert(), priority=_priority)
     return results["results"]["bindings"]
-    
+
+
+@st.cache_resource
+def register_query_cache_invalidation():
+    # cache_resource: the listener is registered once per process, not on every rerun
+    on_version_change(lambda endpoint, old, new: query_execution_and_convert.clear())
+
+register_query_cache_invalidation()
+
 
 def get_graph_expression(graph):
     if graph != None and len(graph) > 0:
@@ -479,7 +502,9 @@ def get_resources(sparql_endpoint, max):
 def get_all_properties(sparql_endpoint, graph=None):
     
     cleaned_sparql_endpoint = sparql_endpoint.replace(":", "_").replace("/", "_").replace(".", "_")
-    cache_filename= LOCAL_CACHE_FOLDER + "/all_properties_" + cleaned_sparql_endpoint + "_" + str(graph) + ".json"
+    cache_prefix = LOCAL_CACHE_FOLDER + "/all_properties_" + cleaned_sparql_endpoint + "_" + str(graph) + "_"
+    # tagged with the dataset version, so a changed dataset is scanned again
+    cache_filename = cache_prefix + str(dataset_version(sparql_endpoint)) + ".json"
     
     # check if directory exists
     if not os.path.exists(LOCAL_CACHE_FOLDER):
@@ -538,7 +563,8 @@ def get_all_properties(sparql_endpoint, graph=None):
             LIMIT 10000
             OFFSET %d
         """ % (page * 10000,)
-        results = execute_query_convert(sparql_endpoint, query_string)
+        # paging through all properties is bulk work, behind the queries the user is waiting on
+        results = execute_query_convert(sparql_endpoint, query_string, Priority.BACKGROUND)
         
         if len(results) == 0:
             break
@@ -587,10 +613,18 @@ def get_all_properties(sparql_endpoint, graph=None):
                 #print("found new property: " + p)
                 all_properties.append(p)
     
-    # cache all data in a file
+    # cache all data in a file, replacing the ones of older dataset versions
     with open(cache_filename, "w") as f:
         json.dump(all_properties, f)
         logging.info("cache file written: " + cache_filename + " ...")
+    for name in os.listdir(LOCAL_CACHE_FOLDER):
+        path = LOCAL_CACHE_FOLDER + "/" + name
+        # versions never contain "_", so other graphs' files do not match
+        if path.startswith(cache_prefix) and "_" not in path[len(cache_prefix):] and path != cache_filename:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.error("could not remove outdated cache file: " + path + ": " + str(e))
     
     return all_properties
 
@@ -685,7 +719,7 @@ def get_resource_data(sparql_endpoint, uri, graph):
     with st.expander("SPARQL query for retrieving resource data for " + uri.replace("_", "&#95;").replace(":", "\:"), expanded=False):
         st.code(query_string)
     
-    results = execute_query_convert(sparql_endpoint, query_string)    
+    results = execute_query_convert(sparql_endpoint, query_string, Priority.INTERACTIVE)    
     return results
 
 
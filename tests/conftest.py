@@ -0,0 +1,6 @@
+"""Helpers shared by the tests; import them with `from conftest import ...`."""
+
+
+def cite(*pairs):
+    """get_citation_edges()-style dicts for (source, target) pairs."""
+    return [{"source": s, "target": t} for s, t in pairs]
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+import core.batch_loader as batch_loader
+import core.resource_inspector  # noqa: F401  (registers resource_properties)
+from core.batch_loader import BatchLoader, chunk_for_query_length, fetch_grouped
+from core.query_builder import render_query
+
+URIS = [f"http://example.org/resource/{i}" for i in range(40)]
+
+
+class Recorder:
+    """batch_fn that records each batch and answers key -> [key]."""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, keys):
+        with self._lock:
+            self.batches.append(sorted(keys))
+        if self.fail:
+            raise RuntimeError("endpoint down")
+        return {k: [k] for k in keys}
+
+
+def test_chunks_stay_below_the_length_limit():
+    limit = len(render_query("resource_properties", resources=URIS[:10])) + 5
+    chunks = chunk_for_query_length("resource_properties", "resources", URIS, limit)
+    assert len(chunks) > 1
+    assert [u for chunk in chunks for u in chunk] == URIS
+    for chunk in chunks:
+        assert len(render_query("resource_properties", resources=chunk)) <= limit
+
+
+def test_an_oversized_uri_gets_a_chunk_of_its_own():
+    long_uri = "http://example.org/" + "x" * 5000
+    chunks = chunk_for_query_length("resource_properties", "resources", [URIS[0], long_uri, URIS[1]], 2000)
+    assert chunks == [[URIS[0]], [long_uri], [URIS[1]]]
+
+
+def test_fetch_grouped_splits_rows_per_key(monkeypatch):
+    queries = []
+
+    def sparql(endpoint, query, cache=True):
+        queries.append(query)
+        return [{"resource": {"value": u}, "p": {"value": "p"}} for u in URIS if f"<{u}>" in query] + [
+            {"resource": {"value": "http://elsewhere"}},
+            {"p": {"value": "no key"}},
+        ]
+
+    monkeypatch.setattr(batch_loader, "sparql", sparql)
+    limit = len(render_query("resource_properties", resources=URIS[:10])) + 5
+    grouped = fetch_grouped("stub", "resource_properties", "resources", "resource", URIS + URIS[:3], limit)
+    assert list(grouped) == URIS
+    assert all(len(rows) == 1 and rows[0]["resource"]["value"] == uri for uri, rows in grouped.items())
+    assert len(queries) == len(chunk_for_query_length("resource_properties", "resources", URIS, limit))
+
+
+def test_loads_within_the_window_share_a_batch():
+    fn = Recorder()
+    loader = BatchLoader(fn, window=0.05)
+    futures = [loader.load(k) for k in ("a", "b", "a")]
+    assert futures[0] is futures[2]
+    assert [f.result(1) for f in futures] == [["a"], ["b"], ["a"]]
+    assert fn.batches == [["a", "b"]]
+
+    # resolved keys come from the loader's cache; new ones start a new batch
+    assert loader.load("a").result(1) == ["a"]
+    assert loader.load("c").result(1) == ["c"]
+    assert fn.batches == [["a", "b"], ["c"]]
+
+
+def test_window_delays_the_dispatch():
+    fn = Recorder()
+    loader = BatchLoader(fn, window=0.1)
+    started = time.monotonic()
+    loader.load("a").result(1)
+    assert time.monotonic() - started >= 0.09
+
+
+def test_a_held_loader_dispatches_on_exit():
+    fn = Recorder()
+    loader = BatchLoader(fn, window=0.01)
+    with loader:
+        futures = [loader.load(k) for k in "abc"]
+        time.sleep(0.05)
+        assert fn.batches == []
+    assert [f.result(1) for f in futures] == [["a"], ["b"], ["c"]]
+    assert fn.batches == [["a", "b", "c"]]
+    assert loader.load_many(["c", "d"]) == [["c"], ["d"]]
+    assert fn.batches[-1] == ["d"]
+
+
+def test_get_does_not_wait_for_the_window():
+    loader = BatchLoader(Recorder(), window=5)
+    started = time.monotonic()
+    assert loader.get("a") == ["a"]
+    assert time.monotonic() - started < 1
+
+
+def test_failed_batches_fail_their_keys_and_are_retried():
+    fn = Recorder(fail=True)
+    loader = BatchLoader(fn, window=0.01)
+    with pytest.raises(RuntimeError):
+        loader.get("a")
+    fn.fail = False
+    assert loader.get("a") == ["a"]
+    assert fn.batches == [["a"], ["a"]]
+
+
+def test_prime_and_clear():
+    fn = Recorder()
+    loader = BatchLoader(fn)
+    loader.prime("a", ["primed"])
+    assert loader.get("a") == ["primed"]
+    loader.clear()
+    assert loader.get("a") == ["a"]
+    assert fn.batches == [["a"]]
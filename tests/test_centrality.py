@@ -0,0 +1,72 @@
+import numpy as np
+
+from core.centrality import WorkCentrality, pagerank
+from core.citation_graph import CitationGraph
+
+from conftest import cite
+
+
+def dense_pagerank(graph, damping=0.85):
+    """Reference: solve the PageRank linear system with a dense Google matrix."""
+    n = len(graph)
+    m = np.zeros((n, n))
+    for s, t in zip(graph.sources, graph.targets):
+        m[t, s] = 1.0
+    out = m.sum(axis=0)
+    m[:, out == 0] = 1.0
+    m /= m.sum(axis=0)
+    g = damping * m + (1 - damping) / n
+    values, vectors = np.linalg.eig(g)
+    rank = np.real(vectors[:, np.argmax(np.real(values))])
+    return rank / rank.sum()
+
+
+STAR = cite(*((f"leaf{i}", "hub") for i in range(6)))
+
+
+def test_scores_sum_to_one():
+    graph = CitationGraph.from_citations(cite(("a", "b"), ("b", "c"), ("c", "a"), ("d", "a")))
+    rank = pagerank(graph)
+    assert np.isclose(rank.sum(), 1.0)
+    assert np.allclose(rank, dense_pagerank(graph))
+
+
+def test_star_ranks_its_hub_first():
+    graph = CitationGraph.from_citations(STAR)
+    rank = dict(zip(graph.nodes, pagerank(graph)))
+    assert max(rank, key=rank.get) == "hub"
+    leaves = [rank[f"leaf{i}"] for i in range(6)]
+    assert np.allclose(leaves, leaves[0])
+
+
+def test_dangling_nodes_do_not_leak_mass():
+    # b, d and e cite nothing; e has no edges at all
+    graph = CitationGraph.from_citations(cite(("a", "b"), ("c", "d"), ("c", "b")), works=["a", "b", "c", "d", "e"])
+    rank = pagerank(graph)
+    assert np.isclose(rank.sum(), 1.0)
+    assert np.allclose(rank, dense_pagerank(graph))
+    assert (rank > 0).all()
+
+
+def test_empty_graph():
+    assert pagerank(CitationGraph.from_citations([])).tolist() == []
+
+
+def test_in_degree_and_baseline():
+    centrality = WorkCentrality.from_citations(STAR + cite(("leaf0", "leaf1")))
+    assert centrality.in_degree("hub") == 6
+    assert centrality.in_degree("leaf1") == 1
+    assert centrality.in_degree("unknown") == 0
+    assert centrality.pagerank("unknown") == centrality.baseline == min(
+        centrality.pagerank(f"leaf{i}") for i in range(6)
+    )
+
+
+def test_top_keeps_the_k_highest_in_their_original_order():
+    centrality = WorkCentrality.from_citations(STAR + cite(("leaf0", "leaf1"), ("leaf2", "leaf1")))
+    works = [{"uri": u} for u in ["leaf3", "leaf1", "leaf4", "hub", "leaf5", "unknown"]]
+    assert centrality.top(works, 2) == [{"uri": "leaf1"}, {"uri": "hub"}]
+    # ties among the leaves keep the earliest ones, and the input order
+    assert centrality.top(works, 4) == [{"uri": "leaf3"}, {"uri": "leaf1"}, {"uri": "leaf4"}, {"uri": "hub"}]
+    assert centrality.top(works, 4) == centrality.top(works, 4)
+    assert centrality.top(works, 10) is works
@@ -0,0 +1,77 @@
+import numpy as np
+
+from core.citation_graph import CitationGraph, _ranges
+
+from conftest import cite
+
+
+def test_duplicates_and_self_citations_are_dropped():
+    graph = CitationGraph.from_citations(cite(("a", "b"), ("a", "b"), ("b", "b"), ("b", "c")))
+    assert graph.nodes == ["a", "b", "c"]
+    assert graph.edge_count == 2
+    assert graph.out_degree().tolist() == [1, 1, 0]
+    assert graph.in_degree().tolist() == [0, 1, 1]
+
+
+def test_adjacency_both_ways():
+    graph = CitationGraph.from_citations(cite(("a", "c"), ("a", "b"), ("b", "c")))
+    a, b, c = (graph.index[u] for u in "abc")
+    assert sorted(graph.cites(a).tolist()) == sorted([b, c])
+    assert sorted(graph.cited_by(c).tolist()) == sorted([a, b])
+    assert graph.cites(c).tolist() == []
+
+
+def test_works_restrict_the_nodes():
+    graph = CitationGraph.from_citations(cite(("a", "b"), ("a", "x")), works=["a", "b", "lonely"])
+    assert graph.nodes == ["a", "b", "lonely"]
+    assert graph.edge_count == 1
+
+
+def test_ranges_lists_each_rows_entries():
+    indptr = np.array([0, 2, 2, 5])
+    owner, position = _ranges(indptr, np.array([2, 0]))
+    assert owner.tolist() == [2, 2, 2, 0, 0]
+    assert position.tolist() == [2, 3, 4, 0, 1]
+
+
+def test_connected_components_ignore_direction_and_rank_by_size():
+    graph = CitationGraph.from_citations(
+        cite(("a", "b"), ("c", "b"), ("x", "y")), works=["x", "y", "a", "b", "c", "alone"],
+    )
+    label = dict(zip(graph.nodes, graph.connected_components().tolist()))
+    assert label["a"] == label["b"] == label["c"] == 0
+    assert label["x"] == label["y"] == 1
+    assert label["alone"] == 2
+
+
+def test_grow_keeps_numbering_and_marks_new_edges():
+    graph = CitationGraph.from_citations(cite(("a", "b")))
+    grown, fresh = graph.grow(cite(("a", "b"), ("c", "a")))
+    assert grown.nodes[:2] == graph.nodes
+    assert fresh.sum() == 1
+    assert (grown.nodes[grown.sources[fresh][0]], grown.nodes[grown.targets[fresh][0]]) == ("c", "a")
+
+
+def test_grow_refuses_removals():
+    graph = CitationGraph.from_citations(cite(("a", "b"), ("b", "c")))
+    assert graph.grow(cite(("a", "b"))) is None
+
+
+def test_grow_matches_a_rebuild():
+    old = cite(("a", "b"), ("b", "c"), ("c", "d"))
+    new = old + cite(("d", "a"), ("a", "c"), ("a", "c"), ("e", "b"), ("e", "e"), ("b", "c"))
+    grown, fresh = CitationGraph.from_citations(old).grow(new)
+    rebuilt = CitationGraph.from_citations(new, works=grown.nodes)
+    assert grown.nodes == ["a", "b", "c", "d", "e"]
+    assert grown.sources.tolist() == rebuilt.sources.tolist()
+    assert grown.targets.tolist() == rebuilt.targets.tolist()
+    for name in ("out_indptr", "out_indices", "in_indptr", "in_indices"):
+        assert getattr(grown, name).tolist() == getattr(rebuilt, name).tolist(), name
+    added = {(grown.nodes[s], grown.nodes[t]) for s, t in zip(grown.sources[fresh], grown.targets[fresh])}
+    assert added == {("d", "a"), ("a", "c"), ("e", "b")}
+
+
+def test_grow_without_citations():
+    graph = CitationGraph.from_citations([], works=["a"])
+    grown, fresh = graph.grow([], works=["a", "b"])
+    assert grown.nodes == ["a", "b"] and grown.edge_count == 0 and not fresh.any()
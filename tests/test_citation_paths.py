@@ -0,0 +1,46 @@
+import pytest
+
+from core.citation_paths import PathFinder, path_steps
+
+from conftest import cite
+
+
+# a cites b cites c cites d; a also reaches d through x; e cites d
+FINDER = PathFinder.from_citations(cite(
+    ("a", "b"), ("b", "c"), ("c", "d"),
+    ("a", "x"), ("x", "d"),
+    ("e", "d"),
+))
+
+
+def test_shortest_path():
+    assert FINDER.paths("a", "d") == [["a", "x", "d"]]
+    assert FINDER.paths("a", "a") == [["a"]]
+
+
+def test_k_shortest_paths_are_distinct_and_ordered():
+    paths = FINDER.paths("a", "d", k=3)
+    assert paths == [["a", "x", "d"], ["a", "b", "c", "d"]]
+
+
+def test_hop_limit():
+    assert FINDER.paths("a", "d", k=2, max_hops=2) == [["a", "x", "d"]]
+    assert FINDER.paths("b", "d", max_hops=1) == []
+
+
+def test_directions():
+    # e and a are only connected against the direction of e's citation
+    assert FINDER.paths("a", "e") == [["a", "x", "d", "e"]]
+    assert FINDER.paths("a", "e", direction="cites") == []
+    assert FINDER.paths("d", "a", direction="cited_by") == [["d", "x", "a"]]
+    assert FINDER.paths("d", "a", direction="cites") == []
+
+
+def test_unknown_works_and_directions():
+    assert FINDER.paths("a", "nowhere") == []
+    with pytest.raises(ValueError):
+        FINDER.paths("a", "d", direction="sideways")
+
+
+def test_path_steps():
+    assert path_steps([["a", "b", "c"], ["a", "d"]]) == {("a", "b"), ("b", "c"), ("a", "d")}
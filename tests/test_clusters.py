@@ -0,0 +1,79 @@
+import pytest
+
+import core.clusters as clusters
+from core.clusters import OTHER, UNKNOWN, _cap, cluster_label, cluster_members, summarize_clusters, work_clusters
+
+from conftest import cite
+
+WORKS = [
+    {"uri": "w0", "venue": "http://example.org/venue/A"},
+    {"uri": "w1", "venue": "http://example.org/venue/A"},
+    {"uri": "w2", "venue": "http://example.org/venue/A"},
+    {"uri": "w3", "venue": "http://example.org/venue/B"},
+    {"uri": "w4", "venue": "http://example.org/venue/B"},
+    {"uri": "w5", "venue": None},
+]
+ASSIGNMENT = {"w0": "A", "w1": "A", "w2": "A", "w3": "B", "w4": "B", "w5": UNKNOWN}
+
+
+def test_cap_folds_small_and_overflow_clusters_into_other(monkeypatch):
+    monkeypatch.setattr(clusters, "OVERVIEW_MAX_CLUSTERS", 2)
+    monkeypatch.setattr(clusters, "OVERVIEW_MIN_CLUSTER_SIZE", 2)
+    assignment = {"a1": "a", "a2": "a", "a3": "a", "b1": "b", "b2": "b", "c1": "c", "c2": "c", "d1": "d"}
+    assert _cap(assignment) == {
+        "a1": "a", "a2": "a", "a3": "a", "b1": "b", "b2": "b",
+        # c is as large as b but beyond the cap, d is too small
+        "c1": OTHER, "c2": OTHER, "d1": OTHER,
+    }
+
+    monkeypatch.setattr(clusters, "OVERVIEW_MIN_CLUSTER_SIZE", 3)
+    assert set(_cap(assignment).values()) == {"a", OTHER}
+
+
+def test_summary_weights_edges_by_citations_and_drops_self_loops():
+    citations = cite(
+        ("w0", "w3"), ("w1", "w3"), ("w2", "w4"),   # A -> B three times
+        ("w3", "w0"),                               # B -> A once
+        ("w0", "w1"), ("w3", "w4"),                 # inside a cluster
+        ("w5", "w0"), ("w0", "elsewhere"),          # unknown venue; not a visible work
+    )
+    found, edges = summarize_clusters(WORKS, citations, ASSIGNMENT, "venue")
+    assert found == [
+        {"key": "A", "label": "A", "size": 3},
+        {"key": "B", "label": "B", "size": 2},
+        {"key": UNKNOWN, "label": "Unknown venue", "size": 1},
+    ]
+    assert sorted((e["source"], e["target"], e["weight"]) for e in edges) == [
+        ("A", "B", 3), ("B", "A", 1), (UNKNOWN, "A", 1),
+    ]
+
+
+def test_summary_counts_only_visible_works():
+    found, edges = summarize_clusters(WORKS[3:5], cite(("w0", "w3"), ("w3", "w4")), ASSIGNMENT, "venue")
+    assert found == [{"key": "B", "label": "B", "size": 2}]
+    assert edges == []
+
+
+def test_cluster_members_returns_only_the_opened_cluster():
+    assert [w["uri"] for w in cluster_members(WORKS, ASSIGNMENT, "B")] == ["w3", "w4"]
+    # works missing from the assignment belong to OTHER
+    assert cluster_members(WORKS + [{"uri": "new"}], ASSIGNMENT, OTHER) == [{"uri": "new"}]
+    assert cluster_members(WORKS, ASSIGNMENT, "missing") == []
+
+
+def test_cluster_labels():
+    assert cluster_label("venue", "http://example.org/venue/ISWC/") == "ISWC"
+    assert cluster_label("community", "c3") == "Community 3"
+    assert cluster_label("year", OTHER) == "Other works"
+
+
+def test_work_clusters_by_attribute_are_kept_per_version(monkeypatch):
+    monkeypatch.setattr(clusters, "_assignments", {})
+    monkeypatch.setattr(clusters, "OVERVIEW_MIN_CLUSTER_SIZE", 1)
+    first = work_clusters(WORKS, [], "venue", version="v1")
+    assert first["w0"] == "http://example.org/venue/A" and first["w5"] == UNKNOWN
+    assert work_clusters(WORKS, [], "venue", version="v1") is first
+    assert work_clusters(WORKS, [], "venue", version="v2") is not first
+    assert list(clusters._assignments) == [("v2", "venue")]
+    with pytest.raises(ValueError):
+        work_clusters(WORKS, [], "colour")
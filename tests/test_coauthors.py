@@ -0,0 +1,45 @@
+import numpy as np
+
+from core.coauthors import CoauthorIndex
+from core.keywords import incidence_pairs
+
+WORKS = [
+    {"uri": "w1", "creators": ["ann", "bob"]},
+    {"uri": "w2", "creators": ["ann", "bob", "cy"]},
+    {"uri": "w3", "creators": ["cy"]},
+]
+
+
+def test_incidence_pairs_counts_shared_rows():
+    # rows 0 and 1 both have columns 0 and 1; row 1 also has column 2
+    i, j, counts = incidence_pairs(np.array([0, 0, 1, 1, 1]), np.array([0, 1, 0, 1, 2]), 2, 3)
+    assert list(zip(i.tolist(), j.tolist(), counts.tolist())) == [(0, 1, 2), (0, 2, 1), (1, 2, 1)]
+
+
+def test_weights_and_works():
+    index = CoauthorIndex()
+    index.update(WORKS)
+    assert index.weight("ann", "bob") == 2
+    assert index.weight("bob", "cy") == 1
+    assert index.weight("ann", "nobody") == 0
+    assert index.coauthors("ann") == [("bob", 2), ("cy", 1)]
+    assert index.works_of("cy") == {"w2", "w3"}
+    assert sorted(index.people()) == ["ann", "bob", "cy"]
+
+
+def test_incremental_update_matches_a_rebuild():
+    index = CoauthorIndex()
+    index.update(WORKS)
+    changed = [
+        {"uri": "w1", "creators": ["ann", "dee"]},   # re-tagged
+        {"uri": "w3", "creators": ["cy"]},            # unchanged
+        {"uri": "w4", "creators": ["dee", "cy"]},     # added; w2 removed
+    ]
+    assert index.update(changed) == 3
+
+    rebuilt = CoauthorIndex()
+    rebuilt.update(changed)
+    for person in ["ann", "bob", "cy", "dee"]:
+        assert index.coauthors(person) == rebuilt.coauthors(person), person
+        assert index.works_of(person) == rebuilt.works_of(person), person
+    assert "bob" not in index
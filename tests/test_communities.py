@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from core.communities import CommunityIndex, community_map, label_propagation
+
+from conftest import cite
+
+
+def clique(prefix, size):
+    nodes = [f"{prefix}{i}" for i in range(size)]
+    return nodes, cite(*((a, b) for i, a in enumerate(nodes) for b in nodes[i + 1:]))
+
+
+# two dense groups joined by a single citation
+A, A_CITES = clique("a", 5)
+B, B_CITES = clique("b", 5)
+WORKS = A + B
+CITATIONS = A_CITES + B_CITES + cite(("a0", "b0"))
+
+
+def groups(assignment):
+    found = {}
+    for uri, community in assignment.items():
+        found.setdefault(community, set()).add(uri)
+    return sorted(map(sorted, found.values()))
+
+
+def test_label_propagation_separates_cliques():
+    index = CommunityIndex.build(WORKS, CITATIONS)
+    assert groups(index.assignment()) == [A, B]
+
+
+def test_label_propagation_keeps_isolated_nodes_apart():
+    u, v = np.array([0, 1]), np.array([1, 0])
+    labels = label_propagation(3, u, v)
+    assert labels[0] == labels[1]
+    assert labels[2] == 2
+
+
+def test_assignment_numbers_communities_by_size():
+    assignment = CommunityIndex.build(WORKS + ["lonely"], CITATIONS).assignment()
+    assert {assignment["a0"], assignment["b0"]} == {0, 1}
+    assert assignment["lonely"] == 2
+
+
+def test_update_without_changes_is_a_no_op():
+    index = CommunityIndex.build(WORKS, CITATIONS)
+    assert index.update(WORKS, CITATIONS) is index
+
+
+def test_update_places_new_works_in_their_community():
+    index = CommunityIndex.build(WORKS, CITATIONS)
+    new = cite(("a5", "a0"), ("a5", "a1"), ("a5", "a2"), ("b5", "b0"), ("b5", "b1"), ("b5", "b2"))
+    updated = index.update(WORKS + ["a5", "b5"], CITATIONS + new)
+    assert updated is not index
+    assert groups(updated.assignment()) == [A + ["a5"], B + ["b5"]]
+
+
+def test_update_keeps_labels_and_touches_only_the_new_citations_surroundings(monkeypatch):
+    import core.communities as communities
+    C, C_CITES = clique("c", 5)
+    index = CommunityIndex.build(WORKS + C, CITATIONS + C_CITES)
+    before = dict(zip(index.nodes, index.labels.tolist()))
+
+    touched = set()
+    gather = communities._neighbours
+
+    def spy(adjacency, rows):
+        touched.update(rows.tolist())
+        return gather(adjacency, rows)
+
+    monkeypatch.setattr(communities, "_neighbours", spy)
+    new = cite(("b5", "b0"), ("b5", "b1"), ("b5", "b2"), ("b3", "b1"))
+    updated = index.update(WORKS + C + ["b5"], CITATIONS + C_CITES + new)
+
+    after = dict(zip(updated.nodes, updated.labels.tolist()))
+    assert all(after[uri] == label for uri, label in before.items())
+    assert after["b5"] == after["b0"]
+    # propagation stayed inside b's clique (and a0, b0's neighbour)
+    assert touched and {updated.nodes[i] for i in touched} <= set(B + ["b5", "a0"])
+
+
+def test_update_after_a_removal_rebuilds():
+    index = CommunityIndex.build(WORKS, CITATIONS)
+    updated = index.update(A, A_CITES)
+    assert groups(updated.assignment()) == [A]
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    path = str(tmp_path / "communities.npz")
+    index = CommunityIndex.build(WORKS, CITATIONS)
+    index.save(path)
+    loaded = CommunityIndex.load(path)
+    assert loaded.nodes == index.nodes
+    assert all(isinstance(uri, str) for uri in loaded.nodes)
+    assert loaded.assignment() == index.assignment()
+
+
+def test_pickled_files_are_refused(tmp_path):
+    path = str(tmp_path / "pickled.npz")
+    np.savez(path, nodes=np.array(["a", None], dtype=object), sources=np.zeros(0), targets=np.zeros(0),
+             labels=np.zeros(2))
+    with pytest.raises(ValueError):
+        CommunityIndex.load(path)
+
+
+def test_community_map_persists_its_index(tmp_path, monkeypatch):
+    import core.communities as communities
+    monkeypatch.setattr(communities, "_index", {"index": None})
+    path = str(tmp_path / "communities.npz")
+    first = community_map(WORKS, CITATIONS, path=path)
+    assert (tmp_path / "communities.npz").exists()
+
+    # a fresh process starts from the saved file
+    monkeypatch.setattr(communities, "_index", {"index": None})
+    assert community_map(WORKS, CITATIONS, path=path) == first
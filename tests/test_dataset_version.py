@@ -0,0 +1,100 @@
+import pytest
+
+import core.dataset_version as dataset_version_module
+import core.sparql_client as sparql_client
+from core.dataset_version import cached_per_version, current_version, dataset_version, on_version_change
+from core.sparql_client import EndpointError, result_cache
+
+
+def test_triple_count_change_invalidates_caches(monkeypatch):
+    endpoint = "http://example.org/dataset-version/sparql"
+    count = {"n": "10"}
+    fetched = []
+
+    def fake_fetch(endpoint, query, priority, session, token):
+        fetched.append(str(query))
+        return [{"n": {"type": "literal", "value": count["n"]}}]
+
+    monkeypatch.setattr(sparql_client, "_fetch", fake_fetch)
+    monkeypatch.setattr(dataset_version_module, "DATASET_PROBE_INTERVAL", 0)
+    monkeypatch.setattr(dataset_version_module, "DATASET_MARKER_QUERY", "")
+    monkeypatch.setattr(dataset_version_module, "_listeners", list(dataset_version_module._listeners))
+
+    changes, cleared = [], []
+    on_version_change(lambda ep, old, new: changes.append((ep, old, new)))
+    clear = result_cache.clear
+    monkeypatch.setattr(result_cache, "clear", lambda ep=None: (cleared.append(ep), clear(ep)))
+
+    # several probes of unchanged data, so a cached probe answer would be stamped current
+    first = dataset_version(endpoint)
+    assert first is not None
+    assert dataset_version(endpoint) == first
+    assert dataset_version(endpoint) == first
+    assert len(fetched) == 3
+
+    result_cache.put((endpoint, "SELECT * WHERE { ?s ?p ?o }"), [{"s": {"value": "x"}}], first)
+
+    count["n"] = "11"
+    second = dataset_version(endpoint)
+
+    assert second != first
+    assert len(fetched) == 4
+    assert changes == [(endpoint, first, second)]
+    assert endpoint in cleared
+    assert result_cache.get((endpoint, "SELECT * WHERE { ?s ?p ?o }")) is None
+
+
+def test_results_are_cached_while_the_first_probe_fails(monkeypatch):
+    endpoint = "http://example.org/dataset-version-down/sparql"
+    probe_fails = {"now": True}
+    fetched = []
+
+    def fake_fetch(endpoint, query, priority, session, token):
+        if "COUNT" in str(query):
+            if probe_fails["now"]:
+                raise EndpointError("probe timed out")
+            return [{"n": {"type": "literal", "value": "10"}}]
+        fetched.append(str(query))
+        return [{"s": {"type": "uri", "value": "x"}}]
+
+    monkeypatch.setattr(sparql_client, "_fetch", fake_fetch)
+    monkeypatch.setattr(dataset_version_module, "DATASET_PROBE_INTERVAL", 0)
+    monkeypatch.setattr(dataset_version_module, "DATASET_MARKER_QUERY", "")
+    monkeypatch.setattr(dataset_version_module, "_listeners", list(dataset_version_module._listeners))
+
+    calls = []
+
+    @cached_per_version
+    def citations(endpoint, uri):
+        calls.append(uri)
+        return sparql_client.sparql(endpoint, f"SELECT ?s WHERE {{ ?s ?p <{uri}> }}")
+
+    assert citations(endpoint, "w1") == citations(endpoint, "w1")
+    assert dataset_version(endpoint) is None
+    assert calls == ["w1"]
+    # the query itself is served from the result cache under the unknown version too
+    sparql_client.sparql(endpoint, "SELECT ?s WHERE { ?s ?p <w1> }")
+    assert len(fetched) == 1
+
+    # the first real fingerprint replaces whatever was cached without one
+    probe_fails["now"] = False
+    citations(endpoint, "w1")
+    citations(endpoint, "w1")
+    assert calls == ["w1", "w1"]
+    assert len(fetched) == 2
+
+
+def test_a_local_store_versions_caches_without_probing(monkeypatch):
+    endpoint = "http://example.org/dataset-version-local/sparql"
+    monkeypatch.setattr(sparql_client, "_fetch", lambda *args: pytest.fail("the endpoint was probed"))
+    monkeypatch.setattr(dataset_version_module, "local_store_version", lambda: "store-v1")
+    calls = []
+
+    @cached_per_version
+    def works(endpoint):
+        calls.append(endpoint)
+        return ["w1"]
+
+    assert works(endpoint) == works(endpoint) == ["w1"]
+    assert calls == [endpoint]
+    assert current_version(endpoint) == "store-v1"
@@ -0,0 +1,54 @@
+import threading
+
+from config.settings import PREFIXES
+from core.entity_index import EntityIndex
+
+IDEA = PREFIXES["idea"]
+
+
+def uses(work, entity):
+    return {"s": {"type": "uri", "value": work}, "p": {"type": "uri", "value": IDEA + "uses"},
+            "o": {"type": "uri", "value": entity}, "oType": {"type": "uri", "value": IDEA + "Artifact"}}
+
+
+def test_works_for_and_reindexing():
+    index = EntityIndex()
+    index.add_work("w1", [uses("w1", "x")])
+    index.add_work("w2", [uses("w2", "x"), uses("w2", "y")])
+    assert index.works_for("x") == [("w1", ["Artifact", "uses"]), ("w2", ["Artifact", "uses"])]
+    assert index.works_for("x", exclude="w1") == [("w2", ["Artifact", "uses"])]
+
+    index.add_work("w2", [uses("w2", "z")])
+    assert "y" not in index
+    assert [w for w, _ in index.works_for("x")] == ["w1"]
+    assert index.work_count == 2
+
+
+def test_reads_while_another_session_indexes():
+    index = EntityIndex()
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            index.add_work(f"w{i % 50}", [uses(f"w{i % 50}", "x")])
+            index.remove_work(f"w{(i + 25) % 50}")
+            i += 1
+
+    def reader():
+        try:
+            for _ in range(2000):
+                index.works_for("x")
+                "x" in index
+        except RuntimeError as e:   # "dictionary changed size during iteration"
+            errors.append(e)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        reader()
+    finally:
+        stop.set()
+        thread.join()
+    assert errors == []
@@ -0,0 +1,50 @@
+from core.facets import FacetIndex, _bitmap, _positions, facet_index
+
+WORKS = [
+    {"uri": "w0", "venue": "v1", "year": "2020", "keywords": ["ml", "nlp"]},
+    {"uri": "w1", "venue": "v1", "year": "2021", "keywords": ["ml"]},
+    {"uri": "w2", "venue": "v2", "year": "2021", "keywords": ["nlp"]},
+    {"uri": "w3", "venue": None, "year": "2022", "keywords": []},
+]
+
+
+def uris(index, bits):
+    return [w["uri"] for w in index.works_in(bits)]
+
+
+def test_bitmap_roundtrip():
+    assert _bitmap(10, [0, 3, 9]) == 0b1000001001
+    assert _positions(10, 0b1000001001) == [0, 3, 9]
+
+
+def test_select_ands_facets_ors_years_and_ands_keywords():
+    index = FacetIndex(WORKS)
+    assert uris(index, index.select({})) == ["w0", "w1", "w2", "w3"]
+    assert uris(index, index.select({"venue": ["v1"]})) == ["w0", "w1"]
+    assert uris(index, index.select({"year": ["2020", "2022"]})) == ["w0", "w3"]
+    assert uris(index, index.select({"keyword": ["ml", "nlp"]})) == ["w0"]
+    assert uris(index, index.select({"venue": ["v1"], "year": ["2021"]})) == ["w1"]
+    assert index.select({"year": []}) == 0
+
+
+def test_counts_for_a_selection():
+    index = FacetIndex(WORKS)
+    assert index.counts("keyword", index.select({"year": ["2021"]})) == {"ml": 1, "nlp": 1}
+    assert index.size(index.select({"venue": ["v1"]})) == 2
+
+
+def test_single_valued_counts_ignore_their_own_selection():
+    index = FacetIndex(WORKS)
+    counts = index.facet_counts({"venue": ["v1"], "keyword": ["ml"]})
+    # the other venues stay selectable alternatives ...
+    assert counts["venue"] == {"v1": 2, "v2": 0}
+    # ... while keyword counts narrow within the selection
+    assert counts["keyword"] == {"ml": 2, "nlp": 1}
+    assert counts["year"] == {"2020": 1, "2021": 1, "2022": 0}
+
+
+def test_facet_index_is_rebuilt_only_for_new_works():
+    works = list(WORKS)
+    first = facet_index(works, version="v")
+    assert facet_index(works, version="v") is first
+    assert facet_index(works[:2], version="v") is not first
@@ -0,0 +1,134 @@
+import math
+
+import numpy as np
+import pytest
+
+import core.keywords as keywords
+from core.facets import FacetIndex
+from core.keywords import KeywordIndex, cooccurrence, incidence_pairs, keyword_network, top_keywords, top_keywords_in
+
+WORKS = [
+    {"uri": "w0", "venue": "v1", "year": "2020", "keywords": ["ml", "nlp", "ml"]},
+    {"uri": "w1", "venue": "v1", "year": "2021", "keywords": ["ml", "vision"]},
+    {"uri": "w2", "venue": "v2", "year": "2021", "keywords": ["nlp"]},
+    {"uri": "w3", "venue": "v2", "year": "2022", "keywords": ["ml"]},
+]
+
+
+def counts(index):
+    return {e["uri"]: e["count"] for e in index.top(100)}
+
+
+def test_counts_works_per_keyword():
+    index = KeywordIndex()
+    assert index.update(WORKS) == 4
+    assert counts(index) == {"ml": 3, "nlp": 2, "vision": 1}
+    assert index.top(1) == [{"uri": "ml", "count": 3}]
+
+
+def test_re_adding_works_does_not_double_count():
+    index = KeywordIndex()
+    index.update(WORKS)
+    assert index.update(WORKS) == 0
+    assert index.update([dict(w) for w in reversed(WORKS)]) == 0
+    assert counts(index) == {"ml": 3, "nlp": 2, "vision": 1}
+
+
+def test_retagging_a_work_moves_its_counts():
+    index = KeywordIndex()
+    index.update(WORKS)
+    retagged = WORKS[:1] + [{**WORKS[1], "keywords": ["nlp", "graphs"]}] + WORKS[2:]
+    assert index.update(retagged) == 1
+    assert counts(index) == {"ml": 2, "nlp": 3, "graphs": 1}
+
+
+def test_removed_works_are_subtracted():
+    index = KeywordIndex()
+    index.update(WORKS)
+    assert index.update(WORKS[2:]) == 2
+    assert counts(index) == {"ml": 1, "nlp": 1}
+
+
+def test_top_keywords_in_a_facet_selection():
+    facets = FacetIndex(WORKS)
+    assert top_keywords_in(facets, {"venue": ["v1"]}) == [
+        {"uri": "ml", "count": 2}, {"uri": "vision", "count": 1}, {"uri": "nlp", "count": 1},
+    ]
+    assert top_keywords_in(facets, {"year": ["2021", "2022"]}, limit=1) == [{"uri": "ml", "count": 2}]
+    assert top_keywords_in(facets, {"venue": ["v2"], "year": ["2021"]}) == [{"uri": "nlp", "count": 1}]
+
+
+def test_top_keywords_updates_per_version(monkeypatch):
+    monkeypatch.setattr(keywords, "_index", {"index": KeywordIndex(), "version": None})
+    facets = FacetIndex(WORKS)
+    assert top_keywords(WORKS, facets, version="v1", limit=1) == [{"uri": "ml", "count": 3}]
+    more = WORKS + [{"uri": "w4", "keywords": ["nlp"]}, {"uri": "w5", "keywords": ["nlp"]}]
+    assert top_keywords(more, FacetIndex(more), version="v2", limit=1) == [{"uri": "nlp", "count": 4}]
+    # a selection is answered from the facet bitmaps, not the corpus counts
+    assert top_keywords(more, FacetIndex(more), {"venue": ["v2"]}, version="v2") == [
+        {"uri": "nlp", "count": 1}, {"uri": "ml", "count": 1},
+    ]
+
+
+# a: 5 works, b: 3, c: 3, d: 2, e: 1; pairs ab: 3, ac: 2, bc: 1, cd: 1
+TAGGED = [{"uri": f"t{i}", "keywords": kws} for i, kws in enumerate([
+    ["a", "b"], ["a", "b"], ["a", "b", "c"], ["a", "c"], ["c", "d"], ["d"], ["e"], ["a", "a"],
+])]
+
+
+def edges_of(edges):
+    return {frozenset((e["source"], e["target"])): e for e in edges}
+
+
+def test_incidence_pairs_match_the_dense_product():
+    rng = np.random.default_rng(0)
+    dense = (rng.random((20, 6)) < 0.4).astype(int)
+    rows, cols = np.nonzero(dense)
+    product = dense.T @ dense
+    found = {(i, j): c for i, j, c in zip(*(x.tolist() for x in incidence_pairs(rows, cols, 20, 6)))}
+    expected = {(i, j): product[i, j] for i in range(6) for j in range(i + 1, 6) if product[i, j]}
+    assert found == expected
+
+
+def test_cooccurrence_counts_and_pmi():
+    nodes, edges = cooccurrence(TAGGED, max_keywords=10, min_count=1, min_pmi=-10.0)
+    assert {n["uri"]: n["count"] for n in nodes} == {"a": 5, "b": 3, "c": 3, "d": 2, "e": 1}
+    found = edges_of(edges)
+    assert {pair: e["count"] for pair, e in found.items()} == {
+        frozenset("ab"): 3, frozenset("ac"): 2, frozenset("bc"): 1, frozenset("cd"): 1,
+    }
+    assert found[frozenset("ab")]["pmi"] == pytest.approx(math.log(8 * 3 / (5 * 3)))
+    assert found[frozenset("cd")]["pmi"] == pytest.approx(math.log(8 * 1 / (3 * 2)))
+
+
+def test_cooccurrence_drops_pairs_below_the_thresholds():
+    # bc co-occurs less often than chance: negative PMI
+    assert set(edges_of(cooccurrence(TAGGED, 10, min_count=1, min_pmi=0.0)[1])) == {
+        frozenset("ab"), frozenset("ac"), frozenset("cd"),
+    }
+    assert set(edges_of(cooccurrence(TAGGED, 10, min_count=2, min_pmi=0.0)[1])) == {frozenset("ab"), frozenset("ac")}
+    assert set(edges_of(cooccurrence(TAGGED, 10, min_count=1, min_pmi=0.1)[1])) == {frozenset("ab"), frozenset("cd")}
+
+
+def test_cooccurrence_keeps_the_most_frequent_keywords():
+    nodes, _ = cooccurrence(TAGGED, max_keywords=4, min_count=1, min_pmi=-10.0)
+    assert {n["uri"] for n in nodes} == {"a", "b", "c", "d"}
+    assert cooccurrence([{"uri": "x", "keywords": []}]) == ([], [])
+
+
+def test_keyword_network_is_cached_per_version(monkeypatch):
+    monkeypatch.setattr(keywords, "_graphs", {})
+    calls = []
+    compute = keywords.cooccurrence
+    monkeypatch.setattr(keywords, "cooccurrence", lambda works: calls.append(len(works)) or compute(works))
+
+    first = keyword_network(TAGGED, version="v1")
+    assert keyword_network(TAGGED, version="v1") is first
+    assert calls == [8]
+
+    second = keyword_network(TAGGED, version="v2")
+    assert second is not first and calls == [8, 8]
+    keyword_network(TAGGED[:4], version="v2")
+    keyword_network(TAGGED, version=None)
+    keyword_network(TAGGED, version=None)
+    assert calls == [8, 8, 4, 8, 8]
@@ -0,0 +1,88 @@
+import numpy as np
+
+import core.layout as layout
+from core.layout import NODE_SPACING, compute_layout, fruchterman_reingold
+
+
+def _distance(positions, a, b):
+    return float(np.hypot(positions[a][0] - positions[b][0], positions[a][1] - positions[b][1]))
+
+
+def _ring(n):
+    nodes = [f"n{i}" for i in range(n)]
+    return nodes, [(nodes[i], nodes[(i + 1) % n]) for i in range(n)]
+
+
+def test_empty_graph():
+    assert fruchterman_reingold(0, np.zeros((0, 2), dtype=np.int64)).shape == (0, 2)
+
+
+def test_fixed_rows_do_not_move():
+    init = np.array([[0.0, 0.0], [5.0, 5.0], [np.nan, np.nan]])
+    fixed = np.array([True, False, False])
+    pos = fruchterman_reingold(3, np.array([[0, 1], [1, 2]]), init=init, fixed=fixed)
+    assert pos[0].tolist() == [0.0, 0.0]
+
+
+def test_connected_nodes_end_closer_than_unconnected():
+    nodes, edges = _ring(12)
+    positions = compute_layout("test:ring", nodes, edges)
+    neighbours = np.mean([_distance(positions, s, t) for s, t in edges])
+    opposite = np.mean([_distance(positions, nodes[i], nodes[i + 6]) for i in range(6)])
+    assert neighbours < opposite
+
+
+def test_layout_is_cached_per_content():
+    nodes, edges = _ring(6)
+    assert compute_layout("test:cache", nodes, edges) is compute_layout("test:cache", nodes, edges)
+
+
+def test_warm_start_places_new_nodes_next_to_their_neighbours():
+    nodes, edges = _ring(30)
+    before = compute_layout("test:warm", nodes, edges)
+
+    # a few leaves hanging off old nodes: they must land next to them, and
+    # the old nodes should stay roughly where they were
+    leaves = [(f"leaf{i}", nodes[i * 7]) for i in range(4)]
+    after = compute_layout("test:warm", nodes + [leaf for leaf, _ in leaves], edges + leaves)
+
+    for leaf, anchor in leaves:
+        assert _distance(after, leaf, anchor) < 2 * NODE_SPACING
+    moved = np.mean([np.hypot(before[n][0] - after[n][0], before[n][1] - after[n][1]) for n in nodes])
+    assert moved < NODE_SPACING
+
+
+def test_mostly_new_graph_is_laid_out_cold():
+    nodes, edges = _ring(4)
+    compute_layout("test:cold", nodes, edges)
+
+    # 40 new nodes around 4 known ones: laid out cold, so the new ring
+    # unfolds about as well as one laid out from scratch
+    more, more_edges = _ring(44)
+    positions = compute_layout("test:cold", more, more_edges)
+    fresh = compute_layout("test:cold-fresh", more, more_edges)
+    edge_length = lambda p: np.mean([_distance(p, s, t) for s, t in more_edges])
+    assert edge_length(positions) < 1.25 * edge_length(fresh)
+
+
+def test_warm_starts_are_scoped_per_session():
+    nodes, edges = _ring(20)
+    compute_layout("test:scoped", nodes, edges, scope="alice")
+    assert ("test:scoped", "alice") in layout._last
+    assert ("test:scoped", "bob") not in layout._last
+
+    # bob's first look at a subgraph does not start from alice's layout
+    sub = nodes[:10]
+    sub_edges = [(s, t) for s, t in edges if s in sub and t in sub]
+    bob = compute_layout("test:scoped", sub, sub_edges, scope="bob")
+    assert bob == compute_layout("test:scoped-fresh", sub, sub_edges, scope="bob")
+
+
+def test_warm_starts_are_capped(monkeypatch):
+    monkeypatch.setattr(layout, "LAYOUT_WARM_STARTS", 3)
+    nodes, edges = _ring(4)
+    for i in range(5):
+        compute_layout(f"test:cap{i}", nodes, edges)
+    assert len(layout._last) == 3
+    assert ("test:cap4", None) in layout._last
+    assert ("test:cap0", None) not in layout._last
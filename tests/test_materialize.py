@@ -0,0 +1,79 @@
+import rdflib
+from rdflib import BNode, Literal, URIRef
+
+import core.batch_loader as batch_loader
+import core.materialize as materialize
+from core.materialize import work_fingerprints
+
+EX = "http://example.org/"
+
+
+def binding(term):
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    out = {"type": "literal", "value": str(term)}
+    if term.language:
+        out["xml:lang"] = term.language
+    if term.datatype:
+        out["datatype"] = str(term.datatype)
+    return out
+
+
+def serve(monkeypatch, graph, queries=None):
+    def sparql(endpoint, query, cache=True):
+        assert cache is False
+        if queries is not None:
+            queries.append(query)
+        result = graph.query(query)
+        return [{str(v): binding(row[v]) for v in result.vars if row[v] is not None} for row in result]
+    monkeypatch.setattr(batch_loader, "sparql", sparql)
+
+
+def corpus():
+    g = rdflib.Graph()
+    for name in ("w1", "w2"):
+        work = URIRef(EX + name)
+        g.add((work, URIRef(EX + "title"), Literal(f"{name} title", lang="en")))
+        g.add((work, URIRef(EX + "cites"), URIRef(EX + "paper")))
+        g.add((URIRef(f"{work}_research_problem"), URIRef(EX + "label"), Literal(f"{name} problem")))
+    g.add((URIRef(EX + "paper"), URIRef(EX + "year"), Literal(2020)))
+    return g
+
+
+def test_fingerprints_cover_the_neighbourhood(monkeypatch):
+    g = corpus()
+    serve(monkeypatch, g)
+    before = work_fingerprints(None, [EX + "w1", EX + "w2"])
+    assert set(before) == {EX + "w1", EX + "w2"}
+    assert before[EX + "w1"] != before[EX + "w2"]
+
+    # a change one hop out touches both works; on the argument node only w1
+    g.set((URIRef(EX + "paper"), URIRef(EX + "year"), Literal(2021)))
+    g.add((URIRef(EX + "w1_research_problem"), URIRef(EX + "note"), Literal("edited")))
+    after = work_fingerprints(None, [EX + "w1", EX + "w2"])
+    assert after[EX + "w1"] != before[EX + "w1"]
+    assert after[EX + "w2"] != before[EX + "w2"]
+
+    g.add((URIRef(EX + "w1_research_problem"), URIRef(EX + "note"), Literal("again")))
+    assert work_fingerprints(None, [EX + "w1", EX + "w2"])[EX + "w2"] == after[EX + "w2"]
+
+
+def test_fingerprints_ignore_blank_node_labels_and_batching(monkeypatch):
+    g = corpus()
+    g.add((URIRef(EX + "w1"), URIRef(EX + "meta"), BNode()))
+    serve(monkeypatch, g)
+    whole = work_fingerprints(None, [EX + "w1", EX + "w2"])
+
+    relabelled = corpus()
+    relabelled.add((URIRef(EX + "w1"), URIRef(EX + "meta"), BNode()))
+    serve(monkeypatch, relabelled, queries := [])
+    monkeypatch.setattr(materialize, "FINGERPRINT_BATCH", 1)
+    assert work_fingerprints(None, [EX + "w1", EX + "w2"]) == whole
+    assert len(queries) == 2
+
+
+def test_works_without_triples_still_get_a_fingerprint(monkeypatch):
+    serve(monkeypatch, rdflib.Graph())
+    assert set(work_fingerprints(None, [EX + "nothing"])) == {EX + "nothing"}
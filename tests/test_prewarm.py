@@ -0,0 +1,48 @@
+import threading
+
+import core.prewarm as prewarm
+import core.sparql_client as sparql_client
+from core.prewarm import CacheWarmer, PopularityTracker
+from core.sparql_client import Priority, SchedulerBusy
+
+
+def tracker(tmp_path, works, nodes=()):
+    t = PopularityTracker(path=str(tmp_path / "popularity.json"))
+    for uri in works:
+        t.record(uri, "work")
+    for uri in nodes:
+        t.record(uri, "node")
+    return t
+
+
+def test_works_are_warmed_concurrently_at_background_priority(tmp_path, monkeypatch):
+    both_running = threading.Barrier(2, timeout=5)
+    seen = []
+
+    def local_graph(endpoint, work):
+        seen.append((work, sparql_client._query_priority.get(), sparql_client._cancel_token.get()))
+        both_running.wait()   # times out unless two works are in flight together
+        return False, []
+
+    monkeypatch.setattr(prewarm, "get_work_local_graph", local_graph)
+    monkeypatch.setattr(prewarm, "get_resource_properties_many", lambda endpoint, uris: {})
+    nodes = []
+    monkeypatch.setattr(prewarm, "get_resource_properties", lambda endpoint, uri: nodes.append(uri))
+
+    warmer = CacheWarmer("stub", tracker(tmp_path, ["w1", "w2"], ["n1"]), top_n=5, workers=2)
+    assert warmer.warm() == 2
+    assert sorted(seen) == [("w1", Priority.BACKGROUND, None), ("w2", Priority.BACKGROUND, None)]
+    assert nodes == ["n1"]
+
+
+def test_a_busy_endpoint_stops_the_pass(tmp_path, monkeypatch):
+    def local_graph(endpoint, work):
+        raise SchedulerBusy("queue full")
+
+    monkeypatch.setattr(prewarm, "get_work_local_graph", local_graph)
+    nodes = []
+    monkeypatch.setattr(prewarm, "get_resource_properties", lambda endpoint, uri: nodes.append(uri))
+
+    warmer = CacheWarmer("stub", tracker(tmp_path, ["w1", "w2", "w3"], ["n1"]), workers=1)
+    assert warmer.warm() == 0
+    assert nodes == []
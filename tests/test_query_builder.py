@@ -0,0 +1,114 @@
+import pytest
+import rdflib
+from rdflib.plugins.sparql import prepareQuery
+
+# register every template the app uses
+import core.dataset_version  # noqa: F401
+import core.materialize  # noqa: F401
+import core.resource_inspector  # noqa: F401
+import core.work_browser  # noqa: F401
+import core.work_graph  # noqa: F401
+from core.query_builder import (
+    IRI, INTEGER, LITERAL, VALUES, _TEMPLATES, build_query, define_template, render_query,
+    sparql_integer, sparql_iri, sparql_literal, sparql_values, used_prefixes,
+)
+
+SAMPLES = {
+    IRI: "http://example.org/x",
+    LITERAL: 'it\'s "quoted" \\ and\nsplit',
+    VALUES: ["http://example.org/a", "http://example.org/b"],
+    INTEGER: 10,
+}
+
+
+def evaluate(expression):
+    result = rdflib.Graph().query(f"SELECT ?x WHERE {{ BIND({expression} AS ?x) }}")
+    return str(next(iter(result))[0])
+
+
+@pytest.mark.parametrize("text", ['plain', 'say "hi"', "back\\slash", "tab\tnew\nline\r", "it's", ""])
+def test_literals_round_trip(text):
+    assert evaluate(sparql_literal(text)) == text
+
+
+@pytest.mark.parametrize("value", [
+    "", None, 42, "http://x y", "http://x\n", "http://x>", "<http://x>", 'http://x"', "http://x{y}",
+    "http://x|y", "http://x^y", "http://x`y", "http://x\\y",
+    "http://x> . ?s ?p ?o } #",
+])
+def test_bad_iris_are_rejected(value):
+    with pytest.raises(ValueError):
+        sparql_iri(value)
+
+
+def test_iris_and_values():
+    assert sparql_iri("http://example.org/a#b?c=1") == "<http://example.org/a#b?c=1>"
+    assert sparql_values(["http://a", "http://b"]) == "<http://a> <http://b>"
+    assert sparql_values("http://a") == "<http://a>"
+    with pytest.raises(ValueError):
+        sparql_values(["http://a", "http://b c"])
+
+
+def test_integers():
+    assert sparql_integer(-3) == "-3"
+    for value in (True, 1.5, "3"):
+        with pytest.raises(ValueError):
+            sparql_integer(value)
+
+
+def test_used_prefixes_ignore_iris_strings_comments_and_variables():
+    body = """
+        SELECT ?x WHERE {
+            ?x a idea:Work ; dct:title "rdfs:label" .   # foaf:name
+            ?x <http://purl.org/spar/cito:cites> ?y .
+            FILTER(?y != xsd:string)
+        }
+    """
+    assert used_prefixes(body) == ["xsd", "idea", "dct"]
+
+
+def test_build_query_declares_only_used_prefixes():
+    query = build_query("SELECT ?s WHERE { ?s rdf:type idea:Work }")
+    assert query.splitlines()[:2] == [
+        "PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>",
+        "PREFIX idea: <http://www.semanticweb.org/idea/>",
+    ]
+    assert build_query("SELECT * WHERE { ?s ?p ?o }") == "SELECT * WHERE { ?s ?p ?o }"
+
+
+def test_define_template_checks_its_parameters():
+    with pytest.raises(ValueError):
+        define_template("test:kind", "SELECT * WHERE { $s ?p ?o }", s="uri")
+    with pytest.raises(ValueError):
+        define_template("test:unused", "SELECT * WHERE { ?s ?p ?o }", s=IRI)
+
+
+def test_render_query_binds_declared_parameters_only():
+    define_template("test:render", "SELECT $o WHERE { $s ?p $o } LIMIT $n", s=IRI, n=INTEGER)
+    query = render_query("test:render", s="http://example.org/s", n=5)
+    assert query == "SELECT $o WHERE { <http://example.org/s> ?p $o } LIMIT 5"
+    assert query.template == "test:render"
+
+    with pytest.raises(ValueError):
+        render_query("test:render", s="http://example.org/s")
+    with pytest.raises(ValueError):
+        render_query("test:render", s="http://example.org/s", n=5, extra=1)
+
+
+def test_injected_iris_are_rejected():
+    with pytest.raises(ValueError):
+        render_query("resource_properties", resources=["http://x> ?p ?o } ; DROP ALL ; SELECT * { <http://y"])
+
+
+def test_injected_literals_stay_one_string():
+    title = 'x" . ?s ?p ?o } # '
+    query = render_query("search_paper_by_title", title=title)
+    prepareQuery(query)
+    assert sparql_literal(title) in query
+
+
+@pytest.mark.parametrize("name", sorted(n for n in _TEMPLATES if not n.startswith("test:")))
+def test_every_template_renders_to_valid_sparql(name):
+    _, params = _TEMPLATES[name]
+    query = render_query(name, **{param: SAMPLES[kind] for param, kind in params.items()})
+    prepareQuery(query)
@@ -0,0 +1,49 @@
+from core.related_works import RelatedWorksIndex
+
+from conftest import cite
+
+
+# p1 and p2 share two references, p3 shares one with them
+CITATIONS = cite(
+    ("p1", "r1"), ("p1", "r2"),
+    ("p2", "r1"), ("p2", "r2"),
+    ("p3", "r2"),
+)
+
+
+def test_bibliographic_coupling():
+    index = RelatedWorksIndex.build(CITATIONS, k=5, max_fanout=100)
+    assert index.coupled("p1") == [("p2", 2), ("p3", 1)]
+    assert index.coupled("p3") == [("p1", 1), ("p2", 1)]
+    assert index.coupled("r1") == []
+
+
+def test_cocitation():
+    index = RelatedWorksIndex.build(CITATIONS, k=5, max_fanout=100)
+    assert index.cocited("r1") == [("r2", 2)]
+    assert index.cocited("r2") == [("r1", 2)]
+
+
+def test_top_k_and_fanout_limit():
+    index = RelatedWorksIndex.build(CITATIONS, k=1, max_fanout=100)
+    assert index.coupled("p1") == [("p2", 2)]
+
+    # r2 is cited by three works: above the fan-out limit it relates nothing
+    index = RelatedWorksIndex.build(CITATIONS, k=5, max_fanout=2)
+    assert index.coupled("p1") == [("p2", 1)]
+    assert index.coupled("p3") == []
+
+
+def test_incremental_update_matches_a_rebuild():
+    more = CITATIONS + cite(("p4", "r1"), ("p3", "r1"), ("p5", "p1"), ("p5", "p2"))
+    updated = RelatedWorksIndex.build(CITATIONS, k=3, max_fanout=100).update(more)
+    rebuilt = RelatedWorksIndex.build(more, k=3, max_fanout=100)
+    for uri in rebuilt.graph.nodes:
+        assert updated.coupled(uri) == rebuilt.coupled(uri), uri
+        assert updated.cocited(uri) == rebuilt.cocited(uri), uri
+
+
+def test_update_after_a_removal_rebuilds():
+    index = RelatedWorksIndex.build(CITATIONS, k=5, max_fanout=100)
+    fewer = CITATIONS[:-1]
+    assert index.update(fewer).coupled("p3") == []
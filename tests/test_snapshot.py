@@ -0,0 +1,38 @@
+import os
+
+import core.snapshot as snapshot
+from core.snapshot import current_snapshot_file, prune_snapshots, read_snapshot_file, snapshot_path, write_snapshot
+
+
+def age(path, seconds):
+    mtime = os.path.getmtime(path) - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_write_keeps_only_the_newest_snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_KEEP", 2)
+    directory = str(tmp_path)
+    for i, version in enumerate(["v1", "v2", "v3"]):
+        path = write_snapshot({"version": version, "works": []}, directory)
+        age(path, 100 - i)
+    (tmp_path / "unrelated.json").write_text("{}")
+
+    latest = write_snapshot({"version": "v4", "works": []}, directory)
+    assert sorted(os.listdir(directory)) == [
+        "snapshot-v3.json.gz", "snapshot-v4.json.gz", "snapshot.json", "unrelated.json",
+    ]
+    assert current_snapshot_file(directory) == latest
+    assert read_snapshot_file(latest)["version"] == "v4"
+
+
+def test_prune_never_deletes_the_current_snapshot(tmp_path):
+    directory = str(tmp_path)
+    paths = {}
+    for i, version in enumerate(["old", "new"]):
+        paths[version] = snapshot_path(directory, version)
+        open(paths[version], "w").close()
+        age(paths[version], 10 - i)
+    # rewritten under an old version, then stamped older than "new"
+    assert prune_snapshots(directory, keep=1, current=paths["old"]) == [paths["new"]]
+    assert prune_snapshots(directory, keep=0, current=paths["old"]) == []
+    assert os.listdir(directory) == ["snapshot-old.json.gz"]
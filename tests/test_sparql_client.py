@@ -0,0 +1,492 @@
+import asyncio
+import threading
+import time
+from contextvars import copy_context
+
+import pytest
+from aiohttp import web
+
+import core.sparql_client as sparql_client
+from core.batch_loader import BatchLoader
+from core.sparql_client import (
+    CancelToken, CircuitBreaker, CircuitOpen, EndpointError, EndpointPool, Priority, QueryCancelled,
+    QueryScheduler, SchedulerBusy, StaleRows, allow_stale, begin_selection, detached, sparql,
+)
+
+
+class StubEndpoint:
+    """
+    Stands in for async_sparql. Each url answers from its own list of
+    replies, used up in order (the last one repeats): a list of rows, an
+    exception to raise, or ("wait", seconds, reply) to answer late.
+    """
+
+    def __init__(self):
+        self.replies = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def answer(self, url, *replies):
+        self.replies[url] = list(replies)
+
+    def count(self, url):
+        return sum(1 for u, _ in self.calls if u == url)
+
+    async def __call__(self, url, query, timeout=None):
+        with self._lock:
+            self.calls.append((url, str(query)))
+            replies = self.replies[url]
+            reply = replies.pop(0) if len(replies) > 1 else replies[0]
+        if isinstance(reply, tuple) and reply[0] == "wait":
+            _, seconds, reply = reply
+            await asyncio.sleep(seconds)
+        if isinstance(reply, Exception):
+            raise reply
+        return [{"x": {"type": "literal", "value": str(v)}} for v in reply]
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    stub = StubEndpoint()
+    monkeypatch.setattr(sparql_client, "async_sparql", stub)
+    monkeypatch.setattr(sparql_client, "scheduler", QueryScheduler(max_concurrency=4, max_queued=8))
+    monkeypatch.setattr(sparql_client, "result_cache", sparql_client.ResultCache())
+    monkeypatch.setattr(sparql_client, "_breakers", {})
+    monkeypatch.setattr(sparql_client, "_dataset_versions", {})
+    with detached():
+        yield stub
+
+
+def values(rows):
+    return [int(r["x"]["value"]) for r in rows]
+
+
+def in_thread(fn, *args):
+    """Run fn in a thread; returns a list that receives its result or exception."""
+    out = []
+
+    def run():
+        try:
+            out.append(fn(*args))
+        except BaseException as e:
+            out.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, out
+
+
+# ---------------------------
+# HTTP responses
+# ---------------------------
+
+def ask_server(status, body, content_type):
+    """async_sparql against a local aiohttp server answering every POST with the given response."""
+    async def run():
+        async def handler(request):
+            return web.Response(status=status, text=body, content_type=content_type)
+
+        app = web.Application()
+        app.router.add_post("/sparql", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await sparql_client.async_sparql(f"http://127.0.0.1:{port}/sparql", "SELECT 1", timeout=5)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def test_json_results_are_returned():
+    body = '{"head": {"vars": ["x"]}, "results": {"bindings": [{"x": {"type": "literal", "value": "1"}}]}}'
+    assert ask_server(200, body, "application/sparql-results+json") == [{"x": {"type": "literal", "value": "1"}}]
+
+
+def test_error_status_raises_with_the_status():
+    with pytest.raises(EndpointError, match="answered 503") as e:
+        ask_server(503, "overloaded", "text/plain")
+    assert e.value.counts_against_endpoint
+
+
+def test_a_non_json_200_is_a_bad_response_not_an_unreachable_endpoint():
+    with pytest.raises(EndpointError, match="bad response") as e:
+        ask_server(200, "<html><body>Please log in</body></html>", "text/html")
+    assert e.value.status == 200
+    assert not e.value.counts_against_endpoint
+
+    with pytest.raises(EndpointError, match="bad response"):
+        ask_server(200, "{not json", "application/sparql-results+json")
+
+
+# ---------------------------
+# cancellation
+# ---------------------------
+
+def test_cancel_runs_each_callback_once():
+    token, calls = CancelToken(), []
+    token.add_callback(lambda: calls.append("a"))
+    remove = token.add_callback(lambda: calls.append("b"))
+    remove()
+    token.cancel()
+    token.cancel()
+    assert calls == ["a"]
+    with pytest.raises(QueryCancelled):
+        token.raise_if_cancelled()
+
+    # registered too late: runs right away
+    token.add_callback(lambda: calls.append("c"))
+    assert calls == ["a", "c"]
+
+
+def test_callbacks_can_be_removed_while_another_thread_cancels():
+    for _ in range(50):
+        token = CancelToken()
+        removers = [token.add_callback(lambda: None) for _ in range(200)]
+        thread = threading.Thread(target=lambda: [remove() for remove in removers])
+        thread.start()
+        token.cancel()
+        thread.join()
+        assert token._callbacks == {}
+
+
+def test_begin_selection_keeps_the_token_for_the_same_key(monkeypatch):
+    monkeypatch.setattr(sparql_client, "_selections", {})
+
+    def rerun(session, key):
+        # each Streamlit rerun starts from a fresh context
+        return copy_context().run(lambda: (begin_selection(session, key), sparql_client.current_cancel_token()))
+
+    first, current = rerun("s1", "work-a")
+    assert current is first
+    assert rerun("s1", "work-a")[0] is first
+    other_session, _ = rerun("s2", "work-b")
+
+    second, _ = rerun("s1", "work-b")
+    assert second is not first
+    assert first.cancelled and not second.cancelled
+    assert not other_session.cancelled
+
+
+def test_a_new_node_key_cancels_the_previous_nodes_lookup(endpoint, monkeypatch):
+    monkeypatch.setattr(sparql_client, "_selections", {})
+    endpoint.answer("http://a", ("wait", 5, [1]))
+    loader = BatchLoader(lambda keys: {k: sparql("http://a", f"SELECT ?x WHERE {{ <{k}> ?p ?x }}") for k in keys})
+
+    def click(node):
+        # the app's order: the work-level token, then the node-scoped one
+        begin_selection("s1", "work-a")
+        begin_selection("s1:node", ("work-a", node))
+        return loader.get(node)
+
+    thread, out = in_thread(click, "http://n1")
+    while not endpoint.calls:
+        time.sleep(0.01)
+    started = time.monotonic()
+    work = copy_context().run(begin_selection, "s1", "work-a")
+    copy_context().run(begin_selection, "s1:node", ("work-a", "http://n2"))
+    thread.join(2)
+    assert isinstance(out[0], QueryCancelled)
+    assert time.monotonic() - started < 1
+    assert not work.cancelled
+
+
+def test_cancelling_aborts_a_query_in_flight(endpoint):
+    endpoint.answer("http://a", ("wait", 5, [1]))
+    token = CancelToken()
+
+    def query():
+        sparql_client._cancel_token.set(token)
+        return sparql("http://a", "SELECT 1")
+
+    thread, out = in_thread(query)
+    while not endpoint.calls:
+        time.sleep(0.01)
+    started = time.monotonic()
+    token.cancel()
+    thread.join(2)
+    assert isinstance(out[0], QueryCancelled)
+    assert time.monotonic() - started < 1
+    # a cancelled query is not a failure of the endpoint
+    assert sparql_client.breaker_for("http://a").state == "closed"
+
+
+def test_cancelling_withdraws_a_queued_query(endpoint, monkeypatch):
+    monkeypatch.setattr(sparql_client, "scheduler", QueryScheduler(max_concurrency=1, max_queued=8))
+    endpoint.answer("http://a", ("wait", 0.5, [1]))
+    busy, _ = in_thread(sparql, "http://a", "SELECT 1")
+    while not endpoint.calls:
+        time.sleep(0.01)
+
+    token = CancelToken()
+
+    def query():
+        sparql_client._cancel_token.set(token)
+        return sparql("http://a", "SELECT 2")
+
+    thread, out = in_thread(query)
+    time.sleep(0.05)
+    token.cancel()
+    thread.join(2)
+    assert isinstance(out[0], QueryCancelled)
+    assert endpoint.count("http://a") == 1
+    assert sparql_client.scheduler.stats()["page_load"]["queued"] == 0
+    busy.join(2)
+
+
+# ---------------------------
+# scheduling
+# ---------------------------
+
+def queued(scheduler):
+    stats = scheduler.stats()
+    return sum(stats[p.name.lower()]["queued"] for p in Priority)
+
+
+def hold_slot(scheduler):
+    """Occupy the scheduler's only slot until the returned event is set."""
+    release, running = threading.Event(), threading.Event()
+
+    def hold():
+        running.set()
+        release.wait(5)
+
+    thread, _ = in_thread(scheduler.run, hold)
+    running.wait(2)
+    return release, thread
+
+
+def test_free_slots_go_by_priority_then_round_robin_over_sessions():
+    scheduler = QueryScheduler(max_concurrency=1, max_queued=8)
+    release, holder = hold_slot(scheduler)
+
+    order, threads = [], []
+    for name, priority, session in [
+        ("background", Priority.BACKGROUND, "s1"),
+        ("s1 first", Priority.PAGE_LOAD, "s1"),
+        ("s1 second", Priority.PAGE_LOAD, "s1"),
+        ("s2", Priority.PAGE_LOAD, "s2"),
+        ("click", Priority.INTERACTIVE, "s3"),
+    ]:
+        before = queued(scheduler)
+        thread, _ = in_thread(scheduler.run, lambda name=name: order.append(name), priority, session)
+        threads.append(thread)
+        while queued(scheduler) == before:
+            time.sleep(0.001)
+
+    release.set()
+    for thread in [holder] + threads:
+        thread.join(2)
+    assert order == ["click", "s1 first", "s2", "s1 second", "background"]
+
+
+def test_a_full_queue_refuses_new_queries():
+    scheduler = QueryScheduler(max_concurrency=1, max_queued=1)
+    release, holder = hold_slot(scheduler)
+    waiting, _ = in_thread(scheduler.run, lambda: None, Priority.BACKGROUND)
+    while queued(scheduler) == 0:
+        time.sleep(0.001)
+
+    with pytest.raises(SchedulerBusy):
+        scheduler.run(lambda: None, Priority.BACKGROUND)
+    # the queues are per priority class
+    click, out = in_thread(scheduler.run, lambda: "ok", Priority.INTERACTIVE)
+
+    release.set()
+    for thread in (holder, waiting, click):
+        thread.join(2)
+    assert out == ["ok"]
+    assert scheduler.stats()["background"]["rejected"] == 1
+
+
+def test_admission_times_out():
+    scheduler = QueryScheduler(max_concurrency=1, max_queued=8, admission_timeout=0.05)
+    release, holder = hold_slot(scheduler)
+    with pytest.raises(SchedulerBusy):
+        scheduler.run(lambda: None)
+    assert queued(scheduler) == 0
+    release.set()
+    holder.join(2)
+    assert scheduler.run(lambda: "free again") == "free again"
+
+
+# ---------------------------
+# circuit breaker and stale serving
+# ---------------------------
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        breaker.before_call("http://a")
+
+    time.sleep(0.06)
+    breaker.before_call("http://a")          # the single probe
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.before_call("http://a")
+    breaker.record_failure()                 # a failed probe re-opens at once
+    assert breaker.state == "open"
+
+    time.sleep(0.06)
+    breaker.before_call("http://a")
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call("http://a")
+
+
+def test_failures_open_the_circuit_for_sparql(endpoint):
+    sparql_client._breakers["http://a"] = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    endpoint.answer("http://a", EndpointError("bad query", 400), EndpointError("down", 503))
+
+    # our own bad query says nothing about the endpoint's health
+    with pytest.raises(EndpointError):
+        sparql("http://a", "SELECT 1")
+    for _ in range(2):
+        with pytest.raises(EndpointError):
+            sparql("http://a", "SELECT 1")
+    assert sparql_client.breaker_for("http://a").state == "open"
+
+    with pytest.raises(CircuitOpen):
+        sparql("http://a", "SELECT 1")
+    assert endpoint.count("http://a") == 3
+
+
+def test_current_version_is_answered_from_the_cache(endpoint):
+    endpoint.answer("http://a", [1])
+    sparql_client.note_dataset_version("http://a", "v1")
+    assert values(sparql("http://a", "SELECT 1")) == [1]
+    assert values(sparql("http://a", "SELECT 1")) == [1]
+    assert endpoint.count("http://a") == 1
+
+    sparql("http://a", "SELECT 1", cache=False)
+    sparql_client.note_dataset_version("http://a", "v2")
+    sparql("http://a", "SELECT 1")
+    assert endpoint.count("http://a") == 3
+
+
+def test_slow_answers_are_served_stale_and_refreshed(endpoint, monkeypatch):
+    monkeypatch.setattr(sparql_client, "STALE_GRACE", 0.05)
+    endpoint.answer("http://a", [1], ("wait", 0.3, [2]))
+    sparql("http://a", "SELECT 1")
+
+    with allow_stale() as notices:
+        rows = sparql("http://a", "SELECT 1")
+    assert isinstance(rows, StaleRows) and values(rows) == [1]
+    assert notices == ["query"]
+
+    # the fresh fetch finishes in the background and lands in the cache
+    deadline = time.monotonic() + 2
+    while values(sparql_client.result_cache.get(("http://a", "SELECT 1"))[0]) != [2]:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_failures_are_served_stale_only_when_allowed(endpoint):
+    endpoint.answer("http://a", [1], EndpointError("down", 503))
+    sparql("http://a", "SELECT 1")
+
+    with allow_stale():
+        assert values(sparql("http://a", "SELECT 1")) == [1]
+    with pytest.raises(EndpointError):
+        sparql("http://a", "SELECT 1")
+
+
+def test_an_open_circuit_serves_stale_without_asking(endpoint):
+    endpoint.answer("http://a", [1])
+    sparql("http://a", "SELECT 1")
+    breaker = sparql_client.breaker_for("http://a")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    with allow_stale():
+        assert values(sparql("http://a", "SELECT 1")) == [1]
+    assert endpoint.count("http://a") == 1
+
+
+# ---------------------------
+# replica pool
+# ---------------------------
+
+def pool(*urls, hedge=False):
+    replicas = EndpointPool(urls, hedge=hedge)
+    # rank them in the given order
+    for i, url in enumerate(urls):
+        replicas._record(url, 0.001 * (i + 1), sample=False)
+    return replicas
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(sparql_client, "HEDGE_MIN_SAMPLES", 1)
+    monkeypatch.setattr(sparql_client, "HEDGE_MIN_DELAY", 0.02)
+
+
+def test_pool_routes_to_the_fastest_healthy_replica(endpoint):
+    replicas = pool("http://a", "http://b")
+    replicas._record("http://a", 1.0)
+    assert replicas.ranked() == ["http://b", "http://a"]
+
+    breaker = sparql_client.breaker_for("http://b")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert replicas.ranked() == ["http://a", "http://b"]
+
+
+def test_pool_fails_over(endpoint):
+    endpoint.answer("http://a", EndpointError("down", 503))
+    endpoint.answer("http://b", [2])
+    replicas = pool("http://a", "http://b")
+    assert values(sparql(replicas, "SELECT 1")) == [2]
+    assert replicas.ranked() == ["http://b", "http://a"]
+
+
+def test_pool_does_not_fail_over_on_a_bad_query(endpoint):
+    endpoint.answer("http://a", EndpointError("bad query", 400))
+    endpoint.answer("http://b", [2])
+    with pytest.raises(EndpointError):
+        sparql(pool("http://a", "http://b"), "SELECT 1")
+    assert endpoint.count("http://b") == 0
+
+
+def test_slow_reads_are_hedged(endpoint, hedging):
+    endpoint.answer("http://a", ("wait", 1, [1]))
+    endpoint.answer("http://b", [2])
+    replicas = pool("http://a", "http://b", hedge=True)
+    replicas._samples.append(0.01)
+
+    started = time.monotonic()
+    assert values(sparql(replicas, "SELECT 1")) == [2]
+    assert time.monotonic() - started < 0.5
+    # the losing request was cancelled, which is not held against its replica
+    assert sparql_client.breaker_for("http://a").state == "closed"
+
+
+def test_hedging_leaves_the_failover_list_alone(endpoint, hedging):
+    endpoint.answer("http://a", ("wait", 0.1, [1]))
+    endpoint.answer("http://b", ("wait", 0.3, [2]))
+    replicas = pool("http://a", "http://b", "http://c", hedge=True)
+    replicas._samples.append(0.01)
+
+    backups, failed = ["http://b", "http://c"], set()
+    assert values(replicas._hedged("http://a", backups, "SELECT 1", None, None, None, failed)) == [1]
+    assert endpoint.count("http://b") == 1
+    assert backups == ["http://b", "http://c"]
+    assert failed == set()
+
+
+def test_failed_hedges_fail_over_to_the_next_replica(endpoint, hedging):
+    endpoint.answer("http://a", ("wait", 0.1, EndpointError("down", 503)))
+    endpoint.answer("http://b", EndpointError("down", 503))
+    endpoint.answer("http://c", [3])
+    replicas = pool("http://a", "http://b", "http://c", hedge=True)
+    replicas._samples.append(0.01)
+
+    assert values(sparql(replicas, "SELECT 1")) == [3]
+    assert [endpoint.count(url) for url in ("http://a", "http://b", "http://c")] == [1, 1, 1]
@@ -0,0 +1,43 @@
+from core.time_slices import TimeSlicedCitations, work_year
+
+WORKS = [
+    {"uri": "a", "year": "2019"},
+    {"uri": "b", "year": "2020-05-01"},
+    {"uri": "c", "year": "2022"},
+    {"uri": "d", "year": None},
+]
+CITATIONS = [
+    {"source": "c", "target": "a"},
+    {"source": "a", "target": "x"},
+    {"source": "b", "target": "a"},
+    {"source": "d", "target": "a"},
+    {"source": "c", "target": "b"},
+]
+
+
+def test_work_year():
+    assert work_year({"year": "2020-05-01"}) == 2020
+    assert work_year({"year": "n/a"}) is None
+    assert work_year({}) is None
+
+
+def test_slices_by_citing_year():
+    slices = TimeSlicedCitations(WORKS, CITATIONS)
+    assert slices.span() == (2019, 2022)
+    assert slices.between(2019, 2019) == [{"source": "a", "target": "x"}]
+    assert [c["source"] for c in slices.between(2020, 2022)] == ["b", "c", "c"]
+    assert len(slices.between(1900, 2100)) == 4
+    # years without citations in between
+    assert slices.between(2021, 2021) == []
+    assert slices.between(2030, 2040) == []
+
+
+def test_undated_citations_are_kept_apart():
+    slices = TimeSlicedCitations(WORKS, CITATIONS)
+    assert slices.undated == [{"source": "d", "target": "a"}]
+
+
+def test_empty():
+    slices = TimeSlicedCitations([], [])
+    assert slices.span() is None
+    assert slices.between(2000, 2020) == []
@@ -0,0 +1,272 @@
+import json
+import mmap
+import os
+import re
+
+import numpy as np
+import pytest
+import rdflib
+from rdflib import BNode, URIRef
+
+import core.resource_inspector  # noqa: F401  (registers resource_properties)
+import core.triple_store as triple_store
+import core.work_graph as work_graph
+from core.query_builder import render_query
+from core.triple_store import (
+    STORE_FILES, MappedTermDict, TermDict, TripleStore, local_store_version, parse_ntriples, parse_turtle,
+    term_binding,
+)
+
+EX = "http://example.org/"
+
+DUMP = r"""
+# ontology
+<http://purl.org/spar/fabio/JournalArticle> <http://www.w3.org/2000/01/rdf-schema#subClassOf> <http://purl.org/spar/fabio/Work> .
+
+<http://example.org/w1> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://purl.org/spar/fabio/JournalArticle> .
+<http://example.org/w1> <http://purl.org/dc/elements/1.1/title> "Graphs \"in\" café\nsettings"@en .
+<http://example.org/w1> <http://example.org/pages> "12"^^<http://www.w3.org/2001/XMLSchema#integer> .
+<http://example.org/w1> <http://purl.org/dc/elements/1.1/creator> <http://example.org/alice> .
+<http://example.org/w1> <http://purl.org/dc/elements/1.1/creator> <http://example.org/bob> .
+<http://example.org/w1> <http://purl.org/dc/elements/1.1/creator> "Anonymous" .
+<http://example.org/w1> <http://purl.org/spar/fabio/hasDiscipline> <http://example.org/kw/graphs> .
+<http://example.org/w1> <http://purl.org/spar/fabio/hasDiscipline> <http://example.org/kw/vis> .
+<http://example.org/w1> <http://purl.org/dc/elements/1.1/publisher> <http://example.org/conf> .
+<http://example.org/w1> <http://purl.org/spar/po/contains> <http://example.org/w1_sec> .
+<http://example.org/w1> <http://example.org/hasArgument> <http://example.org/w1_research_problem> .
+<http://example.org/conf> <http://purl.org/dc/elements/1.1/date> "2021-05-01"^^<http://www.w3.org/2001/XMLSchema#date> .
+<http://example.org/w1_sec> <http://purl.org/spar/c4o/hasContent> <http://example.org/w1_doco> .
+<http://example.org/w1_doco> <http://purl.org/spar/cito/cites> <http://example.org/w2> .
+<http://example.org/w1_doco> <http://purl.org/spar/cito/cites> <http://example.org/not_a_work> .
+
+<http://example.org/w2> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://purl.org/spar/fabio/Work> .
+<http://example.org/w2> <http://www.w3.org/2000/01/rdf-schema#label> "a second work" .
+<http://example.org/w2> <http://purl.org/dc/elements/1.1/creator> <http://example.org/bob> .
+<http://example.org/alice> <http://xmlns.com/foaf/0.1/name> "Alice"@en .
+
+<http://example.org/w1_research_problem> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://purl.org/spar/amo/Argument> .
+<http://example.org/w1_research_problem> <http://www.w3.org/2000/01/rdf-schema#label> "Problem" .
+<http://example.org/w1_research_problem> <http://example.org/same> <http://example.org/w1_research_problem> .
+<http://example.org/w1_research_problem> <http://example.org/about> _:b0 .
+<http://example.org/critic> <http://example.org/disputes> <http://example.org/w1_research_problem> .
+
+<http://example.org/w1_research_approach> <http://example.org/uses> <http://example.org/artifact> .
+<http://example.org/w1_research_approach> <http://example.org/note> "tab\there" .
+<http://example.org/other> <http://example.org/mentions> <http://example.org/w1_research_approach> .
+<http://example.org/artifact> <http://www.w3.org/2000/01/rdf-schema#label> "Artifact"@en .
+<http://example.org/artifact> <http://www.w3.org/2004/02/skos/core#prefLabel> "Art" .
+<http://example.org/artifact> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://example.org/Tool> .
+"""
+
+
+def binding(term):
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    out = {"type": "literal", "value": str(term)}
+    if term.language:
+        out["xml:lang"] = term.language
+    if term.datatype:
+        out["datatype"] = str(term.datatype)
+    return out
+
+
+def run(graph, query):
+    result = graph.query(query)
+    return [{str(v): binding(row[v]) for v in result.vars if row[v] is not None} for row in result]
+
+
+def scoped(query, var):
+    """
+    rdflib evaluates the UNION branches bottom-up, before the outer VALUES
+    binds ?var, so their BIND(?var AS ...) sees nothing. Repeat the VALUES
+    inside each branch, which is how the endpoint evaluates the shape.
+    """
+    values = re.search(rf"VALUES \?{var} \{{[^}}]*\}}", query).group(0)
+    return query.replace(values, "").replace(f"BIND(?{var} AS", f"{values} BIND(?{var} AS")
+
+
+def canonical(rows):
+    """Rows as a sorted multiset; blank node labels differ between the two sides."""
+    def key(row):
+        row = {k: ({**b, "value": "_"} if b["type"] == "bnode" else b) for k, b in row.items()}
+        return json.dumps(row, sort_keys=True)
+    return sorted(map(key, rows))
+
+
+@pytest.fixture(scope="module")
+def graph():
+    g = rdflib.Graph()
+    g.parse(data=DUMP, format="nt")
+    return g
+
+
+@pytest.fixture(scope="module")
+def store():
+    return TripleStore.from_triples(parse_ntriples(DUMP.splitlines()))
+
+
+def test_literals_are_decoded_into_sparql_bindings():
+    assert term_binding("<http://example.org/x>") == {"type": "uri", "value": "http://example.org/x"}
+    assert term_binding("_:b0") == {"type": "bnode", "value": "b0"}
+    assert term_binding('"a \\"b\\"\\u00E9"@en') == {"type": "literal", "value": 'a "b"é', "xml:lang": "en"}
+    assert term_binding('"12"^^<http://www.w3.org/2001/XMLSchema#integer>') == {
+        "type": "literal", "value": "12", "datatype": "http://www.w3.org/2001/XMLSchema#integer",
+    }
+
+
+def test_parse_ntriples_canonicalizes_escapes_and_skips_bad_lines():
+    lines = [
+        '<http://example.org/a> <http://example.org/p> "caf\\u00E9" .',
+        '<http://example.org/a> <http://example.org/p> "café" .',
+        "not a triple",
+        "",
+    ]
+    triples = list(parse_ntriples(lines))
+    assert triples == [('<http://example.org/a>', '<http://example.org/p>', '"café"')] * 2
+    assert len(TripleStore.from_triples(triples)) == 1
+
+
+def test_parse_turtle_matches_ntriples(tmp_path, graph):
+    path = tmp_path / "dump.ttl"
+    graph.serialize(str(path), format="turtle")
+    from_turtle = set(parse_turtle(str(path)))
+    from_nt = set(parse_ntriples(DUMP.splitlines()))
+    strip = lambda triples: {t for t in triples if not any(x.startswith("_:") for x in t)}
+    assert strip(from_turtle) == strip(from_nt)
+    assert len(from_turtle) == len(from_nt)
+
+
+def test_term_dict_ids_follow_sorted_order(store):
+    terms = list(store.terms)
+    assert terms == sorted(terms)
+    assert all(store.term_id(t) == i for i, t in enumerate(terms))
+    assert store.term_id("<http://example.org/missing>") is None
+
+    small = TermDict(["<a>", "<b>"])
+    assert (len(small), small.id_of("<b>"), small.token(0), small.id_of("<c>")) == (2, 1, "<a>", None)
+
+
+def test_first_hop_matches_sparql(graph, store):
+    work = EX + "w1"
+    expected = run(graph, scoped(render_query("first_hop", work=work), "work"))
+    assert expected
+    assert canonical(store.first_hop(work)) == canonical(expected)
+    assert store.first_hop(EX + "missing") == []
+
+
+def test_argument_neighbors_match_sparql(graph, store):
+    arg = EX + "w1_research_problem"
+    expected = run(graph, scoped(render_query("argument_neighbors", args=[arg]), "arg"))
+    rows = store.argument_neighbors(arg)
+    assert canonical(rows) == canonical(expected)
+    # the self-loop is filtered, the incoming edge kept
+    assert not any(r["s"]["value"] == r["o"]["value"] == arg for r in rows)
+    assert any(r["s"]["value"] == EX + "critic" for r in rows)
+
+
+def test_approach_neighbors_are_outgoing_only(graph, store):
+    approach = EX + "w1_research_approach"
+    expected = run(graph, scoped(render_query("approach_neighbors", approaches=[approach]), "ap"))
+    rows = store.approach_neighbors(approach)
+    assert canonical(rows) == canonical(expected)
+    assert {r["s"]["value"] for r in rows} == {approach}
+    # the artifact has two labels: one row each, like the OPTIONAL
+    assert len([r for r in rows if r["o"]["value"] == EX + "artifact"]) == 2
+
+
+def test_resource_properties_match_sparql(graph, store):
+    uri = EX + "w1"
+    expected = run(graph, render_query("resource_properties", resources=[uri]))
+    assert canonical(store.resource_properties(uri)) == canonical(expected)
+
+
+def serve(monkeypatch, graph, store=None):
+    monkeypatch.setattr(work_graph, "sparql", lambda endpoint, query, cache=True: run(graph, query))
+    monkeypatch.setattr(work_graph, "get_local_store", lambda: store)
+
+
+def test_all_works_match_sparql(monkeypatch, graph, store):
+    serve(monkeypatch, graph)
+    expected = work_graph.get_all_works(None)
+    serve(monkeypatch, graph, store)
+    works = work_graph.get_all_works(None)
+
+    # rdflib has no xsd:gYear cast, so the SPARQL side never binds ?year
+    normalize = lambda ws: [
+        {**w, "keywords": sorted(w["keywords"]), "creators": sorted(w["creators"]), "year": None} for w in ws
+    ]
+    assert normalize(works) == normalize(expected)
+    assert [w["uri"] for w in works] == [EX + "w2", EX + "w1"]
+    assert [w["year"] for w in works] == [None, "2021"]
+    assert work_graph.get_all_works(None, limit=1, offset=1) == works[1:]
+
+
+def test_citation_edges_match_sparql(monkeypatch, graph, store):
+    serve(monkeypatch, graph)
+    expected = work_graph.get_citation_edges(None)
+    serve(monkeypatch, graph, store)
+    assert work_graph.get_citation_edges(None) == expected == [
+        {"source": EX + "w1", "target": EX + "w2", "predicate": "cito:cites"},
+    ]
+
+
+def test_person_names_match_sparql(monkeypatch, graph, store):
+    serve(monkeypatch, graph)
+    expected = work_graph.get_person_names(None)
+    serve(monkeypatch, graph, store)
+    assert work_graph.get_person_names(None) == expected == {EX + "alice": "Alice", EX + "bob": EX + "bob"}
+
+
+def test_saved_store_is_memory_mapped_and_answers_the_same(tmp_path, store):
+    store.save(str(tmp_path))
+    mapped = TripleStore.open(str(tmp_path))
+
+    for index in (mapped.spo, mapped.pos, mapped.osp, mapped.terms._offsets):
+        assert isinstance(index, np.memmap)
+        assert not index.flags.writeable
+    assert isinstance(mapped.terms, MappedTermDict)
+    assert isinstance(mapped.terms._buf, mmap.mmap)
+
+    assert len(mapped) == len(store) and len(mapped.terms) == len(store.terms)
+    assert list(mapped.terms) == list(store.terms)
+    for token in store.terms:
+        assert mapped.term_id(token) == store.term_id(token)
+    assert mapped.term_id("<http://example.org/missing>") is None
+    assert mapped.term_id('"zzz unknown"') is None
+    assert mapped.term_id("") is None
+
+    for uri in (EX + "w1", EX + "w2", EX + "missing"):
+        assert mapped.first_hop(uri) == store.first_hop(uri)
+        assert mapped.resource_properties(uri) == store.resource_properties(uri)
+    assert mapped.argument_neighbors(EX + "w1_research_problem") == store.argument_neighbors(EX + "w1_research_problem")
+    assert mapped.approach_neighbors(EX + "w1_research_approach") == store.approach_neighbors(EX + "w1_research_approach")
+    assert mapped.all_works() == store.all_works()
+    assert mapped.citation_edges() == store.citation_edges()
+    assert mapped.person_names() == store.person_names()
+
+
+def test_load_opens_a_saved_directory(tmp_path, store):
+    store.save(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted(STORE_FILES + ("meta.json",))
+    loaded = TripleStore.load(str(tmp_path))
+    assert isinstance(loaded.spo, np.memmap)
+    assert loaded.first_hop(EX + "w1") == store.first_hop(EX + "w1")
+
+
+def test_local_store_is_versioned_by_its_file(monkeypatch, tmp_path, store):
+    monkeypatch.setattr(triple_store, "_store", {"path": None, "store": None, "version": None})
+    monkeypatch.setattr(triple_store, "LOCAL_STORE_PATH", "")
+    assert local_store_version() is None
+
+    store.save(str(tmp_path))
+    monkeypatch.setattr(triple_store, "LOCAL_STORE_PATH", str(tmp_path))
+    first = local_store_version()
+    assert first is not None and local_store_version() == first
+
+    # a rewritten store gets a new version once it is loaded again
+    meta = tmp_path / "meta.json"
+    os.utime(meta, ns=(meta.stat().st_atime_ns, meta.stat().st_mtime_ns + 10 ** 9))
+    triple_store._store["path"] = None
+    assert local_store_version() != first
@@ -1,24 +1,100 @@
+from typing import List
+
 import streamlit as st
-from core.resource_inspector import search_paper_by_title, get_venues, get_years
+from core.clusters import cluster_label
+from core.facets import FacetIndex
+from core.query_builder import replace_prefixes_if_uri
+
+
+def keyword_label(uri: str) -> str:
+    """Discipline keyword without its idea:/cso: prefix, human-ish."""
+    label = replace_prefixes_if_uri(uri)
+    for prefix in ("idea:", "cso:"):
+        if label.startswith(prefix):
+            label = label[len(prefix):]
+    return label.replace("_", " ")
+
+
+def year_span(facets: FacetIndex):
+    """(first, last) year of the works, or None."""
+    years = [int(v[:4]) for v in facets.values("year") if v[:4].isdigit()]
+    return (min(years), max(years)) if years else None
+
 
-def sidebar_controls(endpoint):
+def years_in_range(facets: FacetIndex, year_range) -> List[str] | None:
+    """Year facet values inside the overview's year range; None when the range is everything."""
+    span = year_span(facets)
+    if span is None or not year_range or tuple(year_range) == span:
+        return None
+    first, last = year_range
+    return [v for v in facets.values("year") if v[:4].isdigit() and first <= int(v[:4]) <= last]
+
+
+def sidebar_controls(facets: FacetIndex):
+    """
+    Title search plus venue/keyword facets, all answered from the facet
+    index; years come from the overview's year-range slider. Returns
+    (title, selection) where selection maps each restricted facet to its
+    selected values.
+    """
     st.sidebar.header("Paper Search / Filters")
 
-    # Search by title
+    # Search by title (substring of the label, applied to the facet result)
     title = st.sidebar.text_input("Search paper by title")
-    selected_paper = None
 
-    if title:
-        results = search_paper_by_title(endpoint, title)
-        options = [r["paper"]["value"] for r in results]
-        selected_paper = st.sidebar.selectbox("Matches", options)
+    def current_selection(venue, keywords):
+        selection = {}
+        if venue:
+            selection["venue"] = [venue]
+        years = years_in_range(facets, st.session_state.get("year_range"))
+        if years is not None:
+            selection["year"] = years
+        if keywords:
+            selection["keyword"] = keywords
+        return selection
+
+    # the widgets' values are already in session_state when the script
+    # reruns, so live counts can be computed before drawing them
+    counts = facets.facet_counts(current_selection(
+        st.session_state.get("facet_venue"), st.session_state.get("facet_keyword", []),
+    ))
+
+    # option labels stay fixed (a changing label would reset the widget);
+    # the live counts for the current selection are shown underneath
+    def live_counts(facet, label, top=8):
+        best = sorted(((c, v) for v, c in counts[facet].items() if c), reverse=True)[:top]
+        if best:
+            st.sidebar.caption(" · ".join(f"{label(v)} ({c})" for c, v in best))
 
     # Filter by venue
-    venues = [v["venue"]["value"] for v in get_venues(endpoint)]
-    venue = st.sidebar.selectbox("Filter by Venue", [""] + venues)
+    venues = sorted(facets.values("venue"), key=lambda v: cluster_label("venue", v).lower())
+    venue = st.sidebar.selectbox(
+        "Filter by Venue", [""] + venues, key="facet_venue",
+        format_func=lambda v: cluster_label("venue", v) if v else "",
+    )
+    live_counts("venue", lambda v: cluster_label("venue", v))
+
+    # Filter by discipline keyword (works must have all of them)
+    chosen = st.sidebar.multiselect(
+        "Filter by Keyword", sorted(facets.values("keyword"), key=keyword_label), key="facet_keyword",
+        format_func=keyword_label,
+    )
+    live_counts("keyword", keyword_label)
+
+    selection = current_selection(venue, chosen)
+    st.sidebar.caption(f"{facets.size(facets.select(selection))} works match the filters")
+    return title, selection
 
-    # Filter by year
-    years = [y["year"]["value"] for y in get_years(endpoint)]
-    year = st.sidebar.selectbox("Filter by Year", [""] + years)
 
-    return selected_paper, venue, year
+def person_controls(names):
+    """Author search over the local person index; returns the person to open, if any."""
+    st.sidebar.subheader("Authors")
+    query = st.sidebar.text_input("Find an author")
+    if not query:
+        return None
+    matches = sorted((uri for uri, name in names.items() if query.lower() in name.lower()), key=names.get)[:50]
+    if not matches:
+        st.sidebar.caption("No author matches.")
+        return None
+    person = st.sidebar.selectbox("Authors found", matches, format_func=names.get)
+    return person if st.sidebar.button("Open person view") else None
@@ -1,5 +1,8 @@
+import math
+from types import MappingProxyType
 from typing import List, Dict 
 
+import streamlit as st
 from streamlit_agraph import agraph, Node, Edge, Config
 
 from core.query_builder import replace_prefixes_if_uri, is_resource
@@ -7,6 +10,7 @@ from core.graph_builder import get_edge_color
 from config.settings import FABIO_WORK
 
 from core.work_graph import get_argument_neighbors, _get_first_hop
+from core.layout import compute_layout
 from ui.styling import ARGUMENT_TYPE_COLORS, DEFAULT_ARGUMENT_COLOR, CLASS_STYLE
 from ui.ontology_structure import ONTOLOGY_GRAPH
 
@@ -61,6 +65,23 @@ def _guess_kind(uri: str, type_iri: str | None, layer: str, work_uri: str) -> st
 
     return "other"
 
+def _place_nodes(name: str, nodes: List[Node], edges: List[Edge], pinned=None, initial=None) -> None:
+    """
+    Give every node its server-side layout position (cached per graph
+    content), so the graph can be rendered with physics off. Pinned nodes
+    keep their coordinates and are not touched (they may be shared).
+    Warm starts are kept per session, so another user's filtered graph
+    never becomes the starting layout of this one.
+    """
+    pinned = pinned or {}
+    positions = compute_layout(
+        name, [n.id for n in nodes], [(e.source, e.to) for e in edges], pinned, initial,
+        scope=st.session_state.get("query_session"),
+    )
+    for n in nodes:
+        if n.id not in pinned:
+            n.x, n.y = positions[n.id]
+
 # ---------------------------
 # overview graph (all works)
 # ---------------------------
@@ -180,17 +201,22 @@ def _make_instance_node(uri: str, label: str, class_iri: str):
         size=14,
     )
 
-def build_work_overview_graph(works, citations=None):
+def build_work_overview_graph(works, citations=None, centrality=None, name: str = "overview", height: int = 500):
     """
     Overview graph:
-      - nodes: all works (gray boxes)
+      - nodes: all works (gray boxes), scaled by PageRank when 'centrality'
+        (a core.centrality.WorkCentrality) is given
       - edges: citation relations (directed citing → cited)
-    'citations' is a list of dicts with keys: source, target, predicate
+    'citations' is a list of dicts with keys: source, target, predicate.
+    'name' keys the layout, so other work subgraphs (e.g. citation paths)
+    do not warm-start from the overview's positions.
     """
     nodes = []
     edges = []
 
     work_uris = {w["uri"] for w in works}
+    if centrality is not None and works:
+        top_rank = max(centrality.pagerank(uri) for uri in work_uris) or 1.0
 
     # --- nodes (gray boxes, label = paper id, hover = title) ------------------
     for w in works:
@@ -200,13 +226,17 @@ def build_work_overview_graph(works, citations=None):
 
         hover = f"{label} ({year})" if year else label
         paper_id = _local_name(uri)
+        size = 18
+        if centrality is not None:
+            hover += f" – cited by {centrality.in_degree(uri)}"
+            size = 12 + 28 * math.sqrt(centrality.pagerank(uri) / top_rank)
 
         nodes.append(
             Node(
                 id=uri,
                 label=paper_id[:30],
                 title=hover[:300],      # full title on hover
-                size=18,
+                size=size,
                 color="#DDDDDD",
                 shape="box",
             )
@@ -235,13 +265,16 @@ def build_work_overview_graph(works, citations=None):
                 )
             )
 
+    _place_nodes(name, nodes, edges)
+
     cfg = Config(
         width="100%",
-        height=500,
+        height=height,
         directed=True,
         nodes={"font": {"size": 10}},
         edges={"smooth": False},
         interaction={"hover": True},
+        physics={"enabled": False},
     )
 
     clicked = agraph(nodes=nodes, edges=edges, config=cfg)
@@ -249,6 +282,232 @@ def build_work_overview_graph(works, citations=None):
 
 
 
+CLUSTER_NODE_PREFIX = "cluster:"
+
+
+def build_cluster_overview_graph(clusters, edges, name: str = "overview:clusters"):
+    """
+    Level-of-detail overview:
+      - nodes: one super-node per cluster, sized by its number of works
+      - edges: citations between clusters, summed (width and label = count)
+    Returns the clicked node id ("cluster:<key>").
+    """
+    nodes = [
+        Node(
+            id=CLUSTER_NODE_PREFIX + c["key"],
+            label=f"{c['label'][:30]}\n{c['size']} works",
+            title=f"{c['label']} – {c['size']} works (click to open)",
+            size=12 + 6 * math.log2(1 + c["size"]),
+            color="#C9D6EA",
+            shape="dot",
+        )
+        for c in clusters
+    ]
+    edge_list = [
+        Edge(
+            source=CLUSTER_NODE_PREFIX + e["source"],
+            target=CLUSTER_NODE_PREFIX + e["target"],
+            label=str(e["weight"]),
+            value=e["weight"],
+            color=get_edge_color("cito:cites"),
+            arrows_to=True,
+            smooth=False,
+        )
+        for e in edges
+    ]
+
+    _place_nodes(name, nodes, edge_list)
+
+    cfg = Config(
+        width="100%",
+        height=500,
+        directed=True,
+        nodes={"font": {"size": 12}},
+        edges={"smooth": False, "scaling": {"min": 1, "max": 12}},
+        interaction={"hover": True},
+        physics={"enabled": False},
+    )
+    return agraph(nodes=nodes, edges=edge_list, config=cfg)
+
+
+KEYWORD_NODE_PREFIX = "keyword:"
+
+
+def build_keyword_graph(nodes, edges, name: str = "overview:keywords"):
+    """
+    Keyword co-occurrence network (core.keywords.cooccurrence):
+      - nodes: discipline keywords, sized by their number of works
+      - edges: keywords sharing works (width = shared works, hover = PMI)
+    Returns the clicked node id ("keyword:<uri>").
+    """
+    node_list = [
+        Node(
+            id=KEYWORD_NODE_PREFIX + k["uri"],
+            label=_pretty_keyword_label(replace_prefixes_if_uri(k["uri"]))[:30],
+            title=f"{_pretty_keyword_label(replace_prefixes_if_uri(k['uri']))} – {k['count']} works (click to list them)",
+            size=8 + 4 * math.log2(1 + k["count"]),
+            color="#FFE9A8",
+            shape="dot",
+        )
+        for k in nodes
+    ]
+    edge_list = [
+        Edge(
+            source=KEYWORD_NODE_PREFIX + e["source"],
+            target=KEYWORD_NODE_PREFIX + e["target"],
+            title=f"{e['count']} works together, PMI {e['pmi']:.2f}",
+            value=e["count"],
+            color="#BBBBBB",
+            smooth=False,
+        )
+        for e in edges
+    ]
+
+    _place_nodes(name, node_list, edge_list)
+
+    cfg = Config(
+        width="100%",
+        height=500,
+        directed=False,
+        nodes={"font": {"size": 11}},
+        edges={"smooth": False, "scaling": {"min": 1, "max": 8}},
+        interaction={"hover": True},
+        physics={"enabled": False},
+    )
+    return agraph(nodes=node_list, edges=edge_list, config=cfg)
+
+
+PERSON_NODE_PREFIX = "person:"
+
+
+def build_coauthor_graph(person, coauthors, names, links, name: str = "person"):
+    """
+    Person-centric co-author graph:
+      - nodes: the person and their co-authors, sized by shared works
+      - edges: co-authorship (width = shared works), also between co-authors
+    'coauthors' is [(uri, shared works)], 'links' is [(a, b, shared works)].
+    Returns the clicked node id ("person:<uri>").
+    """
+    def label(uri):
+        return names.get(uri) or _local_name(uri)
+
+    nodes = [Node(
+        id=PERSON_NODE_PREFIX + person,
+        label=label(person)[:30],
+        title=label(person),
+        size=30,
+        color=CLASS_STYLE["foaf:Person"][0],
+        shape="dot",
+    )]
+    nodes += [
+        Node(
+            id=PERSON_NODE_PREFIX + uri,
+            label=label(uri)[:30],
+            title=f"{label(uri)} – {count} shared works (click to open)",
+            size=10 + 4 * math.log2(1 + count),
+            color=CLASS_STYLE["foaf:Person"][0],
+            shape="dot",
+        )
+        for uri, count in coauthors
+    ]
+    edges = [
+        Edge(
+            source=PERSON_NODE_PREFIX + a,
+            target=PERSON_NODE_PREFIX + b,
+            title=f"{count} shared works",
+            value=count,
+            color="#BBBBBB",
+            smooth=False,
+        )
+        for a, b, count in links
+    ]
+
+    _place_nodes(name, nodes, edges, pinned={nodes[0].id: (0, 0)})
+    nodes[0].x, nodes[0].y = 0, 0
+
+    cfg = Config(
+        width="100%",
+        height=400,
+        directed=False,
+        nodes={"font": {"size": 11}},
+        edges={"smooth": False, "scaling": {"min": 1, "max": 8}},
+        interaction={"hover": True},
+        physics={"enabled": False},
+    )
+    return agraph(nodes=nodes, edges=edges, config=cfg)
+
+
+# ---------------------------
+# ontology skeleton (work-centric view)
+# ---------------------------
+
+SKELETON_CLASS_COLOR = "#EEF2FF"
+
+# (node id, label, class iri, pinned position); idea:Artifact appears twice, by role
+SKELETON_CLASSES = (
+    ("class:fabio:Work",            "Work",               "fabio:Work",            (0, 0)),
+    ("class:deo:DiscourseElement",  "DiscourseElement",   "deo:DiscourseElement",  (-350, -240)),
+    ("class:foaf:Person",           "Person",             "foaf:Person",           (-350, -80)),
+    ("class:bibo:Event",            "Event",              "bibo:Event",            (-350, 80)),
+    ("class:cso:Topic",             "Topic",              "cso:Topic",             (-350, 240)),
+    ("class:amo:Argument",          "Argument",           "amo:Argument",          (350, 0)),
+    ("class:amo:Warrant",           "Warrant",            "amo:Warrant",           (700, -360)),
+    ("class:amo:Claim",             "Claim",              "amo:Claim",             (700, -240)),
+    ("class:amo:Evidence",          "Evidence",           "amo:Evidence",          (700, -120)),
+    ("class:amo:Backing",           "Backing",            "amo:Backing",           (700, 0)),
+    ("class:idea:Idea",             "Idea",               "idea:Idea",             (700, 120)),
+    ("class:idea:Issue",            "Issue",              "idea:Issue",            (700, 240)),
+    ("class:idea:Approach",         "Approach",           "idea:Approach",         (700, 360)),
+    ("class:UsedArtifact",          "UsedArtifact",       "idea:Artifact",         (1050, 240)),
+    ("class:IntroducedArtifact",    "IntroducedArtifact", "idea:Artifact",         (1050, 360)),
+    ("class:idea:Assumption",       "Assumption",         "idea:Assumption",       (1050, 480)),
+)
+
+SKELETON_LINKS = (
+    ("class:fabio:Work",     "po:contains",         "class:deo:DiscourseElement"),
+    ("class:fabio:Work",     "dc:creator",          "class:foaf:Person"),
+    ("class:fabio:Work",     "dc:publisher",        "class:bibo:Event"),
+    ("class:fabio:Work",     "fabio:hasDiscipline", "class:cso:Topic"),
+    ("class:fabio:Work",     "amo:hasArgument",     "class:amo:Argument"),
+
+    ("class:amo:Argument",   "amo:hasClaim",        "class:amo:Claim"),
+    ("class:amo:Argument",   "amo:hasBacking",      "class:amo:Backing"),
+    ("class:amo:Argument",   "amo:hasEvidence",     "class:amo:Evidence"),
+    ("class:amo:Argument",   "amo:hasWarrant",      "class:amo:Warrant"),
+    ("class:amo:Argument",   "idea:proposesIdea",   "class:idea:Idea"),
+    ("class:amo:Argument",   "idea:concernsIssue",  "class:idea:Issue"),
+    ("class:amo:Argument",   "idea:realizes",       "class:idea:Approach"),
+
+    ("class:idea:Approach",  "idea:uses",           "class:UsedArtifact"),
+    ("class:idea:Approach",  "idea:introduces",     "class:IntroducedArtifact"),
+    ("class:idea:Approach",  "idea:hasAssumption",  "class:idea:Assumption"),
+
+    ("class:amo:Warrant",    "amo:leadsTo",         "class:amo:Claim"),
+    ("class:idea:Idea",      "idea:respondsTo",     "class:idea:Issue"),
+    ("class:idea:Approach",  "idea:generates",      "class:amo:Evidence"),
+    ("class:amo:Evidence",   "amo:supports",        "class:amo:Claim"),
+)
+
+# the selected work sits just above its class
+WORK_INSTANCE_POSITION = (0, -120)
+
+SKELETON_POSITIONS = MappingProxyType({cid: pos for cid, _, _, pos in SKELETON_CLASSES})
+
+# built once; every render copies the mapping and adds instances around it
+_SKELETON_NODES = MappingProxyType({
+    cid: Node(
+        id=cid, label=label, title=iri,
+        size=20, color=SKELETON_CLASS_COLOR, shape="ellipse",
+        x=pos[0], y=pos[1],
+    )
+    for cid, label, iri, pos in SKELETON_CLASSES
+})
+_SKELETON_EDGES = tuple(
+    Edge(source=src, target=dst, arrows_to=True, label=pred, color="#999")
+    for src, pred, dst in SKELETON_LINKS
+)
+
+
 def build_layered_work_graph(
     is_skeleton: bool,
     rows: List[Dict],
@@ -287,71 +546,11 @@ def build_layered_work_graph(
         return agraph(nodes=[node], edges=[], config=cfg)
 
     # -------------------------------------------------
-    # 1. FULL MODE — Ontology skeleton
+    # 1. FULL MODE — Ontology skeleton (prebuilt, pinned)
     # -------------------------------------------------
-    CLASS_COLOR = "#EEF2FF"
-    nodes = {}
-    edges = []
-
-    # helper
-    def add_class(iri, label):
-        if iri == "idea:Artifact":
-            cid = f"class:{label}"
-        else:
-            cid = f"class:{iri}"
-        if cid not in nodes:
-            nodes[cid] = Node(
-                id=cid, label=label, title=iri,
-                size=20, color=CLASS_COLOR, shape="ellipse"
-            )
-        return cid
-
-    # ---- Ontology classes ----
-    cid_work       = add_class("fabio:Work", "Work")
-    cid_de         = add_class("deo:DiscourseElement", "DiscourseElement")
-    cid_person     = add_class("foaf:Person", "Person")
-    cid_event      = add_class("bibo:Event", "Event")
-    cid_topic      = add_class("cso:Topic", "Topic")
-    cid_argument   = add_class("amo:Argument", "Argument")
-
-    cid_claim      = add_class("amo:Claim", "Claim")
-    cid_backing    = add_class("amo:Backing", "Backing")
-    cid_evidence   = add_class("amo:Evidence", "Evidence")
-    cid_warrant    = add_class("amo:Warrant", "Warrant")
-
-    cid_idea       = add_class("idea:Idea", "Idea")
-    cid_issue      = add_class("idea:Issue", "Issue")
-    cid_approach   = add_class("idea:Approach", "Approach")
-    cid_assump     = add_class("idea:Assumption", "Assumption")
-    cid_artifact_introduced   = add_class("idea:Artifact", "IntroducedArtifact")
-    cid_artifact_used   = add_class("idea:Artifact", "UsedArtifact")
-
-    def link(src, pred, dst):
-        edges.append(Edge(source=src, target=dst, arrows_to=True, label=pred, color="#999"))
-
-    # ---- Ontology links ----
-    link(cid_work,     "po:contains",         cid_de)
-    link(cid_work,     "dc:creator",          cid_person)
-    link(cid_work,     "dc:publisher",        cid_event)
-    link(cid_work,     "fabio:hasDiscipline", cid_topic)
-    link(cid_work,     "amo:hasArgument",     cid_argument)
-
-    link(cid_argument, "amo:hasClaim",        cid_claim)
-    link(cid_argument, "amo:hasBacking",      cid_backing)
-    link(cid_argument, "amo:hasEvidence",     cid_evidence)
-    link(cid_argument, "amo:hasWarrant",      cid_warrant)
-    link(cid_argument, "idea:proposesIdea",   cid_idea)
-    link(cid_argument, "idea:concernsIssue",  cid_issue)
-    link(cid_argument, "idea:realizes",       cid_approach)
-
-    link(cid_approach, "idea:uses",           cid_artifact_used)
-    link(cid_approach, "idea:introduces",     cid_artifact_introduced)
-    link(cid_approach, "idea:hasAssumption",  cid_assump)
-
-    link(cid_warrant, "amo:leadsTo", cid_claim)
-    link(cid_idea, "idea:respondsTo", cid_issue)
-    link(cid_approach, "idea:generates", cid_evidence)
-    link(cid_evidence, "amo:supports", cid_claim)
+    nodes = dict(_SKELETON_NODES)
+    edges = list(_SKELETON_EDGES)
+    cid_work = "class:fabio:Work"
 
     # -------------------------------------------------
     # 2. Add Work instance
@@ -363,6 +562,8 @@ def build_layered_work_graph(
         size=25,
         color="#FFFFFF",
         shape="box",
+        x=WORK_INSTANCE_POSITION[0],
+        y=WORK_INSTANCE_POSITION[1],
     )
     edges.append(Edge(source=work_uri, target=cid_work, arrows_to=True, color="#000"))
 
@@ -478,28 +679,28 @@ def build_layered_work_graph(
     # -------------------------------------------------
     # 5. Render
     # -------------------------------------------------
+    node_list = list(nodes.values())
+    pinned = {**SKELETON_POSITIONS, work_uri: WORK_INSTANCE_POSITION}
+    # instances start next to the class they hang off
+    initial = {
+        e.to: pinned[e.source]
+        for e in edges
+        if e.source in pinned and e.to not in pinned
+    }
+    _place_nodes(f"work:{work_uri}", node_list, edges, pinned=pinned, initial=initial)
+
     cfg = Config(
         width="100%",
         height=700,
         directed=True,
         interaction={"hover": True},
 
-        physics={
-            "enabled": True,
-            "solver": "forceAtlas2Based",
-            "forceAtlas2Based": {
-                "gravitationalConstant": -50,
-                "centralGravity": 0.01,
-                "springConstant": 0.08,
-                "springLength": 150,   # ← pushes nodes apart
-                "avoidOverlap": 1      # ← ESSENTIAL to prevent overlaps
-            },
-            "minVelocity": 0.75
-        },
+        # positions come from core.layout
+        physics={"enabled": False},
 
         layout={
             "hierarchical": False
         }
     )
 
-    return agraph(nodes=list(nodes.values()), edges=edges, config=cfg)
+    return agraph(nodes=node_list, edges=edges, config=cfg)